@@ -0,0 +1,52 @@
+"""
+Benchmarks loading the member PFS of a combined document one after another vs. in parallel processes.
+
+Every run is a fresh process, as for `ceos-ard compile a b c ...`. Besides the synthetic repository,
+in which the PFS share most building blocks, a repository is benchmarked in which each PFS uses other requirements.
+
+Usage: python benchmarks/combine.py [-i path/to/ceos-ard] [-j 1 2 4] [-n 3]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from synthetic import corpus_argument, get_corpus, write_corpus
+
+SCRIPT = """
+import sys, time
+from ceos_ard_cli.compile import load_members
+start = time.perf_counter()
+load_members(sys.argv[3:], sys.argv[1], int(sys.argv[2]))
+print(time.perf_counter() - start)
+"""
+
+
+def run(pfs, input_dir, jobs):
+    cmd = [sys.executable, "-c", SCRIPT, str(input_dir), str(jobs), *pfs]
+    return float(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    corpus_argument(parser)
+    parser.add_argument("--jobs", "-j", type=int, nargs="+", default=[1, 2, 4], help="Numbers of processes")
+    parser.add_argument("--runs", "-n", type=int, default=3, help="Number of runs, the fastest run is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpora = {"shared blocks": get_corpus(args.input_dir, tmp)}
+        if not args.input_dir:
+            root = Path(tmp) / "separate"
+            corpora["separate requirements"] = (root, write_corpus(root, pfs=4, categories=24, categories_per_pfs=6))
+        for name, (input_dir, all_pfs) in corpora.items():
+            print(f"{name}: {len(all_pfs)} PFS")
+            for jobs in args.jobs:
+                elapsed = min(run(all_pfs, input_dir, jobs) for _ in range(args.runs))
+                print(f"{jobs} processes: {elapsed:6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
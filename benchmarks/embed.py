@@ -0,0 +1,80 @@
+"""
+Benchmarks embedding the assets into self-contained HTML files:
+encoding the assets again for each document vs. a shared DataUriCache.
+
+If pandoc is installed, pandoc's --embed-resources is compared with a pandoc conversion
+followed by embedding with the shared cache, as generate-all does with --embed-cache.
+
+Usage: python benchmarks/embed.py [--documents 20] [--assets 30] [--size 500]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from ceos_ard_cli.utils.embed import DataUriCache, embed_file, embed_resources
+
+
+def run(html, root, documents, shared):
+    cache = DataUriCache()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(documents):
+        embed_resources(html, root, cache if shared else DataUriCache())
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_pandoc(root, documents, embed_cache):
+    """Converts the HTML file with pandoc for each document, pandoc or the shared cache embeds the assets."""
+    cache = DataUriCache()
+    start = time.perf_counter()
+    for i in range(documents):
+        out = root / f"out-{i}.html"
+        cmd = ["pandoc", "document.html", "-f", "html", "-t", "html", "-s", "-o", out.name]
+        if not embed_cache:
+            cmd.append("--embed-resources=true")
+        subprocess.run(cmd, cwd=root, check=True, capture_output=True)
+        if embed_cache:
+            embed_file(out, root, cache)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=20, help="Number of HTML documents")
+    parser.add_argument("--assets", type=int, default=30, help="Number of images per document")
+    parser.add_argument("--size", type=int, default=500, help="Size of each image in KiB")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "assets").mkdir()
+        images = []
+        for i in range(args.assets):
+            (root / "assets" / f"{i}.png").write_bytes(os.urandom(args.size * 1024))
+            images.append(f'<img src="assets/{i}.png" />')
+        html = "<html><body>" + "\n".join(images) + "</body></html>"
+
+        print(f"{args.documents} documents with {args.assets} images of {args.size} KiB")
+        for name, shared in (("per document", False), ("shared cache", True)):
+            elapsed, peak = run(html, root, args.documents, shared)
+            print(f"{name}: {elapsed:6.2f}s, peak memory {peak / 1024 / 1024:7.1f} MiB")
+
+        if shutil.which("pandoc") is None:
+            print("pandoc is not installed, skipping the comparison with pandoc's --embed-resources")
+            return
+        (root / "document.html").write_text(html, encoding="utf-8")
+        for name, embed_cache in (("pandoc --embed-resources", False), ("pandoc + shared cache", True)):
+            print(f"{name}: {run_pandoc(root, args.documents, embed_cache):6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures the memory that is used to keep all PFS of a combined document loaded,
+as plain dicts (load_pfs) vs. the compact model with interned building blocks (load_document).
+
+Usage: python benchmarks/memory.py [-i path/to/ceos-ard]
+"""
+
+import argparse
+import copy
+import gc
+import pickle
+import tempfile
+import time
+import tracemalloc
+
+from synthetic import corpus_argument, get_corpus
+
+from ceos_ard_cli.compile import combine_pfs, load_document, load_pfs
+from ceos_ard_cli.model import Interner
+from ceos_ard_cli.utils import fast_yaml
+from ceos_ard_cli.utils.yaml import set_yaml_loader
+
+
+def measure(function):
+    """Returns the result of the function and the memory that it still holds afterwards."""
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    corpus_argument(parser)
+    args = parser.parse_args()
+    if fast_yaml.is_available():
+        set_yaml_loader("libyaml")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir, pfs_ids = get_corpus(args.input_dir, tmp)
+        # warm up the caches so that only the loaded data is measured
+        for pfs in pfs_ids:
+            load_pfs(pfs, input_dir)
+
+        dicts, dict_size = measure(lambda: {p: load_pfs(p, input_dir) for p in pfs_ids})
+        interner = Interner()
+        documents, model_size = measure(lambda: {p: load_document(p, input_dir, interner) for p in pfs_ids})
+        assert all(documents[p].to_dict() == dicts[p] for p in pfs_ids)
+
+        print(f"Combined document of {len(pfs_ids)} PFS")
+        print(f"{'':<24} {'dicts':>10} {'model':>10}")
+        print(f"{'loaded (KiB)':<24} {dict_size // 1024:>10} {model_size // 1024:>10}")
+        dict_pickle = len(pickle.dumps(dicts))
+        model_pickle = len(pickle.dumps(documents))
+        print(f"{'pickled (KiB)':<24} {dict_pickle // 1024:>10} {model_pickle // 1024:>10}")
+        print(f"{'interned blocks':<24} {'':>10} {len(interner):>10}")
+        print(f"{'shared uses':<24} {'':>10} {interner.hits:>10}")
+
+        # the working copy for one compilation, the dicts were deep-copied before
+        start = time.perf_counter()
+        combined = combine_pfs({p: copy.deepcopy(dicts[p]) for p in pfs_ids})
+        deepcopy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        assert combine_pfs({p: documents[p].to_dict() for p in pfs_ids}) == combined
+        to_dict_time = time.perf_counter() - start
+        print(f"{'working copy (ms)':<24} {deepcopy_time * 1000:>10.1f} {to_dict_time * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
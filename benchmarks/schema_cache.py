@@ -0,0 +1,56 @@
+"""
+Micro-benchmark for building the strictyaml validators for every file read vs. once per schema.
+
+Usage: python benchmarks/schema_cache.py [-n 1000]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from ceos_ard_cli.schema import GLOSSARY, PFS_DOCUMENT, REQUIREMENT, SECTION
+from ceos_ard_cli.utils.yaml import SCHEMA_CACHE, get_schema
+
+SCHEMAS = {"PFS_DOCUMENT": PFS_DOCUMENT, "REQUIREMENT": REQUIREMENT, "SECTION": SECTION, "GLOSSARY": GLOSSARY}
+
+
+def tree_size(schema):
+    """Returns the number of memory blocks and bytes that are allocated for one validator tree."""
+    tracemalloc.start()
+    validator = schema(".")
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del validator
+    stats = snapshot.statistics("filename")
+    return sum(stat.count for stat in stats), sum(stat.size for stat in stats)
+
+
+def timed(function, reads):
+    start = time.perf_counter()
+    for _ in range(reads):
+        function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reads", "-n", type=int, default=1000, help="Number of simulated file reads per schema")
+    args = parser.parse_args()
+
+    print(f"{args.reads} file reads per schema, allocations in memory blocks / KiB")
+    print(f"{'schema':<14} {'per-file':>25} {'cached':>25}")
+    for name, schema in SCHEMAS.items():
+        SCHEMA_CACHE.clear()
+        blocks, size = tree_size(schema)
+        # previously, the validators were built for every file that was read
+        per_file = timed(lambda: schema("."), args.reads)
+        cached = timed(lambda: get_schema(schema, "."), args.reads)
+        print(
+            f"{name:<14} "
+            f"{per_file * 1000:>7.1f}ms {blocks * args.reads:>8} / {size * args.reads // 1024:>6} "
+            f"{cached * 1000:>7.1f}ms {blocks:>8} / {size // 1024:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
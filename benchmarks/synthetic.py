@@ -0,0 +1,162 @@
+"""
+Writes a synthetic CEOS-ARD repository for benchmarks.
+
+The shape roughly follows the real corpus: several PFS that share most of
+their requirement categories, requirements, glossary terms and references.
+"""
+
+import argparse
+from pathlib import Path
+
+TEMPLATE = """# ~{ title }~
+
+~( for section in introduction )~
+## ~{ section.title }~ {#sec:intro-~{ section.id | slugify }~}
+
+~{ section.description }~
+
+~( endfor )~
+~( for block in requirements )~
+## ~{ block.category.title }~ {#sec:~{ block.category.id }~}
+
+~{ block.category.description }~
+
+~( for req in block.requirements )~
+### ~{ req.title }~ {#sec:~{ req.uid }~}
+
+~{ req.description }~
+
+~( if req.threshold )~
+Threshold: ~{ req.threshold.description }~
+~( for note in req.threshold.notes )~
+- ~{ note }~
+~( endfor )~
+~( endif )~
+~( if req.goal )~
+Goal: ~{ req.goal.description }~
+~( endif )~
+~( if editable )~
+Assessment:
+~( endif )~
+
+~( endfor )~
+~( endfor )~
+# Glossary
+
+~( for term in glossary )~
+- ~{ term.term }~: ~{ term.description }~
+~( endfor )~
+
+~( for annex in annexes )~
+## ~{ annex.title }~ {#sec:annex-~{ annex.id | slugify }~}
+
+~{ annex.description }~
+~( endfor )~
+"""
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt "
+    "ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco."
+)
+
+
+def block(text, indent):
+    return "\n".join(" " * indent + line for line in text.splitlines())
+
+
+def write(root, name, content):
+    file = root / name
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(content, encoding="utf-8")
+
+
+def write_corpus(root, pfs=8, categories=6, requirements=12, terms=40, references=30, categories_per_pfs=None):
+    """
+    Writes the synthetic repository to the given folder and returns the list of PFS ids.
+
+    By default, all PFS use all categories, otherwise each PFS uses the given number of the next categories.
+    """
+    root = Path(root)
+    write(root, "templates/template.md", TEMPLATE)
+    for i in range(references):
+        write(
+            root,
+            f"references/ref{i}.bib",
+            f"@article{{ref{i},\n  title = {{Reference {i} on {{SAR}} \\& optical data}},\n"
+            f"  author = {{Doe, Jane and Smith, John}},\n  journal = {{Journal {i % 5}}},\n  year = {{20{10 + i % 15}}}\n}}\n",
+        )
+    for i in range(terms):
+        write(
+            root,
+            f"glossary/term{i}.yaml",
+            f"term: Term {i}\ndescription: |\n{block(LOREM, 2)}\nreferences:\n  - ref{i % references}\n",
+        )
+    write(root, "sections/introduction/intro.yaml", f"title: Introduction\ndescription: |\n{block(LOREM * 3, 2)}\n")
+    write(root, "sections/annexes/annex.yaml", f"title: Annex\ndescription: |\n{block(LOREM * 3, 2)}\n")
+    for c in range(categories):
+        write(
+            root,
+            f"sections/requirement-categories/cat{c}.yaml",
+            f"title: Category {c}\ndescription: |\n{block(LOREM, 2)}\n",
+        )
+        for r in range(requirements):
+            dependency = f"dependencies:\n  previous: cat{c}/req{r - 1}\n" if r > 0 else ""
+            write(
+                root,
+                f"requirements/cat{c}/req{r}.yaml",
+                f"id: req{r}\ntitle: Requirement {c}.{r}\ndescription: |\n{block(LOREM, 2)}\n"
+                f"requirements:\n  threshold:\n    description: |\n{block(LOREM + ' See @previous.', 6)}\n"
+                f"    notes:\n      - {LOREM}\n      - {LOREM}\n"
+                f"  goal:\n    description: {LOREM}\n    optional: true\n"
+                f"{dependency}"
+                f"glossary:\n  - term{(c * requirements + r) % terms}\n  - term{(c * requirements + r + 1) % terms}\n"
+                f"references:\n  - ref{(c * requirements + r) % references}\n",
+            )
+
+    ids = []
+    for p in range(pfs):
+        pfs_id = f"PFS{p}"
+        ids.append(pfs_id)
+        blocks = []
+        if categories_per_pfs is None:
+            pfs_categories = range(categories)
+        else:
+            pfs_categories = [(p * categories_per_pfs + i) % categories for i in range(categories_per_pfs)]
+        for c in pfs_categories:
+            # every PFS uses most, but not all requirements
+            reqs = "\n".join(f"      - cat{c}/req{r}" for r in range(requirements) if (r + p) % 5 != 4 or r == 0)
+            blocks.append(f"  - category: cat{c}\n    requirements:\n{reqs}")
+        write(
+            root,
+            f"pfs/{pfs_id}/document.yaml",
+            f"title: Product Family {p}\nversion: 1.0.{p}\ntype: Type {p % 3}\n"
+            f"applies_to: |\n{block(LOREM, 2)}\nauthors:\n  - Jane Doe\n  - John Smith\n"
+            f"introduction:\n  - intro\nrequirements:\n" + "\n".join(blocks) + "\n"
+            "glossary:\n  - term0\nreferences:\n  - ref0\nannexes:\n  - annex\nchanges:\n",
+        )
+    return ids
+
+
+def corpus_argument(parser):
+    parser.add_argument(
+        "--input-dir",
+        "-i",
+        default=None,
+        help="Folder of a CEOS-ARD repository, defaults to a synthetic repository in a temporary folder",
+    )
+
+
+def get_corpus(input_dir, tmp):
+    """Returns the input folder and the PFS ids to benchmark."""
+    if input_dir:
+        input_dir = Path(input_dir).resolve()
+        return input_dir, sorted(f.name for f in (input_dir / "pfs").iterdir() if f.is_dir())
+    root = Path(tmp) / "ceos-ard"
+    return root, write_corpus(root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", help="Folder to write the synthetic repository to")
+    args = parser.parse_args()
+    print(", ".join(write_corpus(args.output)))
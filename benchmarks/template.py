@@ -0,0 +1,53 @@
+"""
+Benchmarks compiling the Markdown documents with the template compiled for every document vs. once per run.
+
+Usage: python benchmarks/template.py [-i path/to/ceos-ard] [-n 3]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import corpus_argument, get_corpus
+
+from ceos_ard_cli.compile import compile, load_document
+from ceos_ard_cli.model import Interner
+from ceos_ard_cli.utils.template import compile_template
+
+
+def run(documents, input_dir, out, loaded, shared):
+    compile_template.cache_clear()
+    start = time.perf_counter()
+    for pfs in documents:
+        for editable in (True, False):
+            if not shared:
+                compile_template.cache_clear()
+            compile(pfs, out / "-".join(pfs), input_dir, editable=editable, loaded=loaded, assets=False)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    corpus_argument(parser)
+    parser.add_argument("--runs", "-n", type=int, default=3, help="Number of runs, the fastest run is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir, all_pfs = get_corpus(args.input_dir, tmp)
+        if args.input_dir:
+            documents = [[pfs] for pfs in all_pfs]
+        else:
+            # the PFS of the synthetic corpus only resolve all dependencies when combined
+            documents = [all_pfs[i : i + 5] for i in range(len(all_pfs) - 4)]
+        interner = Interner()
+        loaded = {pfs: load_document(pfs, input_dir, interner) for pfs in all_pfs}
+
+        print(f"{len(documents)} documents, editable and read-only")
+        for name, shared in (("per document", False), ("once per run", True)):
+            elapsed = min(run(documents, input_dir, Path(tmp) / "out", loaded, shared) for _ in range(args.runs))
+            print(f"{name}: {elapsed:6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmarks the walks over the document trees:
+- bubbling up the glossary/references and finding deprecated blocks in separate walks vs. a single walk
+- rewriting the @alias references of a building block once per alias vs. once for all aliases
+
+Usage: python benchmarks/tree_walks.py [-i path/to/ceos-ard] [-n 20]
+"""
+
+import argparse
+import copy
+import tempfile
+import time
+
+from synthetic import corpus_argument, get_corpus
+
+from ceos_ard_cli.compile import BubbleUp, bubble_up, resolve_refs
+from ceos_ard_cli.links import update_references
+from ceos_ard_cli.utils import fast_yaml
+from ceos_ard_cli.utils.deprecation import FindDeprecated, find_deprecated
+from ceos_ard_cli.utils.pfs import read_pfs
+from ceos_ard_cli.utils.visitor import walk
+from ceos_ard_cli.utils.yaml import set_yaml_loader
+
+
+def separate_walks(data):
+    find_deprecated(bubble_up(data))
+
+
+def single_walk(data):
+    deprecated = FindDeprecated(data)
+    walk(data, BubbleUp(data), deprecated)
+    deprecated.result()
+
+
+def containers(data):
+    for block in data["requirements"]:
+        yield block["category"]
+        yield from block["requirements"]
+    yield from data["introduction"]
+    yield from data["annexes"]
+    yield data
+
+
+def aliases(container):
+    """Maps all aliases of the building block to a dummy anchor."""
+    anchors = {}
+    for field in ("dependencies", "sections"):
+        for alias in container.get(field) or {}:
+            anchors[alias] = "sec-" + alias
+    return anchors
+
+
+def per_alias(items):
+    for container, anchors in items:
+        for alias, anchor in anchors.items():
+            update_references(container, {alias: anchor})
+
+
+def all_aliases(items):
+    for container, anchors in items:
+        update_references(container, anchors)
+
+
+def best_of(function, make_input, repeat):
+    timings = []
+    for _ in range(repeat):
+        data = make_input()
+        start = time.perf_counter()
+        function(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    corpus_argument(parser)
+    parser.add_argument("--repeat", "-n", type=int, default=20, help="Number of runs per variant")
+    args = parser.parse_args()
+    if fast_yaml.is_available():
+        set_yaml_loader("libyaml")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir, pfs_ids = get_corpus(args.input_dir, tmp)
+        documents = [resolve_refs(read_pfs(pfs, input_dir)) for pfs in pfs_ids]
+
+    print(f"{len(pfs_ids)} PFS, best of {args.repeat} runs")
+
+    def load_input():
+        return [copy.deepcopy(d) for d in documents]
+
+    separate = best_of(lambda docs: [separate_walks(d) for d in docs], load_input, args.repeat)
+    single = best_of(lambda docs: [single_walk(d) for d in docs], load_input, args.repeat)
+    print(f"bubble up + deprecated:  separate walks {separate * 1000:7.1f}ms, single walk {single * 1000:7.1f}ms")
+
+    def link_input():
+        return [(c, aliases(c)) for d in load_input() for c in containers(d)]
+
+    count = sum(len(anchors) for _, anchors in link_input())
+    separate = best_of(per_alias, link_input, args.repeat)
+    single = best_of(all_aliases, link_input, args.repeat)
+    print(f"{count} alias references:   per alias      {separate * 1000:7.1f}ms, all aliases {single * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
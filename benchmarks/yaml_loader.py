@@ -0,0 +1,53 @@
+"""
+Benchmarks reading all PFS with the strictyaml and the libyaml loader.
+
+Usage: python benchmarks/yaml_loader.py [-i path/to/ceos-ard] [-n 3]
+"""
+
+import argparse
+import tempfile
+import time
+
+from synthetic import corpus_argument, get_corpus
+
+from ceos_ard_cli.strictyaml.id_reference import BLOCK_CACHE
+from ceos_ard_cli.utils.files import FILE_CACHE
+from ceos_ard_cli.utils.pfs import read_pfs
+from ceos_ard_cli.utils.yaml import YAML_LOADERS, set_yaml_loader
+
+
+def run(input_dir, pfs_ids):
+    # parse the building blocks again instead of reusing them
+    BLOCK_CACHE.clear()
+    for pfs in pfs_ids:
+        read_pfs(pfs, input_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    corpus_argument(parser)
+    parser.add_argument("--repeat", "-n", type=int, default=3, help="Number of runs per loader")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir, pfs_ids = get_corpus(args.input_dir, tmp)
+        # warm up the file cache so that only parsing and validation is measured
+        run(input_dir, pfs_ids)
+        print(f"Reading {len(pfs_ids)} PFS ({len(FILE_CACHE)} files), best of {args.repeat} runs")
+
+        results = {}
+        for loader in YAML_LOADERS:
+            set_yaml_loader(loader)
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run(input_dir, pfs_ids)
+                timings.append(time.perf_counter() - start)
+            results[loader] = min(timings)
+            print(f"- {loader}: {results[loader]:.3f}s")
+
+        print(f"Speedup: {results['strictyaml'] / results['libyaml']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,43 @@
+import json
 import sys
 
 import click
 
-from .compile import compile as compile_
-from .generate import generate as generate_
-from .generate import generate_all as generate_all_
-from .validate import validate as validate_
 from .version import __version__
 
 
 @click.group()
 @click.version_option(version=__version__)
-def cli():
+@click.option(
+    "--yaml-loader",
+    type=click.Choice(["strictyaml", "libyaml"]),
+    default="strictyaml",
+    envvar="CEOS_ARD_YAML_LOADER",
+    show_default=True,
+    help="YAML parser for the building blocks, libyaml is faster but requires PyYAML with libyaml bindings",
+)
+@click.option(
+    "--prefetch",
+    type=click.IntRange(min=0),
+    default=0,
+    envvar="CEOS_ARD_PREFETCH",
+    show_default=True,
+    help="Reads all .yaml/.bib files with the given number of threads before parsing, 0 disables the prefetch",
+)
+def cli(yaml_loader, prefetch):
     """
     The CEOS ARD CLI.
     """
-    pass
+    from .utils.files import invalidate_snapshots, set_prefetch_workers
+    from .utils.yaml import set_yaml_loader
+
+    try:
+        set_yaml_loader(yaml_loader)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--yaml-loader")
+    set_prefetch_workers(prefetch)
+    # the files are checked on disk once per command, e.g. if several commands run in one process
+    invalidate_snapshots()
 
 
 @click.command()
@@ -52,10 +74,39 @@ def cli():
     default=False,
     help="Enables debugging mode, e.g. outputs a JSON file for debugging purposes and gives a stacktrace",
 )
-def compile(pfs, output, input_dir, editable, stable, debug):
+@click.option(
+    "--csl-json",
+    is_flag=True,
+    default=False,
+    help="Writes the bibliography as CSL-JSON, which pandoc reads faster than BibTeX",
+)
+@click.option(
+    "--crossref/--no-crossref",
+    default=True,
+    help="With --no-crossref, the sections are numbered and the @sec: references are resolved by the CLI "
+    "instead of the pandoc-crossref filter",
+)
+@click.option(
+    "--emit-artifact",
+    is_flag=True,
+    default=False,
+    help="Also writes the compiled document to a .artifact.json.gz file, see generate --from-artifact",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of processes that read the PFS of a combined document (Linux only). "
+    "The first PFS is always read before the others, so more processes only help for at least 3 PFS",
+)
+def compile(pfs, output, input_dir, editable, stable, debug, csl_json, crossref, emit_artifact, jobs):
     """
     Compiles the Markdown file for the given PFS.
     """
+    from .compile import compile as compile_
+
     pfs = list(pfs)
     print(f"CEOS-ARD CLI {__version__} - Compile {' + '.join(pfs)} as Markdown\n")
 
@@ -63,7 +114,18 @@ def compile(pfs, output, input_dir, editable, stable, debug):
         output = "-".join(pfs)
 
     try:
-        compile_(pfs, output, input_dir, editable=editable, stable=stable, debug=debug)
+        compile_(
+            pfs,
+            output,
+            input_dir,
+            editable=editable,
+            stable=stable,
+            debug=debug,
+            csl_json=csl_json,
+            crossref=crossref,
+            emit_artifact=emit_artifact,
+            jobs=jobs,
+        )
     except Exception as e:
         if debug:
             raise e
@@ -122,16 +184,102 @@ def compile(pfs, output, input_dir, editable, stable, debug):
     default=None,
     help="Overrides the PFS type of the document",
 )
-def generate(pfs, output, input_dir, self_contained, pdf, docx, stable, id, title, version, pfs_type):
+@click.option(
+    "--csl-json",
+    is_flag=True,
+    default=False,
+    help="Writes the bibliography as CSL-JSON, which pandoc reads faster than BibTeX",
+)
+@click.option(
+    "--crossref/--no-crossref",
+    default=True,
+    help="With --no-crossref, the sections are numbered and the @sec: references are resolved by the CLI "
+    "instead of the pandoc-crossref filter, which saves a pass over the document in pandoc",
+)
+@click.option(
+    "--optimize-images",
+    is_flag=True,
+    default=False,
+    help="Downsamples and recompresses the PNG and JPEG images before they are embedded (requires Pillow)",
+)
+@click.option(
+    "--image-max-size",
+    type=click.IntRange(min=1),
+    default=2000,
+    show_default=True,
+    help="With --optimize-images, the maximum width and height of the images in pixels",
+)
+@click.option(
+    "--image-max-dpi",
+    type=click.IntRange(min=1),
+    default=None,
+    help="With --optimize-images, the maximum resolution of images that specify a DPI",
+)
+@click.option(
+    "--image-quality",
+    type=click.IntRange(min=1, max=95),
+    default=85,
+    show_default=True,
+    help="With --optimize-images, the quality of the JPEG images, PNG images are compressed losslessly",
+)
+@click.option(
+    "--image-cache",
+    type=click.Path(file_okay=False),
+    default=None,
+    envvar="CEOS_ARD_IMAGE_CACHE",
+    help="With --optimize-images, the folder for the optimized images, defaults to ~/.cache/ceos-ard/images",
+)
+@click.option(
+    "--from-artifact",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Generates the documents from a compiled artifact (see compile --emit-artifact) without reading the YAML files",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of processes that read the PFS of a combined document (Linux only). "
+    "The first PFS is always read before the others, so more processes only help for at least 3 PFS",
+)
+def generate(
+    pfs,
+    output,
+    input_dir,
+    self_contained,
+    pdf,
+    docx,
+    stable,
+    id,
+    title,
+    version,
+    pfs_type,
+    csl_json,
+    crossref,
+    optimize_images,
+    image_max_size,
+    image_max_dpi,
+    image_quality,
+    image_cache,
+    from_artifact,
+    jobs,
+):
     """
     Generates the Word and HTML files for the given PFS.
 
     Requires that pandoc is installed.
     """
+    from .generate import generate as generate_
+    from .generate import generate_from_artifact
+
     pfs = list(pfs)
-    print(f"CEOS-ARD CLI {__version__} - Generate {' + '.join(pfs)}\n")
+    if from_artifact and (pfs or stable or id or title or version or pfs_type):
+        raise click.UsageError("The PFS and the metadata can't be changed for a compiled artifact")
+    print(f"CEOS-ARD CLI {__version__} - Generate {from_artifact or ' + '.join(pfs)}\n")
 
-    if not output:
+    if not output and not from_artifact:
         output = id or "-".join(pfs)
 
     metadata = {
@@ -142,7 +290,38 @@ def generate(pfs, output, input_dir, self_contained, pdf, docx, stable, id, titl
     }
 
     try:
-        generate_(pfs, output, input_dir, self_contained, pdf, docx, stable, metadata)
+        images = image_optimizer(optimize_images, image_max_size, image_max_dpi, image_quality, image_cache)
+        if from_artifact:
+            # the output defaults to the name of the compiled document
+            generate_from_artifact(
+                from_artifact,
+                output,
+                input_dir,
+                self_contained,
+                pdf,
+                docx,
+                csl_json,
+                crossref=crossref,
+                images=images,
+            )
+        else:
+            generate_(
+                pfs,
+                output,
+                input_dir,
+                self_contained,
+                pdf,
+                docx,
+                stable,
+                metadata,
+                csl_json,
+                crossref=crossref,
+                images=images,
+                jobs=jobs,
+            )
+        if images is not None:
+            stats = images.stats()
+            print(f"Optimized images: {stats['misses']} processed, {stats['hits']} from the cache")
     except Exception as e:
         print(e)
         sys.exit(1)
@@ -183,19 +362,226 @@ def generate(pfs, output, input_dir, self_contained, pdf, docx, stable, id, titl
     default=False,
     help="Removes the '-draft' suffix from the version number, e.g. 0.1.0-draft becomes 0.1.0",
 )
-def generate_all(output, input_dir, self_contained, pdf, docx, pfs, stable):
+@click.option(
+    "--csl-json",
+    is_flag=True,
+    default=False,
+    help="Writes the bibliography as CSL-JSON, which pandoc reads faster than BibTeX",
+)
+@click.option(
+    "--compile-jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of Markdown documents to compile in parallel",
+)
+@click.option(
+    "--pandoc-jobs",
+    type=click.IntRange(min=1),
+    default=2,
+    show_default=True,
+    help="Number of pandoc processes to run in parallel",
+)
+@click.option(
+    "--pdf-jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of PDFs to print with Chromium in parallel",
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    default=False,
+    help="Prints the tasks, their dependencies and their order without running them",
+)
+@click.option(
+    "--shard",
+    default=None,
+    callback=lambda ctx, param, value: parse_shard(value),
+    help="Only processes the PFS of the given shard i/n (e.g. 1/4), the PFS are split into n shards of similar cost",
+)
+@click.option(
+    "--timings",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="A manifest of a previous run, the times that the PFS took are used to balance the shards",
+)
+@click.option(
+    "--manifest",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Writes the PFS, the errors and the times to a JSON file, see merge-shards",
+)
+@click.option(
+    "--crossref/--no-crossref",
+    default=True,
+    help="With --no-crossref, the sections are numbered and the @sec: references are resolved by the CLI "
+    "instead of the pandoc-crossref filter, which saves a pass over the document in pandoc",
+)
+@click.option(
+    "--embed-cache",
+    is_flag=True,
+    default=False,
+    help="With --self-contained, encodes each asset only once for all HTML files instead of using pandoc to embed them",
+)
+@click.option(
+    "--optimize-images",
+    is_flag=True,
+    default=False,
+    help="Downsamples and recompresses the PNG and JPEG images before they are embedded (requires Pillow)",
+)
+@click.option(
+    "--image-max-size",
+    type=click.IntRange(min=1),
+    default=2000,
+    show_default=True,
+    help="With --optimize-images, the maximum width and height of the images in pixels",
+)
+@click.option(
+    "--image-max-dpi",
+    type=click.IntRange(min=1),
+    default=None,
+    help="With --optimize-images, the maximum resolution of images that specify a DPI",
+)
+@click.option(
+    "--image-quality",
+    type=click.IntRange(min=1, max=95),
+    default=85,
+    show_default=True,
+    help="With --optimize-images, the quality of the JPEG images, PNG images are compressed losslessly",
+)
+@click.option(
+    "--image-cache",
+    type=click.Path(file_okay=False),
+    default=None,
+    envvar="CEOS_ARD_IMAGE_CACHE",
+    help="With --optimize-images, the folder for the optimized images, defaults to ~/.cache/ceos-ard/images",
+)
+def generate_all(
+    output,
+    input_dir,
+    self_contained,
+    pdf,
+    docx,
+    pfs,
+    stable,
+    csl_json,
+    compile_jobs,
+    pandoc_jobs,
+    pdf_jobs,
+    plan,
+    shard,
+    timings,
+    manifest,
+    crossref,
+    embed_cache,
+    optimize_images,
+    image_max_size,
+    image_max_dpi,
+    image_quality,
+    image_cache,
+):
     """
     Generates all files for all PFS.
 
+    The stages of all PFS are pipelined, e.g. the PDF of one PFS is printed while the next PFS is compiled.
     Requires that pandoc is installed.
     """
+    from .generate import generate_all as generate_all_
+
     print(f"CEOS-ARD CLI {__version__} - Generate all PFS\n")
     pfs = list(pfs) if pfs is not None else []
     try:
-        errors = generate_all_(output, input_dir, self_contained, pdf, docx, pfs, stable)
+        images = image_optimizer(optimize_images, image_max_size, image_max_dpi, image_quality, image_cache)
+        errors = generate_all_(
+            output,
+            input_dir,
+            self_contained,
+            pdf,
+            docx,
+            pfs,
+            stable,
+            csl_json,
+            compile_jobs=compile_jobs,
+            pandoc_jobs=pandoc_jobs,
+            pdf_jobs=pdf_jobs,
+            plan=plan,
+            shard=shard,
+            timings=timings,
+            manifest=manifest,
+            crossref=crossref,
+            embed_cache=embed_cache,
+            images=images,
+        )
+        if plan:
+            return
+        print()
+        print(f"Done with {errors} errors")
+        sys.exit(1 if errors else 0)
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+
+
+@click.command()
+@click.argument("combinations", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--output",
+    "-o",
+    default=".",
+    help="Output directory for the combined documents, defaults to the current folder",
+)
+@click.option(
+    "--input-dir",
+    "-i",
+    default=".",
+    help="Input directory for PFS files, defaults to the current folder",
+)
+@click.option(
+    "--self-contained",
+    "-s",
+    is_flag=True,
+    default=False,
+    help="Generate self-contained HTML files",
+)
+@click.option("--pdf", is_flag=True, default=False, help="If provided, disables PDF generation")
+@click.option("--docx", is_flag=True, default=False, help="If provided, disables Word (docx) generation")
+@click.option(
+    "--stable",
+    "-r",
+    is_flag=True,
+    default=False,
+    help="Removes the '-draft' suffix from the version number, e.g. 0.1.0-draft becomes 0.1.0",
+)
+@click.option(
+    "--csl-json",
+    is_flag=True,
+    default=False,
+    help="Writes the bibliography as CSL-JSON, which pandoc reads faster than BibTeX",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of documents to generate in parallel, defaults to the number of processors",
+)
+def generate_matrix(combinations, output, input_dir, self_contained, pdf, docx, stable, csl_json, jobs):
+    """
+    Generates the combined documents for all PFS combinations in the given YAML file.
+
+    Each member PFS is only read once and the documents are generated in parallel.
+    Requires that pandoc is installed.
+    """
+    from .generate import generate_matrix as generate_matrix_
+
+    print(f"CEOS-ARD CLI {__version__} - Generate PFS combinations from {combinations}\n")
+    try:
+        errors = generate_matrix_(combinations, output, input_dir, self_contained, pdf, docx, stable, csl_json, jobs)
         print()
         print(f"Done with {errors} errors")
-        sys.exit(errors)
+        sys.exit(1 if errors else 0)
     except Exception as e:
         print(e)
         sys.exit(1)
@@ -208,22 +594,251 @@ def generate_all(output, input_dir, self_contained, pdf, docx, pfs, stable):
     default=".",
     help="Input directory for PFS files, defaults to the current folder",
 )
-def validate(input_dir):
+@click.option(
+    "--shard",
+    default=None,
+    callback=lambda ctx, param, value: parse_shard(value),
+    help="Only processes the PFS of the given shard i/n (e.g. 1/4), the PFS are split into n shards of similar cost",
+)
+@click.option(
+    "--timings",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="A manifest of a previous run, the times that the PFS took are used to balance the shards",
+)
+@click.option(
+    "--manifest",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Writes the PFS, the errors and the times to a JSON file, see merge-shards",
+)
+def validate(input_dir, shard, timings, manifest):
     """
     Validates (most of) the building blocks.
     """
+    from .validate import validate as validate_
+
     print(f"CEOS-ARD CLI {__version__} - Validate building blocks\n")
     try:
-        validate_(input_dir)
+        errors = validate_(input_dir, shard, timings, manifest)
     except Exception as e:
         print(e)
         sys.exit(1)
+    sys.exit(1 if errors else 0)
+
+
+@click.command()
+@click.argument("manifests", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Writes the merged manifest to the given JSON file",
+)
+def merge_shards(manifests, output):
+    """
+    Merges the manifests of all shards of a generate-all or validate run.
+
+    Fails if there are errors in any shard or if shards are missing.
+    """
+    from .shard import merge_manifests
+    from .utils.files import write_file
+
+    print(f"CEOS-ARD CLI {__version__} - Merge shards\n")
+    try:
+        merged, problems = merge_manifests(manifests)
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+
+    for pfs, entry in merged["pfs"].items():
+        print(f"- {pfs}: {entry['errors']} errors")
+    if "unused_files" in merged:
+        print("Files not referenced by any PFS (none of them gets validated)")
+        for file in merged["unused_files"]:
+            print(f"- {file}")
+    if "unused_assets" in merged:
+        print("Assets not referenced by any PFS or template")
+        for asset in merged["unused_assets"]:
+            print(f"- {asset}")
+    for problem in problems:
+        print(f"ERROR: {problem}")
+    if output:
+        write_file(output, json.dumps(merged, indent=2))
+    print()
+    print(f"Done with {merged['errors']} errors in {merged['shards']} shards")
+    sys.exit(1 if problems or merged["errors"] else 0)
+
+
+@click.command()
+@click.option(
+    "--input-dir",
+    "-i",
+    default=".",
+    help="Input directory for PFS files, defaults to the current folder",
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Prints the statistics as plain text tables or as JSON",
+)
+@click.option(
+    "--top",
+    "-n",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="The number of building blocks, PFS, files and texts that are listed",
+)
+def stats(input_dir, format_, top):
+    """
+    Shows statistics about the building blocks and which of them dominate the compile time.
+
+    Loads and renders all PFS once and reports the files per kind, the fan-out and reference depth
+    of the building blocks, the parse time per file and the re-parse amplification of the loader,
+    the compile time per PFS and the largest Markdown texts.
+    """
+    from .stats import corpus_stats, format_stats
+
+    try:
+        result = corpus_stats(input_dir, top)
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+
+    if format_ == "json":
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"CEOS-ARD CLI {__version__} - Statistics\n")
+        print(format_stats(result, top))
+
+
+@click.command()
+@click.option(
+    "--term",
+    multiple=True,
+    help="Building blocks that use the glossary term with the given id, e.g. dem",
+)
+@click.option(
+    "--reference",
+    multiple=True,
+    help="Building blocks that cite the reference with the given id",
+)
+@click.option(
+    "--alias",
+    multiple=True,
+    help="Building blocks that depend on the given building block through `dependencies` or `sections`",
+)
+@click.option(
+    "--title",
+    multiple=True,
+    help="Building blocks that reference the title of the given building block with @title:",
+)
+@click.option(
+    "--word",
+    multiple=True,
+    help="Building blocks with all of the given words in the title (or glossary term)",
+)
+@click.option(
+    "--block",
+    multiple=True,
+    help="Building blocks and PFS that include the given building block, e.g. general/metadata",
+)
+@click.option(
+    "--input-dir",
+    "-i",
+    default=".",
+    help="Input directory for PFS files, defaults to the current folder",
+)
+@click.option(
+    "--index",
+    "index_file",
+    type=click.Path(dir_okay=False),
+    default=None,
+    envvar="CEOS_ARD_INDEX",
+    help="The file that stores the index, defaults to a file per input directory in ~/.cache/ceos-ard/index",
+)
+@click.option(
+    "--rebuild",
+    is_flag=True,
+    default=False,
+    help="Indexes all files again instead of only the files that changed since the last query",
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Prints the results as a list or as JSON",
+)
+def query(term, reference, alias, title, word, block, input_dir, index_file, rebuild, format_):
+    """
+    Finds the building blocks and PFS that use a glossary term, a reference or another building block.
+
+    All given filters must match. The index is updated incrementally, only changed files are read again.
+    """
+    from .index import open_index
+
+    filters = {"term": term, "reference": reference, "alias": alias, "title": title, "word": word, "block": block}
+    filters = {kind: values for kind, values in filters.items() if values}
+    if not filters:
+        raise click.UsageError("At least one of --term, --reference, --alias, --title, --word or --block is required")
+
+    try:
+        index, updated = open_index(input_dir, index_file, rebuild)
+        result = index.query(**filters)
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+
+    if format_ == "json":
+        print(json.dumps(result, indent=2))
+        return
+    if updated:
+        print(f"Indexed {len(updated)} changed files")
+    for path, error in index.errors().items():
+        if path in updated:
+            print(f"WARNING: {path} could not be indexed: {error}")
+    print(f"Building blocks ({len(result['blocks'])})")
+    for entry in result["blocks"]:
+        print(f"- {entry['path']}" + (f": {entry['title']}" if entry["title"] else ""))
+    print(f"PFS ({len(result['pfs'])})")
+    for pfs in result["pfs"]:
+        print(f"- {pfs}")
+
+
+def parse_shard(value):
+    if value is None:
+        return None
+    from .shard import parse_shard as parse_shard_
+
+    try:
+        return parse_shard_(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def image_optimizer(optimize, max_size, max_dpi, quality, cache_dir):
+    if not optimize:
+        return None
+    from .utils.images import DEFAULT_CACHE_DIR, ImageOptimizer
+
+    return ImageOptimizer(cache_dir or DEFAULT_CACHE_DIR, max_size, max_dpi, quality)
 
 
 cli.add_command(compile)
 cli.add_command(generate)
 cli.add_command(generate_all)
+cli.add_command(generate_matrix)
 cli.add_command(validate)
+cli.add_command(merge_shards)
+cli.add_command(stats)
+cli.add_command(query)
 
 if __name__ == "__main__":
     cli()
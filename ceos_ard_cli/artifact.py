@@ -0,0 +1,89 @@
+"""
+A compiled PFS document that generate can render without the YAML files of the corpus,
+e.g. to compile once on a CI runner and render the documents on several others.
+
+The artifact is a gzip-compressed JSON file (see compile --emit-artifact) that contains
+- the resolved context for the template (see compile.resolve_context),
+- the references as BibTeX and CSL-JSON, and
+- a manifest of the SHA-256 hashes of all files that have been read to compile it.
+
+Rendering it only needs the templates and the assets of the corpus.
+"""
+
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+from .utils.files import fix_path, read_file
+from .version import __version__
+
+ARTIFACT_FORMAT = "ceos-ard-compiled-pfs"
+# Increase if the structure of the artifact or the context changes incompatibly
+ARTIFACT_VERSION = 1
+ARTIFACT_EXTENSION = ".artifact.json.gz"
+# The files that are read again when the artifact is rendered
+RENDER_FOLDERS = ("templates",)
+
+
+def hash_files(files, input_dir):
+    """Returns the SHA-256 hashes of the files by their path relative to the input directory."""
+    input_dir = Path(input_dir)
+    hashes = {}
+    for file in sorted(files):
+        path = Path(file)
+        try:
+            name = fix_path(path.relative_to(input_dir))
+        except ValueError:
+            name = fix_path(path)
+        hashes[name] = hashlib.sha256(read_file(path).encode("utf-8")).hexdigest()
+    return hashes
+
+
+def write_artifact(file, name, pfs, context, bibtex, csl_json, inputs, input_dir):
+    """Writes a compiled document, `inputs` are the absolute paths of the files that have been read."""
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "generator": f"ceos-ard-cli {__version__}",
+        "name": name,
+        "pfs": list(pfs),
+        "inputs": hash_files(inputs, input_dir),
+        "context": context,
+        "bibtex": bibtex,
+        "csl_json": csl_json,
+    }
+    data = json.dumps(artifact, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # mtime=0 keeps the artifact byte-identical for the same inputs
+    with gzip.GzipFile(file, "wb", mtime=0) as f:
+        f.write(data)
+
+
+def read_artifact(file):
+    """Reads a compiled document and checks that this version of the CLI can render it."""
+    try:
+        with gzip.open(file, "rb") as f:
+            artifact = json.loads(f.read().decode("utf-8"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{file} is not a compiled PFS artifact: {e}")
+    if not isinstance(artifact, dict) or artifact.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{file} is not a compiled PFS artifact")
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(
+            f"{file} has version {artifact.get('version')} of the artifact format, "
+            f"but only version {ARTIFACT_VERSION} is supported, compile it again with this version of the CLI"
+        )
+    return artifact
+
+
+def changed_inputs(artifact, input_dir):
+    """The files that are read again for rendering (e.g. the template) and have changed since compiling."""
+    input_dir = Path(input_dir)
+    changed = []
+    for name, digest in artifact["inputs"].items():
+        if name.split("/")[0] not in RENDER_FOLDERS:
+            continue
+        file = input_dir / name
+        if not file.is_file() or hashlib.sha256(read_file(file).encode("utf-8")).hexdigest() != digest:
+            changed.append(name)
+    return changed
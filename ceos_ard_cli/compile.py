@@ -1,17 +1,28 @@
+import json
 import logging
+import multiprocessing
+import os
 import re
+import shutil
+import sys
+import threading
 from collections import defaultdict
 from pathlib import Path
 from typing import Union
+from urllib.parse import unquote
 
-from dirsync import sync
-
+from .artifact import ARTIFACT_EXTENSION, write_artifact
+from .crossref import read_settings, resolve_crossrefs
 from .links import resolve_links, resolve_titles
+from .model import Interner, PfsDocument
 from .schema import REFERENCE_PATH, get_empty_requirement_part
-from .utils.deprecation import find_deprecated
-from .utils.files import read_file, write_file
+from .utils.bibtex import read_bibtex, to_csl_json
+from .utils.deprecation import FindDeprecated
+from .utils.files import FILE_CACHE, add_reads, fix_path, log_reads, read_file, write_file
 from .utils.pfs import read_pfs
 from .utils.template import read_template
+from .utils.visitor import Handler, walk
+from .utils.workers import process_pool
 
 
 def topological_sort_requirements(
@@ -127,21 +138,21 @@ def unique_merge(existing, additional, key=None):
 
 
 def bubble_up(root):
-    return _bubble_up(root, root)
+    return walk(root, BubbleUp(root))
+
+
+class BubbleUp(Handler):
+    """Moves the glossary and references of all building blocks to the top level."""
 
+    def __init__(self, root):
+        self.root = root
 
-def _bubble_up(data, root):
-    if isinstance(data, dict):
-        if "glossary" in data:
-            root["glossary"] = unique_merge(root["glossary"], data["glossary"], "term")
-        if "references" in data:
-            root["references"] = unique_merge(root["references"], data["references"])
-        for v in data.values():
-            _bubble_up(v, root)
-    elif isinstance(data, list):
-        for v in data:
-            _bubble_up(v, root)
-    return root
+    def visit(self, node, parent, key):
+        if isinstance(node, dict):
+            if "glossary" in node:
+                self.root["glossary"] = unique_merge(self.root["glossary"], node["glossary"], "term")
+            if "references" in node:
+                self.root["references"] = unique_merge(self.root["references"], node["references"])
 
 
 def to_id_dict(data):
@@ -318,6 +329,229 @@ def resolve_refs(data):
     return data
 
 
+def load_pfs(pfs: str, input_dir: Union[Path, str]):
+    """
+    Read the PFS information, resolve the ref/replace/append patterns and
+    move the glossary and references to the top level.
+
+    """
+    data = resolve_refs(read_pfs(pfs, input_dir))
+    # a single walk for both
+    deprecated = FindDeprecated(data)
+    walk(data, BubbleUp(data), deprecated)
+    for descriptor in deprecated.result():
+        print(f"WARNING [{pfs}]: {descriptor} is deprecated")
+    return data
+
+
+def load_document(pfs: str, input_dir: Union[Path, str], interner: Interner = None):
+    """
+    Load the PFS (see `load_pfs`) into the compact model, building blocks that are
+    shared with other documents loaded with the same interner are only stored once.
+
+    The result can be passed to compile (see `loaded`) multiple times.
+    """
+    return PfsDocument.from_dict(load_pfs(pfs, input_dir), interner)
+
+
+def load_member(pfs: str, input_dir: Union[Path, str]):
+    """Loads a PFS in a worker process (see load_members), returns the data and the files that have been read."""
+    with log_reads() as files:
+        data = load_pfs(pfs, input_dir)
+    return data, files
+
+
+def load_members(pfs: list[str], input_dir: Union[Path, str], jobs: int = 1):
+    """
+    Loads the PFS (see load_pfs) of a combined document, the results are in the given order.
+
+    The member PFS share most of their building blocks, which are only parsed once per process
+    (see IdReference). So the first PFS is loaded in this process and the others in up to `jobs`
+    forked processes, which start with the building blocks of the first PFS in their caches
+    and only parse the building blocks that the first PFS doesn't use.
+    So at least 3 PFS are needed to load any of them in parallel.
+    Loads all PFS in this process on other platforms than Linux, where forking is unavailable (Windows)
+    or unsafe (macOS).
+    """
+    jobs = min(jobs or os.cpu_count() or 1, len(pfs) - 1)
+    if jobs <= 1 or not sys.platform.startswith("linux"):
+        return [load_pfs(p, input_dir) for p in pfs]
+
+    members = [load_pfs(pfs[0], input_dir)]
+    with process_pool(jobs, multiprocessing.get_context("fork")) as executor:
+        for data, files in executor.map(load_member, pfs[1:], [input_dir] * (len(pfs) - 1)):
+            # e.g. for the manifest of the artifact
+            add_reads(files)
+            members.append(data)
+    return members
+
+
+# Matches the link targets that can reference assets (e.g. images), which may be URL-encoded or contain spaces:
+# - Markdown links and images, e.g. ![fig](assets/my%20fig.png "Title") or [pdf](<assets/my file.pdf>)
+# - Markdown link reference definitions, e.g. [fig]: assets/fig.png
+# - HTML attributes, e.g. <img src="assets/my fig.png">
+# - CSS URLs, e.g. url('assets/logo.png')
+TARGET_PATTERNS = [
+    re.compile(r"\]\(\s*(?:<([^>\n]*)>|([^)\n]*?))(?:\s+(?:\"[^\"\n]*\"|'[^'\n]*'))?\s*\)"),
+    re.compile(r"^[ ]{0,3}\[[^\]\n]+\]:[ \t]*(?:<([^>\n]*)>|(\S+))", re.MULTILINE),
+    re.compile(r"\b(?:src|href|poster|data)\s*=\s*(?:\"([^\"]*)\"|'([^']*)')", re.IGNORECASE),
+    re.compile(r"\burl\(\s*(?:\"([^\"]*)\"|'([^']*)'|([^)\s]*))\s*\)"),
+]
+# Matches the paths of the assets outside of link targets, e.g. in Lua filters
+ASSET_PATTERN = re.compile(r"(?<![A-Za-z0-9_.-])assets/[A-Za-z0-9_./-]*[A-Za-z0-9_-]")
+# The template files that can reference assets, e.g. a logo in the HTML template
+TEMPLATE_EXTENSIONS = (".md", ".html", ".css", ".js", ".lua")
+
+
+def asset_path(target: str):
+    """The path of the asset that a link target references (relative to the input directory) or None."""
+    path = unquote(target.strip().split("#", 1)[0].split("?", 1)[0]).removeprefix("./")
+    if path.startswith("assets/") and path.rstrip("/") != "assets":
+        return path
+    return None
+
+
+def asset_paths(text: str):
+    """The paths of all assets that are referenced in a Markdown, HTML or CSS text."""
+    assets = set()
+
+    def add_target(match):
+        target = next((group for group in match.groups() if group), "")
+        path = asset_path(target)
+        if path is not None:
+            assets.add(path)
+        return " "
+
+    for pattern in TARGET_PATTERNS:
+        # remove the link targets, so that a path with spaces isn't also found in parts by ASSET_PATTERN
+        text = pattern.sub(add_target, text)
+    assets.update(ASSET_PATTERN.findall(text))
+    return assets
+
+
+def missing_assets(text: str, folder: Path):
+    """The assets that are referenced in a text but don't exist in the given folder."""
+    return sorted(asset for asset in asset_paths(text) if not (Path(folder) / asset).exists())
+
+
+class FindAssets(Handler):
+    def __init__(self):
+        self.assets = set()
+
+    def visit(self, node, parent, key):
+        for value in node.values() if isinstance(node, dict) else node:
+            if isinstance(value, str):
+                self.assets.update(asset_paths(value))
+
+
+def find_assets(data):
+    """The paths (relative to the input directory) of all assets that are referenced in a document."""
+    handler = FindAssets()
+    walk(data, handler)
+    return sorted(handler.assets)
+
+
+def template_assets(input_dir: Path):
+    """The paths of all assets that are referenced in the templates."""
+    assets = set()
+    templates = Path(input_dir) / "templates"
+    if templates.is_dir():
+        for file in sorted(templates.iterdir()):
+            if file.suffix in TEMPLATE_EXTENSIONS and file.is_file():
+                assets.update(asset_paths(read_file(file)))
+    return assets
+
+
+def referenced_assets(input_dir: Path, markdown: str):
+    """
+    The asset files (relative to the input directory) that a compiled document references,
+    either in its Markdown or in the templates. Folders are expanded to the files in them,
+    the assets that don't exist are reported.
+    """
+    assets = asset_paths(markdown) | template_assets(input_dir)
+    for asset in sorted(asset for asset in assets if not (Path(input_dir) / asset).exists()):
+        print(f"WARNING: {asset} is referenced but doesn't exist in the input directory")
+    return expand_assets(input_dir, assets)
+
+
+def expand_assets(input_dir: Path, assets):
+    """The existing asset files for the given asset paths, folders are expanded to the files in them."""
+    input_dir = Path(input_dir)
+    files = set()
+    for asset in assets:
+        path = input_dir / asset
+        if path.is_file():
+            files.add(fix_path(Path(asset)))
+        elif path.is_dir():
+            files.update(fix_path(f.relative_to(input_dir)) for f in path.rglob("*") if f.is_file())
+    return sorted(files)
+
+
+def sync_assets(input_dir: Path, folder: Path, debug: bool = False, only: list = None, images=None):
+    """
+    Sync the assets to the output folder (copy new/changed files, remove stale ones).
+
+    If `only` is given, only these assets (see referenced_assets) are copied,
+    the images are optimized with the given ImageOptimizer (see utils/images.py) if any.
+    Other assets that are already in the output folder are kept, e.g. for other documents in the folder.
+    """
+    assets_target = folder / "assets"
+    assets_source = input_dir / "assets"
+    if assets_source == assets_target:
+        return
+    if only is not None:
+        copy_assets(input_dir, folder, only, debug, images)
+        return
+
+    # imported lazily to keep the CLI startup fast
+    from dirsync import sync
+
+    logger = logging.getLogger("ceos_ard_cli.dirsync")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.addHandler(logging.StreamHandler() if debug else logging.NullHandler())
+    logger.setLevel(logging.INFO if debug else logging.CRITICAL)
+    sync(str(assets_source), str(assets_target), "sync", create=True, purge=True, content=True, logger=logger)
+
+
+def copy_assets(input_dir: Path, folder: Path, assets: list, debug: bool = False, images=None):
+    """Copies the new/changed assets to the output folder and removes the ones that don't exist anymore."""
+    copied = 0
+    for asset in assets:
+        source = input_dir / asset
+        if images is not None:
+            source = images.optimize(source)
+        target = folder / asset
+        stat = source.stat()
+        try:
+            current = target.stat()
+            if current.st_size == stat.st_size and current.st_mtime_ns >= stat.st_mtime_ns:
+                continue
+        except OSError:
+            target.parent.mkdir(parents=True, exist_ok=True)
+        # copy to a temporary file first, parallel compilations may copy the same asset
+        temp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copy2(source, temp)
+        os.replace(temp, target)
+        copied += 1
+
+    # remove the assets that have been removed from the input directory
+    removed = 0
+    assets_target = folder / "assets"
+    for file in sorted(assets_target.rglob("*"), reverse=True) if assets_target.is_dir() else []:
+        if not (input_dir / file.relative_to(folder)).exists() and not file.name.endswith(".tmp"):
+            if file.is_dir():
+                try:
+                    file.rmdir()
+                except OSError:
+                    continue  # e.g. still contains assets of another document
+            else:
+                file.unlink(missing_ok=True)
+            removed += 1
+    if debug:
+        print(f"Assets: {len(assets)} referenced, {copied} copied, {removed} removed")
+
+
 def compile(
     pfs: Union[list[str], str],
     out: Union[Path, str],
@@ -326,6 +560,13 @@ def compile(
     stable: bool = False,
     metadata: dict = {},
     debug: bool = False,
+    csl_json: bool = False,
+    loaded: dict = None,
+    assets: bool = True,
+    crossref: bool = True,
+    images=None,
+    emit_artifact: bool = False,
+    jobs: int = 1,
 ):
     if isinstance(pfs, str):
         pfs = [pfs]
@@ -333,26 +574,76 @@ def compile(
     folder = Path(out).parent
     # create folder if needed
     folder.mkdir(parents=True, exist_ok=True)
-    # sync assets (copy new/changed files, remove stale ones)
-    assets_target = folder / "assets"
     input_dir = Path(input_dir).resolve()
-    assets_source = input_dir / "assets"
-    if assets_source != assets_target:
-        logger = logging.getLogger("ceos_ard_cli.dirsync")
-        logger.handlers.clear()
-        logger.propagate = False
-        logger.addHandler(logging.StreamHandler() if debug else logging.NullHandler())
-        logger.setLevel(logging.INFO if debug else logging.CRITICAL)
-        sync(str(assets_source), str(assets_target), "sync", create=True, purge=True, content=True, logger=logger)
 
+    # record the files that the compilation reads for the manifest of the artifact
+    with log_reads() as inputs:
+        out, context, bibtex, csl = compile_context(
+            pfs, out, input_dir, stable, metadata, debug, loaded, csl_json=csl_json or emit_artifact, jobs=jobs
+        )
+        markdown = render_markdown(context, f"{out}.md", editable, input_dir, crossref)
+    # only copy the assets that the document references
+    if assets:
+        sync_assets(input_dir, folder, debug, only=referenced_assets(input_dir, markdown), images=images)
+    # write bibtex file to disk
+    write_file(f"{out}.bib", bibtex)
+    # write CSL-JSON file to disk, which pandoc reads without parsing BibTeX
+    if csl_json:
+        write_file(f"{out}.csl.json", json.dumps(csl, indent=2, ensure_ascii=False))
+    # the resolved document, which generate can render without the YAML files
+    if emit_artifact:
+        write_artifact(f"{out}{ARTIFACT_EXTENSION}", out.name, pfs, context, bibtex, csl, inputs, input_dir)
+
+    return out
+
+
+def compile_artifact(
+    artifact: dict,
+    out: Union[Path, str],
+    input_dir: Union[Path, str],
+    editable: bool = False,
+    csl_json: bool = False,
+    assets: bool = True,
+    crossref: bool = True,
+    images=None,
+):
+    """
+    Writes the same files as compile for a compiled document (see artifact.read_artifact),
+    only the templates and the assets are read from the input directory.
+    """
+    out = Path(out)
+    folder = out.parent
+    folder.mkdir(parents=True, exist_ok=True)
+    input_dir = Path(input_dir).resolve()
+
+    markdown = render_markdown(artifact["context"], f"{out}.md", editable, input_dir, crossref)
+    if assets:
+        sync_assets(input_dir, folder, only=referenced_assets(input_dir, markdown), images=images)
+    write_file(f"{out}.bib", artifact["bibtex"])
+    if csl_json:
+        write_file(f"{out}.csl.json", json.dumps(artifact["csl_json"], indent=2, ensure_ascii=False))
+
+    return out
+
+
+def compile_context(pfs, out, input_dir, stable=False, metadata={}, debug=False, loaded=None, csl_json=False, jobs=1):
+    """
+    Reads, combines and resolves the PFS (see resolve_context) and reads the references.
+    The PFS that have not been loaded yet are read with up to `jobs` processes (see load_members).
+
+    Returns the output path (with the version for stable documents), the resolved context,
+    the BibTeX and the CSL-JSON items of the references (None if csl_json is False).
+    """
+    out = Path(out)
+    missing = [p for p in pfs if loaded is None or p not in loaded]
+    members = dict(zip(missing, load_members(missing, input_dir, jobs)))
     multi_pfs = {}
     for p in pfs:
-        # read the PFS information,
-        # resolve ref/replace/append patterns and
-        # move the glossary and references to the top level
-        multi_pfs[p] = bubble_up(resolve_refs(read_pfs(p, input_dir)))
-        for descriptor in find_deprecated(multi_pfs[p]):
-            print(f"WARNING [{p}]: {descriptor} is deprecated")
+        if p in members:
+            multi_pfs[p] = members[p]
+        else:
+            # the compilation modifies the data in place, so work on fresh dicts
+            multi_pfs[p] = loaded[p].to_dict()
 
     if len(pfs) > 1:
         data = combine_pfs(multi_pfs)
@@ -379,19 +670,20 @@ def compile(
 
     # write a json file for debugging
     if debug:
-        import json
-
         write_file(f"{out}.debug.json", json.dumps(data, indent=2))
+        stats = FILE_CACHE.stats()
+        print(
+            f"File cache: {stats['entries']} files, {stats['bytes']} bytes, "
+            f"{stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions"
+        )
 
-    # create the markfown template
-    compile_markdown(data, f"{out}.md", editable, input_dir)
-    # write bibtex file to disk
-    compile_bibtex(data, f"{out}.bib", input_dir)
-
-    return out
+    context = resolve_context(data, input_dir)
+    csl = compile_csl_json(data, input_dir) if csl_json else None
+    return out, context, compile_bibtex(data, input_dir), csl
 
 
-def compile_bibtex(data, out, input_dir: Path):
+def compile_bibtex(data, input_dir: Path):
+    """Returns the merged BibTeX of all references of the document."""
     input_dir = Path(input_dir).resolve()
     references = []
     # Read references form disk
@@ -400,9 +692,18 @@ def compile_bibtex(data, out, input_dir: Path):
         bibtex = read_file(filepath)
         references.append(bibtex)
     # Merge into a single string
-    merged_bibtex = "\n".join(references)
-    # Write a single bibtex file back to disk
-    write_file(out, merged_bibtex)
+    return "\n".join(references)
+
+
+def compile_csl_json(data, input_dir: Path):
+    """Returns the references of the document as CSL-JSON items, which pandoc reads without parsing BibTeX."""
+    input_dir = Path(input_dir).resolve()
+    items = []
+    # Reuse the references that have been parsed during validation
+    for ref in data["references"]:
+        filepath = input_dir / REFERENCE_PATH.format(id=ref)
+        items.extend(to_csl_json(read_bibtex(filepath)))
+    return items
 
 
 # Note: This function is not used for the append/replace functionality
@@ -415,34 +716,49 @@ def append_requirement(target, req):
     target["metadata"].update(req["metadata"])
 
 
-def compile_markdown(data, out, editable, input_dir: Path):
+def merge_requirement_parts(req):
+    threshold = None
+    goal = None
+    for reqname in req["requirements"]:
+        subreq = req["requirements"][reqname]
+        if subreq.get("optional", False):
+            if goal is None:
+                goal = get_empty_requirement_part()
+            append_requirement(goal, subreq)
+        else:
+            if threshold is None:
+                threshold = get_empty_requirement_part()
+            append_requirement(threshold, subreq)
+
+    return {**req, "threshold": threshold, "goal": goal}
+
+
+def compile_markdown(data, out, editable, input_dir: Path, crossref: bool = True):
+    return render_markdown(resolve_context(data, input_dir), out, editable, input_dir, crossref)
+
+
+def resolve_context(data, input_dir: Path):
+    """
+    Resolves the references in a PFS document and returns the context for the template.
+
+    The context only depends on the building blocks, not on the editable flag,
+    so it can be rendered several times (see render_markdown) or stored in an artifact.
+    """
     input_dir = Path(input_dir).resolve()
     # create a copy of the data for the template
     context = data.copy()
 
-    context["editable"] = editable
     # sort glossary
     context["glossary"] = sorted(context["glossary"], key=lambda x: x["term"].lower())
     # todo: Derive changelogs automatically
 
-    # Merge individual requirements into goal and threshold requirements
-    for block in context["requirements"]:
-        for idx, req in enumerate(block["requirements"]):
-            threshold = None
-            goal = None
-            for reqname in req["requirements"]:
-                subreq = req["requirements"][reqname]
-                if subreq.get("optional", False):
-                    if goal is None:
-                        goal = get_empty_requirement_part()
-                    append_requirement(goal, subreq)
-                else:
-                    if threshold is None:
-                        threshold = get_empty_requirement_part()
-                    append_requirement(threshold, subreq)
-
-            req["threshold"] = threshold
-            req["goal"] = goal
+    # Merge individual requirements into goal and threshold requirements.
+    # The requirements are shared building blocks (see IdReference), so they are
+    # not modified in place, but the merged parts are added to shallow copies.
+    context["requirements"] = [
+        {**block, "requirements": [merge_requirement_parts(req) for req in block["requirements"]]}
+        for block in context["requirements"]
+    ]
 
     # replace the @title: references in the texts with the titles of the
     # referenced building blocks (soft references, read directly from disk);
@@ -453,8 +769,17 @@ def compile_markdown(data, out, editable, input_dir: Path):
     errors += resolve_links(context, input_dir)
     if errors:
         raise ValueError("\n".join(errors))
+    return context
 
+
+def render_markdown(context, out, editable, input_dir: Path, crossref: bool = True):
+    """Renders the template for a resolved context (see resolve_context) and writes the Markdown."""
+    input_dir = Path(input_dir).resolve()
     # read, fill and write the template
     template = read_template(input_dir)
-    markdown = template.render(**context)
+    markdown = template.render({**context, "editable": editable})
+    # number the sections and resolve the @sec: references here instead of with pandoc-crossref
+    if not crossref:
+        markdown = resolve_crossrefs(markdown, context.get("section_anchors"), read_settings(input_dir))
     write_file(out, markdown)
+    return markdown
@@ -0,0 +1,269 @@
+"""
+Numbers the sections of a compiled Markdown document and resolves the @sec: references in the same way
+as the pandoc-crossref filter, so that pandoc can run without the filter (see compile with crossref=False).
+
+Only section references are supported, as the templates only generate sections (requirements, annexes,
+introduction sections and requirement categories are all sections):
+- @sec:id, [@sec:id] and [@sec:a; @sec:b] (with the plural prefix and ranges of consecutive sections)
+- @Sec:id (capitalized prefix) and [-@sec:id] (without prefix)
+- the secPrefix, linkReferences and rangeDelim settings in the YAML front matter of the document
+  or in the pandoc-crossref.yaml file that pandoc-crossref reads from the input directory
+
+Other settings that change the numbering or the references (see UNSUPPORTED_SETTINGS), references
+to figures, tables, equations or listings and groups that mix section references with citations
+(e.g. [@sec:a; @smith2020]) raise an error, as the result would differ from pandoc-crossref.
+The numbered headings must include the anchors of all sections of the document (see resolve_links).
+References in code blocks and inline code spans are kept as-is.
+"""
+
+import re
+from pathlib import Path
+
+import strictyaml
+
+from .utils.files import read_file
+
+# The defaults of pandoc-crossref
+DEFAULT_PREFIX = ["sec.", "secs."]
+REFERENCE_DELIMITER = ", "
+DEFAULT_RANGE_DELIMITER = "-"
+# The settings file of pandoc-crossref in the folder that pandoc runs in (see pandoc_command)
+SETTINGS_FILE = "pandoc-crossref.yaml"
+# The settings of pandoc-crossref that change the section numbers or the references
+UNSUPPORTED_SETTINGS = (
+    "autoSectionLabels",
+    "chapters",
+    "chaptersDepth",
+    "chapDelim",
+    "crossrefYaml",
+    "cref",
+    "lastDelim",
+    "nameInLink",
+    "numberSections",
+    "pairDelim",
+    "refDelim",
+    "refIndexTemplate",
+    "secHeaderDelim",
+    "secHeaderTemplate",
+    "secLabels",
+    "secPrefixTemplate",
+    "sectionsDepth",
+)
+
+HEADING = re.compile(r"^(#{1,6})[ \t]+(.*?)[ \t]*(?:\{([^}]*)\})?[ \t]*$")
+FENCE = re.compile(r"^[ \t]{0,3}(`{3,}|~{3,})")
+# e.g. -@Sec:label, not preceded by a word character (e.g. in e-mail addresses)
+REFERENCE = re.compile(r"(?<![A-Za-z0-9_@])(-?)@([Ss])ec:([A-Za-z0-9_](?:[A-Za-z0-9_:.#$%&+?<>~/-]*[A-Za-z0-9_])?)")
+# e.g. [@sec:a; -@sec:b]
+GROUP = re.compile(r"\[((?:-?@[Ss]ec:[^;\]\s]+[ \t]*;[ \t]*)*-?@[Ss]ec:[^;\]\s]+)\]")
+# e.g. [@sec:a; @smith2020], the items of a citation group with several items
+CITATION_GROUP = re.compile(r"\[((?:-?@[^;\[\]\s]+[ \t]*;[ \t]*)+-?@[^;\[\]\s]+)\]")
+BACKTICKS = re.compile(r"`+")
+# The references to other kinds of pandoc-crossref labels, e.g. @fig:logo
+OTHER_REFERENCE = re.compile(
+    r"(?<![A-Za-z0-9_@])-?@(?:[Ff]ig|[Tt]bl|[Ee]q|[Ll]st):[A-Za-z0-9_](?:[A-Za-z0-9_:.#$%&+?<>~/-]*[A-Za-z0-9_])?"
+)
+
+
+def outside_fences(lines):
+    """Yields the index and line of all lines that are not part of a fenced code block."""
+    fence = None
+    for i, line in enumerate(lines):
+        match = FENCE.match(line)
+        if match:
+            marker = match.group(1)
+            if fence is None:
+                fence = marker
+            elif marker[0] == fence[0] and len(marker) >= len(fence):
+                fence = None
+        elif fence is None:
+            yield i, line
+
+
+def split_code_spans(line):
+    """
+    Splits a line into text and inline code spans, returns a list of (is_code, part).
+
+    A code span starts with a run of backticks and ends with a run of the same length,
+    backticks without a matching run are text. Code spans that continue on the next line are not detected.
+    """
+    parts = []
+    start = 0  # start of the current text
+    position = 0
+    while True:
+        opening = BACKTICKS.search(line, position)
+        if opening is None:
+            break
+        if opening.start() > 0 and line[opening.start() - 1] == "\\":
+            # an escaped backtick, the rest of the run can still open a code span
+            position = opening.start() + 1
+            continue
+        marker = opening.group(0)
+        closing = next((m for m in BACKTICKS.finditer(line, opening.end()) if m.group(0) == marker), None)
+        if closing is None:
+            position = opening.end()
+            continue
+        parts.append((False, line[start : opening.start()]))
+        parts.append((True, line[opening.start() : closing.end()]))
+        start = position = closing.end()
+    parts.append((False, line[start:]))
+    return parts
+
+
+def outside_code(lines, start=0):
+    """Yields the index of each line (from start on) outside of fenced code blocks and its text without code spans."""
+    for i, line in outside_fences(lines):
+        if i >= start:
+            yield i, "".join(part for is_code, part in split_code_spans(line) if not is_code)
+
+
+def read_front_matter(lines):
+    """Returns the metadata in the YAML front matter and the index of the first line after it."""
+    if not lines or lines[0].strip() != "---":
+        return {}, 0
+    for i, line in enumerate(lines[1:], 1):
+        if line.strip() in ("---", "..."):
+            try:
+                metadata = strictyaml.dirty_load("\n".join(lines[1:i]), allow_flow_style=True).data
+            except strictyaml.YAMLError:
+                metadata = {}
+            return metadata if isinstance(metadata, dict) else {}, i + 1
+    return {}, 0
+
+
+def read_settings(input_dir):
+    """Returns the settings in the pandoc-crossref.yaml file of the input directory (if any)."""
+    file = Path(input_dir) / SETTINGS_FILE
+    if not file.is_file():
+        return {}
+    try:
+        settings = strictyaml.dirty_load(read_file(file), allow_flow_style=True).data
+    except strictyaml.YAMLError as e:
+        raise ValueError(f"Invalid pandoc-crossref settings in {file}: {e}")
+    return settings if isinstance(settings, dict) else {}
+
+
+def number_sections(lines, start=0):
+    """Returns the section number of each heading with an id, e.g. {'sec:intro': '1.2'}."""
+    numbers = {}
+    counters = [0] * 6
+    for i, line in outside_fences(lines):
+        match = HEADING.match(line) if i >= start else None
+        if not match:
+            continue
+        level = len(match.group(1))
+        attributes = (match.group(3) or "").split()
+        if ".unnumbered" in attributes or "-" in attributes:
+            continue
+        counters[level - 1] += 1
+        counters[level:] = [0] * (6 - level)
+        ids = [a[1:] for a in attributes if a.startswith("#")]
+        if ids:
+            numbers[ids[0]] = ".".join(str(c) for c in counters[:level])
+    return numbers
+
+
+def _is_next(previous, number):
+    """Whether the section number directly follows the previous one, e.g. 1.2 and 1.3."""
+    *head, last = number.split(".")
+    *previous_head, previous_last = previous.split(".")
+    return head == previous_head and int(last) == int(previous_last) + 1
+
+
+def check_document(lines, start, metadata, numbers, anchors):
+    """Raises a ValueError if the references of the document can't be resolved like pandoc-crossref does."""
+    errors = []
+    unsupported = [name for name in UNSUPPORTED_SETTINGS if name in metadata]
+    if unsupported:
+        errors.append(f"The pandoc-crossref settings {', '.join(unsupported)} are not supported")
+    others = sorted({m.group(0) for _, text in outside_code(lines, start) for m in OTHER_REFERENCE.finditer(text)})
+    if others:
+        errors.append(f"Only section references are supported, found: {', '.join(others)}")
+    # pandoc-crossref splits these groups, citeproc would render the section references as unknown citations
+    mixed = [
+        m.group(0)
+        for _, text in outside_code(lines, start)
+        for m in CITATION_GROUP.finditer(text)
+        if REFERENCE.search(m.group(1)) and not GROUP.fullmatch(m.group(0))
+    ]
+    if mixed:
+        errors.append(f"Groups of section references and citations are not supported, found: {', '.join(mixed)}")
+    # e.g. a template that doesn't generate a heading for each section
+    missing = [anchor for anchor in anchors or [] if f"sec:{anchor}" not in numbers]
+    if missing:
+        errors.append(f"No numbered heading for the sections: {', '.join(missing)}")
+    if errors:
+        raise ValueError("Can't resolve the references without pandoc-crossref (use --crossref):\n" + "\n".join(errors))
+
+
+def resolve_crossrefs(markdown, anchors=None, settings=None):
+    """
+    Returns the Markdown with all @sec: references replaced by the (linked) section numbers.
+
+    `anchors` are the anchors of the sections of the document (see resolve_links), which must all be numbered,
+    `settings` are the pandoc-crossref settings of the input directory (see read_settings).
+    """
+    lines = markdown.split("\n")
+    metadata, start = read_front_matter(lines)
+    # the front matter takes precedence over the settings file
+    metadata = {**(settings or {}), **metadata}
+    numbers = number_sections(lines, start)
+    check_document(lines, start, metadata, numbers, anchors)
+
+    prefix = metadata.get("secPrefix", DEFAULT_PREFIX)
+    if isinstance(prefix, str):
+        prefix = [prefix, prefix]
+    link = str(metadata.get("linkReferences", "false")).lower() == "true"
+    range_delimiter = metadata.get("rangeDelim", DEFAULT_RANGE_DELIMITER)
+
+    def format_number(label):
+        number = numbers.get(label)
+        if number is None:
+            # same as pandoc-crossref for unknown labels
+            return f"**¿{label}?**"
+        return f"[{number}](#{label})" if link else number
+
+    def render(references):
+        """Renders a list of references, i.e. the groups of REFERENCE (-, s or S, id)."""
+        labels = ["sec:" + id for _, _, id in references]
+        # group consecutive sections into ranges, e.g. 1.2-1.4
+        groups = []
+        for label in labels:
+            number = numbers.get(label)
+            if groups and number and groups[-1][-1][1] and _is_next(groups[-1][-1][1], number):
+                groups[-1].append((label, number))
+            else:
+                groups.append([(label, number)])
+        parts = []
+        for group in groups:
+            if len(group) > 2:
+                parts.append(format_number(group[0][0]) + range_delimiter + format_number(group[-1][0]))
+            else:
+                parts.extend(format_number(label) for label, _ in group)
+        text = REFERENCE_DELIMITER.join(parts)
+
+        suppress, s, _ = references[0]
+        if suppress:
+            return text
+        word = prefix[0] if len(labels) == 1 else prefix[-1]
+        if s == "S":
+            word = word[:1].upper() + word[1:]
+        return f"{word}\\ {text}" if word else text
+
+    def replace_group(match):
+        references = []
+        for item in match.group(1).split(";"):
+            reference = REFERENCE.fullmatch(item.strip())
+            if reference is None:
+                return match.group(0)
+            references.append(reference.groups())
+        return render(references)
+
+    def replace(text):
+        text = GROUP.sub(replace_group, text)
+        return REFERENCE.sub(lambda m: render([m.groups()]), text)
+
+    for i, line in outside_fences(lines):
+        if i >= start and "@" in line:
+            lines[i] = "".join(part if is_code else replace(part) for is_code, part in split_code_spans(line))
+    return "\n".join(lines)
@@ -1,11 +1,24 @@
+import os
 import subprocess
+from concurrent.futures import as_completed
+from functools import partial
 from pathlib import Path
 from typing import Union
 
-from playwright.sync_api import sync_playwright
-
-from .compile import compile
+from .artifact import changed_inputs, read_artifact
+from .compile import compile, compile_artifact, load_document, load_members, missing_assets
+from .model import Interner, PfsDocument
+from .schema import COMBINATIONS
+from .shard import select_shard, write_manifest
+from .utils.embed import DataUriCache, embed_file
 from .utils.files import read_file
+from .utils.images import ImageOptimizer
+from .utils.scheduler import Scheduler
+from .utils.workers import process_pool
+from .utils.yaml import read_yaml
+
+# The files that generate writes per PFS
+OUTPUT_EXTENSIONS = (".md", ".bib", ".csl.json", ".docx", ".html", ".pdf")
 
 
 def generate_all(
@@ -16,30 +29,231 @@ def generate_all(
     no_docx: bool = False,
     pfs_list: list = [],
     stable: bool = False,
+    csl_json: bool = False,
+    compile_jobs: int = 1,
+    pandoc_jobs: int = 2,
+    pdf_jobs: int = 1,
+    plan: bool = False,
+    shard: tuple = None,
+    timings: Union[Path, str] = None,
+    manifest: Union[Path, str] = None,
+    crossref: bool = True,
+    embed_cache: bool = False,
+    images: ImageOptimizer = None,
 ):
     # read all folders from the pfs folder
     input_dir = Path(input_dir).resolve()
     input_pfs_folder = input_dir / "pfs"
-    output = Path(output)
+    output = Path(output).resolve()
+
+    all_pfs = sorted(f.stem for f in input_pfs_folder.iterdir() if f.is_dir())
+    if len(pfs_list) > 0:
+        all_pfs = [pfs for pfs in all_pfs if pfs in pfs_list]
+    if shard is not None:
+        all_pfs = select_shard(all_pfs, input_dir, shard, timings)
+
+    # The stages of all PFS are scheduled as a graph, so that e.g. the PDF of one PFS is printed
+    # while the next PFS is compiled. The stages of a PFS run one after another,
+    # as the editable and the read-only Markdown are written to the same file.
+    scheduler = Scheduler(
+        {"compile": compile_jobs, "pandoc": pandoc_jobs, "chromium": pdf_jobs},
+        # compiling is CPU-bound, pandoc and Chromium run in their own processes anyway
+        processes=["compile"],
+    )
+    # each asset is only encoded once for all self-contained HTML files
+    data_uris = DataUriCache() if embed_cache and self_contained else None
+    for pfs in all_pfs:
+        add_generate_tasks(
+            scheduler,
+            pfs,
+            output / pfs,
+            input_dir,
+            self_contained,
+            no_pdf,
+            no_docx,
+            stable,
+            csl_json,
+            crossref,
+            data_uris,
+            images,
+        )
+
+    if plan:
+        print(scheduler.plan())
+        return 0
+
+    try:
+        results, failed = scheduler.run(on_start=lambda task: print(f"- {task.name}"))
+    finally:
+        if data_uris is not None:
+            stats = data_uris.stats()
+            print(
+                f"Embedded assets: {stats['assets']} assets ({stats['bytes']} bytes) encoded once, "
+                f"{stats['hits']} times reused"
+            )
+    errors = 0
+    entries = {}
+    for pfs in all_pfs:
+        tasks = [task for task in scheduler.tasks if task.group == pfs]
+        # report the first error of each PFS, the later stages have been skipped
+        error = next((e for task, e in failed.items() if task.group == pfs), None)
+        if error is not None:
+            print(f"Error generating {input_pfs_folder / pfs}: {error}")
+            errors += 1
+        targets = {results[task] for task in tasks if task.kind == "compile" and task in results}
+        entries[pfs] = {
+            "errors": 0 if error is None else 1,
+            "seconds": round(sum(task.duration for task in tasks if task.duration is not None), 3),
+            "files": sorted(
+                str(Path(f"{target}{ext}").relative_to(output))
+                for target in targets
+                for ext in OUTPUT_EXTENSIONS
+                if Path(f"{target}{ext}").exists()
+            ),
+        }
+
+    if manifest is not None:
+        write_manifest(manifest, "generate-all", shard, errors, entries)
+
+    return errors
+
+
+def add_generate_tasks(
+    scheduler,
+    pfs,
+    output,
+    input_dir,
+    self_contained,
+    no_pdf,
+    no_docx,
+    stable,
+    csl_json,
+    crossref=True,
+    data_uris=None,
+    images=None,
+):
+    """Adds the stages of generate (see below) for a single PFS to the scheduler."""
+    # each compilation copies the assets that the PFS references
+    options = {"stable": stable, "csl_json": csl_json, "crossref": crossref, "images": images}
+    pandoc_options = {
+        "input_dir": input_dir,
+        "self_contained": self_contained,
+        "csl_json": csl_json,
+        "crossref": crossref,
+        "data_uris": data_uris,
+        "output_assets": images is not None,
+    }
+    previous = []
+    if not no_docx:
+        editable = scheduler.add(
+            f"{pfs}: Generating editable Markdown",
+            "compile",
+            partial(compile, editable=True, **options),
+            pfs,
+            output,
+            input_dir,
+            group=pfs,
+        )
+        docx = scheduler.add(
+            f"{pfs}: Generating Word",
+            "pandoc",
+            partial(run_pandoc, format="docx", **pandoc_options),
+            inputs=[editable],
+            group=pfs,
+        )
+        # the read-only Markdown overwrites the editable Markdown
+        previous = [docx]
+
+    target = scheduler.add(
+        f"{pfs}: Generating read-only Markdown",
+        "compile",
+        partial(compile, editable=False, **options),
+        pfs,
+        output,
+        input_dir,
+        deps=previous,
+        group=pfs,
+    )
+    html = scheduler.add(
+        f"{pfs}: Generating HTML",
+        "pandoc",
+        partial(run_pandoc, format="html", **pandoc_options),
+        inputs=[target],
+        group=pfs,
+    )
+    if not no_pdf:
+        scheduler.add(
+            f"{pfs}: Generating PDF",
+            "chromium",
+            partial(run_playwright, input_dir=input_dir),
+            inputs=[target],
+            deps=[html],
+            group=pfs,
+        )
+
+
+def generate_matrix(
+    combinations_file: Union[Path, str],
+    output: Union[Path, str],
+    input_dir: Union[Path, str],
+    self_contained: bool = True,
+    no_pdf: bool = False,
+    no_docx: bool = False,
+    stable: bool = False,
+    csl_json: bool = False,
+    jobs: int = None,
+):
+    input_dir = Path(input_dir).resolve()
+    output = Path(output).resolve()
+    combinations = read_yaml(Path(combinations_file).resolve(), COMBINATIONS, input_dir)
     errors = 0
-    for folder in input_pfs_folder.iterdir():
-        if folder.is_dir():
-            pfs = folder.stem
-            if len(pfs_list) > 0 and pfs not in pfs_list:
+
+    # read each member PFS only once, shared building blocks are only stored once
+    interner = Interner()
+    loaded = {}
+    for combination in combinations:
+        for pfs in combination["pfs"]:
+            if pfs in loaded:
                 continue
-            print(pfs)
             try:
-                generate(
-                    pfs,
-                    output / pfs,
-                    input_dir,
-                    self_contained,
-                    no_pdf,
-                    no_docx,
-                    stable,
-                )
+                loaded[pfs] = load_document(pfs, input_dir, interner)
             except Exception as e:
-                print(f"Error generating {folder}: {e}")
+                print(f"Error reading {pfs}: {e}")
+                loaded[pfs] = None
+                errors += 1
+
+    with process_pool(jobs) as executor:
+        futures = {}
+        for combination in combinations:
+            pfs = combination["pfs"]
+            name = combination.get("id") or "-".join(pfs)
+            if any(loaded[p] is None for p in pfs):
+                # the PFS that couldn't be read have already been counted
+                print(f"Skipping {name}, not all PFS could be read")
+                continue
+            metadata = {key: combination.get(key) for key in ("id", "title", "version", "type")}
+            future = executor.submit(
+                generate,
+                pfs,
+                output / name,
+                input_dir,
+                self_contained,
+                no_pdf,
+                no_docx,
+                stable,
+                metadata,
+                csl_json,
+                loaded={p: loaded[p] for p in pfs},
+            )
+            futures[future] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                print(f"{name}: OK")
+            except Exception as e:
+                print(f"Error generating {name}: {e}")
                 errors += 1
 
     return errors
@@ -54,6 +268,12 @@ def generate(
     no_docx: bool = False,
     stable: bool = False,
     metadata: dict = {},
+    csl_json: bool = False,
+    loaded: dict = None,
+    assets: bool = True,
+    crossref: bool = True,
+    images: ImageOptimizer = None,
+    jobs: int = 1,
 ):
     if isinstance(pfs, str):
         pfs = [pfs]
@@ -61,18 +281,74 @@ def generate(
     input_dir = Path(input_dir).resolve()
     output = Path(output).resolve()
 
+    # read the PFS only once for both the editable and the read-only Markdown,
+    # the members of a combined document with up to `jobs` processes in parallel
+    if loaded is None:
+        interner = Interner()
+        members = load_members(pfs, input_dir, jobs)
+        loaded = {p: PfsDocument.from_dict(data, interner) for p, data in zip(pfs, members)}
+    options = {
+        "stable": stable,
+        "metadata": metadata,
+        "csl_json": csl_json,
+        "loaded": loaded,
+        "assets": assets,
+        "crossref": crossref,
+        "images": images,
+    }
+    # pandoc reads the optimized images from the output folder
+    pandoc_options = {"crossref": crossref, "output_assets": images is not None}
+
+    def render(editable):
+        return compile(pfs, output, input_dir, editable=editable, **options)
+
+    run_stages(render, input_dir, self_contained, no_pdf, no_docx, csl_json, pandoc_options)
+
+
+def generate_from_artifact(
+    artifact: Union[Path, str],
+    output: Union[Path, str],
+    input_dir: Union[Path, str],
+    self_contained: bool = True,
+    no_pdf: bool = False,
+    no_docx: bool = False,
+    csl_json: bool = False,
+    crossref: bool = True,
+    images: ImageOptimizer = None,
+):
+    """
+    Generates the documents for a compiled artifact (see compile --emit-artifact)
+    without reading the YAML files, only the templates and the assets are read from the input directory.
+    """
+    input_dir = Path(input_dir).resolve()
+    data = read_artifact(artifact)
+    for name in changed_inputs(data, input_dir):
+        print(f"WARNING: {name} has changed since the artifact was compiled")
+    output = Path(output or data["name"]).resolve()
+
+    options = {"csl_json": csl_json, "crossref": crossref, "images": images}
+    pandoc_options = {"crossref": crossref, "output_assets": images is not None}
+
+    def render(editable):
+        return compile_artifact(data, output, input_dir, editable=editable, **options)
+
+    run_stages(render, input_dir, self_contained, no_pdf, no_docx, csl_json, pandoc_options)
+
+
+def run_stages(render, input_dir, self_contained, no_pdf, no_docx, csl_json, pandoc_options):
+    """Runs the stages of generate, render(editable) writes the Markdown and returns the path without extension."""
     if not no_docx:
         print("- Generating editable Markdown")
-        target = compile(pfs, output, input_dir, editable=True, stable=stable, metadata=metadata)
+        target = render(True)
 
         print("- Generating Word")
-        run_pandoc(target, "docx", input_dir, self_contained)
+        run_pandoc(target, "docx", input_dir, self_contained, csl_json, **pandoc_options)
 
     print("- Generating read-only Markdown")
-    target = compile(pfs, output, input_dir, editable=False, stable=stable, metadata=metadata)
+    target = render(False)
 
     print("- Generating HTML")
-    run_pandoc(target, "html", input_dir, self_contained)
+    run_pandoc(target, "html", input_dir, self_contained, csl_json, **pandoc_options)
 
     if not no_pdf:
         print("- Generating PDF")
@@ -80,6 +356,9 @@ def generate(
 
 
 def run_playwright(out: Path, input_dir: Path):
+    # imported lazily, playwright is slow to import and only needed for PDFs
+    from playwright.sync_api import sync_playwright
+
     with sync_playwright() as p:
         browser = p.chromium.launch()
         page = browser.new_page()
@@ -95,7 +374,40 @@ def run_playwright(out: Path, input_dir: Path):
         browser.close()
 
 
-def run_pandoc(out: Path, format: str, input_dir: Path, self_contained: bool = True):
+def run_pandoc(
+    out: Path,
+    format: str,
+    input_dir: Path,
+    self_contained: bool = True,
+    csl_json: bool = False,
+    crossref: bool = True,
+    data_uris: DataUriCache = None,
+    output_assets: bool = False,
+):
+    # embed the resources with the data URIs that are shared by all documents instead of pandoc
+    embed = data_uris is not None and format == "html" and self_contained
+    cmd = pandoc_command(out, format, input_dir, self_contained and not embed, csl_json, crossref, output_assets)
+    subprocess.run(cmd, cwd=input_dir)
+    if embed:
+        embed_file(f"{out}.html", [Path(out).parent, input_dir] if output_assets else input_dir, data_uris)
+    elif format == "html" and not self_contained and os.path.exists(f"{out}.html"):
+        # the HTML links to the assets in the output folder, see sync_assets
+        html = Path(f"{out}.html").read_text(encoding="utf-8")
+        for asset in missing_assets(html, Path(out).parent):
+            print(f"WARNING: {Path(out).name}.html references {asset}, which is not in the output folder")
+
+
+def pandoc_command(
+    out: Path,
+    format: str,
+    input_dir: Path,
+    self_contained: bool = True,
+    csl_json: bool = False,
+    crossref: bool = True,
+    output_assets: bool = False,
+):
+    # pandoc's citeproc reads CSL-JSON natively, which avoids parsing the BibTeX
+    bibliography = f"{out}.csl.json" if csl_json else f"{out}.bib"
     cmd = [
         "pandoc",
         f"{out}.md",  # input file
@@ -104,10 +416,11 @@ def run_pandoc(out: Path, format: str, input_dir: Path, self_contained: bool = T
         f"{out}.{format}",  # output file
         "-t",
         format,  # output format
-        "-F",
-        "pandoc-crossref",  # enable cross-references, must be before -C: https://lierdakil.github.io/pandoc-crossref/#citeproc-and-pandoc-crossref
+        # enable cross-references, must be before -C: https://lierdakil.github.io/pandoc-crossref/#citeproc-and-pandoc-crossref
+        # not needed if the compiler resolved the references (see crossref.py)
+        *(["-F", "pandoc-crossref"] if crossref else []),
         "-C",  # enable citation processing
-        f"--bibliography={out}.bib",  # bibliography file
+        f"--bibliography={bibliography}",  # bibliography file
         "-L",
         "templates/no-sectionnumbers.lua",  # remove section numbers from reference links
         "-L",
@@ -115,6 +428,10 @@ def run_pandoc(out: Path, format: str, input_dir: Path, self_contained: bool = T
         f"--template=templates/template.{format}",  # template
     ]
 
+    if output_assets:
+        # prefer the assets in the output folder (e.g. optimized images) over the ones in the input directory
+        cmd.append(f"--resource-path={Path(out).parent}{os.pathsep}.")
+
     if format == "html":
         cmd.append("--mathml")
         if self_contained:
@@ -124,4 +441,4 @@ def run_pandoc(out: Path, format: str, input_dir: Path, self_contained: bool = T
     else:
         raise ValueError(f"Unsupported format {format}")
 
-    subprocess.run(cmd, cwd=input_dir)
+    return cmd
@@ -0,0 +1,303 @@
+"""
+A persistent inverted index of the building blocks for fast queries, see the query command.
+
+The index maps
+- the glossary terms (by id), the reference ids, the targets of the `dependencies` and `sections` aliases,
+  the targets of the `@title:` references and the words of the titles to the building blocks and PFS
+  that use them, and
+- each building block to the building blocks and PFS that include it (e.g. a requirement in a PFS),
+  so that the PFS are found for blocks that are only used indirectly.
+
+It is stored as JSON in a cache folder and updated incrementally:
+only the files that were added, changed (modification time or size) or removed since the last query are indexed again.
+The files are parsed without a schema, so the index also works for building blocks that don't validate.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import strictyaml
+
+from .links import TITLE_PATTERN
+from .schema import (
+    ANNEX_PATH,
+    GLOSSARY_PATH,
+    INTRODUCTION_PATH,
+    REQUIREMENT_CATEGORY_PATH,
+    REQUIREMENT_PATH,
+    SECTION_PATH,
+)
+from .utils import yaml as yaml_utils
+from .utils.files import FILE_CACHE, fix_path, read_file
+
+INDEX_FORMAT = "ceos-ard-index"
+# Increase if the structure of the index or the indexed keys change
+INDEX_VERSION = 1
+DEFAULT_INDEX_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "ceos-ard" / "index"
+# The folders with the indexed files
+INDEX_FOLDERS = ("pfs", "requirements", "sections", "glossary")
+# The kinds of keys that can be queried, "block" are the building blocks that are included by others
+INDEX_KINDS = ("term", "reference", "alias", "title", "word", "block")
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def block_path(template, id):
+    """The path of a building block relative to the input directory, e.g. requirements/general/metadata.yaml"""
+    return template.format(id=id).removeprefix("./")
+
+
+def title_words(title):
+    return sorted(set(WORD_PATTERN.findall(title.lower())))
+
+
+def parse_file(text):
+    """Parses a YAML file without a schema, all values are strings, lists and dicts."""
+    if yaml_utils.YAML_LOADER == "libyaml":
+        import yaml
+
+        return yaml.load(text, Loader=yaml.CBaseLoader)
+    return strictyaml.load(text).data
+
+
+def index_file(path, data):
+    """
+    Returns the keys per kind (see INDEX_KINDS) for a file with the given path relative to the input directory.
+
+    The `dependencies`, `sections`, `glossary` and `references` are indexed at any level,
+    so that they are also found in the replace and append patterns of a PFS.
+    """
+    keys = {kind: set() for kind in INDEX_KINDS}
+    if not isinstance(data, dict):
+        return keys
+
+    def add_ids(kind, template, ids):
+        if isinstance(ids, str):
+            ids = [ids]
+        if isinstance(ids, list):
+            keys[kind].update(block_path(template, id) for id in ids if isinstance(id, str))
+
+    def collect(node):
+        if isinstance(node, str):
+            keys["title"].update(f"{ref}.yaml" for ref in TITLE_PATTERN.findall(node))
+        elif isinstance(node, list):
+            for value in node:
+                collect(value)
+        elif isinstance(node, dict):
+            for key, value in node.items():
+                if key == "glossary" and isinstance(value, list):
+                    keys["term"].update(id for id in value if isinstance(id, str))
+                    add_ids("block", GLOSSARY_PATH, value)
+                elif key == "references" and isinstance(value, list):
+                    keys["reference"].update(id for id in value if isinstance(id, str))
+                elif key == "dependencies" and isinstance(value, dict):
+                    for ids in value.values():
+                        add_ids("alias", REQUIREMENT_PATH, ids)
+                elif key == "sections" and isinstance(value, dict):
+                    for ids in value.values():
+                        add_ids("alias", SECTION_PATH, ids)
+                else:
+                    collect(value)
+
+    collect(data)
+    title = data.get("title") or data.get("term")
+    if isinstance(title, str):
+        keys["word"].update(title_words(title))
+
+    if path.startswith("pfs/"):
+        # the building blocks that the PFS includes
+        add_ids("block", INTRODUCTION_PATH, data.get("introduction"))
+        add_ids("block", ANNEX_PATH, data.get("annexes"))
+        for category in data.get("requirements") or []:
+            if not isinstance(category, dict):
+                continue
+            ref = category.get("category")
+            add_ids("block", REQUIREMENT_CATEGORY_PATH, ref.get("ref") if isinstance(ref, dict) else ref)
+            for requirement in category.get("requirements") or []:
+                ref = requirement.get("ref") if isinstance(requirement, dict) else requirement
+                add_ids("block", REQUIREMENT_PATH, ref)
+    return keys
+
+
+def scan_files(input_dir: Path):
+    """Returns the modification time and size by path (relative to the input directory) of all indexed files."""
+    files = {}
+    for folder in INDEX_FOLDERS:
+        for root, dirs, names in os.walk(input_dir / folder):
+            dirs.sort()
+            for name in sorted(names):
+                if not name.endswith(".yaml"):
+                    continue
+                file = os.path.join(root, name)
+                stat = os.stat(file)
+                files[fix_path(os.path.relpath(file, input_dir))] = [stat.st_mtime_ns, stat.st_size]
+    return files
+
+
+class CorpusIndex:
+    """
+    The inverted index of a corpus, see the module description.
+
+    Use open_index to load the persisted index and bring it up to date.
+    """
+
+    def __init__(self, input_dir, file=None):
+        self.input_dir = Path(input_dir).resolve()
+        if file is None:
+            digest = hashlib.sha256(str(self.input_dir).encode("utf-8")).hexdigest()[:16]
+            file = DEFAULT_INDEX_DIR / f"{digest}.json"
+        self.file = Path(file)
+        # path -> {"stat": [mtime, size], "title": ..., "keys": {kind: [...]}, "error": ...}
+        self.files = {}
+        # kind -> key -> [paths]
+        self.postings = {kind: {} for kind in INDEX_KINDS}
+
+    def load(self):
+        """Loads the persisted index, an index of another version or input directory is ignored."""
+        try:
+            data = json.loads(self.file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if (
+            data.get("format") != INDEX_FORMAT
+            or data.get("version") != INDEX_VERSION
+            or data.get("input_dir") != fix_path(self.input_dir)
+        ):
+            return False
+        self.files = data["files"]
+        self.postings = data["postings"]
+        return True
+
+    def save(self):
+        data = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "input_dir": fix_path(self.input_dir),
+            "files": self.files,
+            "postings": self.postings,
+        }
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, so that concurrent queries never read a partial index
+        temp = self.file.with_name(f".{self.file.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(temp, self.file)
+
+    def update(self):
+        """Indexes the added and changed files and removes the deleted files, returns the updated paths."""
+        current = scan_files(self.input_dir)
+        # the changed files may still be in the file cache of this process
+        FILE_CACHE.revalidate()
+        updated = []
+        for path in list(self.files):
+            if path not in current:
+                self._remove(path)
+                updated.append(path)
+        for path, stat in current.items():
+            entry = self.files.get(path)
+            if entry is not None and entry["stat"] == stat:
+                continue
+            if entry is not None:
+                self._remove(path)
+            self._add(path, stat)
+            updated.append(path)
+        return updated
+
+    def _add(self, path, stat):
+        entry = {"stat": stat, "title": None, "keys": {}, "error": None}
+        try:
+            data = parse_file(read_file(self.input_dir / path))
+            keys = index_file(path, data)
+            title = (data.get("title") or data.get("term")) if isinstance(data, dict) else None
+            entry["title"] = title.strip() if isinstance(title, str) else None
+        except Exception as e:
+            keys = {}
+            entry["error"] = str(e)
+        for kind, values in keys.items():
+            if values:
+                entry["keys"][kind] = sorted(values)
+                postings = self.postings[kind]
+                for value in values:
+                    postings.setdefault(value, []).append(path)
+        self.files[path] = entry
+
+    def _remove(self, path):
+        entry = self.files.pop(path)
+        for kind, values in entry["keys"].items():
+            postings = self.postings[kind]
+            for value in values:
+                paths = postings[value]
+                paths.remove(path)
+                if not paths:
+                    del postings[value]
+
+    def lookup(self, kind, value):
+        """Returns the paths of the files that use the given key, block paths may omit the folder and extension."""
+        postings = self.postings[kind]
+        if kind == "word":
+            words = title_words(value)
+            if not words:
+                return set()
+            # all words must be in the title
+            return set.intersection(*(set(postings.get(word, [])) for word in words))
+        if kind in ("alias", "title", "block"):
+            path = value.removeprefix("./")
+            if not path.endswith(".yaml"):
+                path += ".yaml"
+            # e.g. general/metadata for requirements/general/metadata.yaml
+            candidates = [path] + [f"{folder}/{path}" for folder in INDEX_FOLDERS]
+            return {file for candidate in candidates for file in postings.get(candidate, [])}
+        return set(postings.get(value, []))
+
+    def query(self, **filters):
+        """
+        Returns the building blocks that match all of the given filters (kind => list of values, see INDEX_KINDS)
+        and the PFS that include them, directly or through other building blocks.
+        """
+        blocks = None
+        for kind, values in filters.items():
+            if kind not in INDEX_KINDS:
+                raise ValueError(f"Unknown query kind '{kind}', must be one of: {', '.join(INDEX_KINDS)}")
+            for value in values:
+                matches = self.lookup(kind, value)
+                blocks = matches if blocks is None else blocks & matches
+        blocks = blocks or set()
+        return {
+            "blocks": [{"path": path, "title": self.files[path]["title"]} for path in sorted(blocks)],
+            "pfs": sorted(self.including_pfs(blocks)),
+        }
+
+    def including_pfs(self, blocks):
+        """The ids of the PFS that include any of the blocks, directly or through other blocks."""
+        pfs = set()
+        seen = set(blocks)
+        pending = list(blocks)
+        while pending:
+            path = pending.pop()
+            if path.startswith("pfs/"):
+                pfs.add(path.split("/")[1])
+            for parent in self.postings["block"].get(path, []):
+                if parent not in seen:
+                    seen.add(parent)
+                    pending.append(parent)
+        return pfs
+
+    def errors(self):
+        return {path: entry["error"] for path, entry in self.files.items() if entry["error"]}
+
+
+def open_index(input_dir, file=None, rebuild=False):
+    """
+    Loads the persisted index of the corpus and updates it incrementally (or from scratch with rebuild).
+
+    Returns the index and the paths of the files that have been indexed or removed.
+    """
+    index = CorpusIndex(input_dir, file)
+    if not rebuild:
+        index.load()
+    updated = index.update()
+    if updated or rebuild:
+        index.save()
+    return index, updated
@@ -3,8 +3,9 @@ from pathlib import Path
 
 import strictyaml
 
-from .utils.files import fix_path, read_file
+from .utils.files import fix_path, get_snapshot, read_file
 from .utils.requirement import slugify
+from .utils.visitor import map_strings
 
 # Matches @title:path/to/building-block references in Markdown text.
 # The path is relative to the input directory, without the .yaml extension.
@@ -27,7 +28,105 @@ def path_to_id(filepath, input_dir, folder):
     return rel_path
 
 
-def resolve_links(data, input_dir):
+# Anchor prefixes per sections/ subfolder, must match the ones generated in the template
+SECTION_ANCHORS = {
+    "introduction": "intro-",
+    "annexes": "annex-",
+}
+
+ANCHOR_INDEXES = {}  # input directory -> AnchorIndex
+
+
+def get_anchor_index(input_dir):
+    """Returns the anchor index of the corpus, which is only built once per run."""
+    input_dir = Path(input_dir).resolve()
+    index = ANCHOR_INDEXES.get(input_dir)
+    if index is None:
+        index = ANCHOR_INDEXES[input_dir] = AnchorIndex(input_dir)
+    return index
+
+
+class AnchorIndex:
+    """
+    Maps the building block files of a corpus (requirements and sections)
+    to their folder-relative ids and to the anchors in the compiled documents.
+
+    Can be used to look up anchors without compiling a PFS, e.g.:
+
+        index = get_anchor_index("path/to/ceos-ard")
+        index.anchor("path/to/ceos-ard/sections/annexes/topo.yaml")  # 'annex-topo'
+        index.anchor("path/to/ceos-ard/requirements/general/metadata.yaml", category="general")
+    """
+
+    FOLDERS = ("requirements", "sections")
+
+    def __init__(self, input_dir):
+        self.input_dir = Path(input_dir).resolve()
+        self._ids = {}  # (folder, file path) -> folder-relative id
+        self._block_ids = {}  # file path -> id of the building block
+        snapshot = get_snapshot(self.input_dir)
+        for folder in self.FOLDERS:
+            for file in snapshot.files(folder):
+                if file.suffix == ".yaml":
+                    self._ids[(folder, fix_path(file))] = path_to_id(file, self.input_dir, folder)
+
+    def relative_id(self, filepath, folder):
+        """The folder-relative id of a building block file, e.g. general/metadata for requirements."""
+        key = (folder, fix_path(filepath))
+        rel_id = self._ids.get(key)
+        if rel_id is None:
+            # e.g. a file that was added after the index was built
+            rel_id = self._ids[key] = path_to_id(filepath, self.input_dir, folder)
+        return rel_id
+
+    def files(self, folder):
+        """The folder-relative ids of all files in the folder (requirements or sections) by file path."""
+        return {filepath: rel_id for (f, filepath), rel_id in self._ids.items() if f == folder}
+
+    def section_anchor(self, filepath, id=None):
+        """
+        The anchor of an introduction section, annex or requirement category.
+
+        The id defaults to the id in the file, or the path in the subfolder (e.g. introduction/<id>).
+        """
+        subfolder, _, name = self.relative_id(filepath, "sections").partition("/")
+        if subfolder == "requirement-categories":
+            # the anchor of a requirement category is its (short) id
+            return id or self.block_id(filepath) or name
+        elif subfolder in SECTION_ANCHORS:
+            return SECTION_ANCHORS[subfolder] + slugify(id or self.block_id(filepath) or name)
+        return None
+
+    def requirement_anchor(self, category_id, requirement_id):
+        """The anchor (uid) of a requirement in the given requirement category."""
+        return create_uid({"category": {"id": category_id}}, requirement_id)
+
+    def anchor(self, filepath, category=None):
+        """The anchor of a section, or of a requirement if the category id is given."""
+        path = Path(filepath).resolve()
+        if path.is_relative_to(self.input_dir / "requirements"):
+            requirement_id = self.block_id(path)
+            if category is None or not requirement_id:
+                return None
+            return self.requirement_anchor(category, requirement_id)
+        return self.section_anchor(path)
+
+    def block_id(self, filepath):
+        """The id that is set in the building block file (if any)."""
+        key = fix_path(filepath)
+        if key not in self._block_ids:
+            block_id = None
+            try:
+                content = strictyaml.load(read_file(filepath)).data
+                if isinstance(content, dict):
+                    block_id = content.get("id") or None
+            except Exception:
+                pass  # invalid files are reported by the validation
+            self._block_ids[key] = block_id
+        return self._block_ids[key]
+
+
+def resolve_links(data, input_dir, index=None):
     """
     Resolve the `dependencies` (requirements) and `sections` (introduction, annexes,
     requirement categories) aliases of all building blocks in a resolved PFS document.
@@ -35,11 +134,28 @@ def resolve_links(data, input_dir):
     Replaces the @alias references in the Markdown fields with the @sec: anchors
     that the template generates for pandoc-crossref.
 
+    The folder-relative ids and anchors are looked up in the anchor index of the corpus
+    (see get_anchor_index), which can be passed in if it's already available.
+
+    Stores the anchors of all sections that the template generates in `section_anchors`,
+    e.g. to number the sections without pandoc-crossref (see crossref.py).
+
+    The building blocks are shared between documents (see BlockCache), so they are not modified in place:
+    the lists of the document are replaced with shallow copies of the blocks, which are resolved instead.
+
     Returns a list of human-readable error messages (empty if everything resolved).
     """
-    input_dir = Path(input_dir).resolve()
+    if index is None:
+        index = get_anchor_index(input_dir)
     errors = []
 
+    data["requirements"] = [
+        {**block, "category": dict(block["category"]), "requirements": [dict(req) for req in block["requirements"]]}
+        for block in data["requirements"]
+    ]
+    data["introduction"] = [dict(section) for section in data["introduction"]]
+    data["annexes"] = [dict(section) for section in data["annexes"]]
+
     # make a dict of the requirements per category and overall for efficient dependency lookup,
     # and a dict of all sections (by sections/-relative path) mapping to their anchors
     all_requirements = {}
@@ -48,20 +164,18 @@ def resolve_links(data, input_dir):
     for block in data["requirements"]:
         category = block["category"]
         cid = category["id"]
-        # the anchor of a requirement category is its (short) id
-        sections[path_to_id(category["filepath"], input_dir, "sections")] = cid
+        sections[index.relative_id(category["filepath"], "sections")] = index.section_anchor(category["filepath"], cid)
         local_requirements[cid] = {}
         for req in block["requirements"]:
             # make uid unique if it can be used in multiple categories
             req["uid"] = create_uid(block, req["id"])
-            rel_path = path_to_id(req["filepath"], input_dir, "requirements")
+            rel_path = index.relative_id(req["filepath"], "requirements")
             local_requirements[cid][rel_path] = req["uid"]
             all_requirements[rel_path] = req["uid"]
-    # the anchor prefixes must match the ones generated in the template
-    for annex in data["annexes"]:
-        sections[path_to_id(annex["filepath"], input_dir, "sections")] = "annex-" + slugify(annex["id"])
-    for section in data["introduction"]:
-        sections[path_to_id(section["filepath"], input_dir, "sections")] = "intro-" + slugify(section["id"])
+    for section in data["annexes"] + data["introduction"]:
+        sections[index.relative_id(section["filepath"], "sections")] = index.section_anchor(
+            section["filepath"], section["id"]
+        )
 
     def resolve_requirement(target, cid):
         """Resolve a requirement path (or list of candidate paths) to a requirement UID.
@@ -97,6 +211,7 @@ def resolve_links(data, input_dir):
 
         resolved_deps = []
         resolved_sections = []
+        anchors = {}
         for alias, target in {**links, **dependencies}.items():
             if alias in dependencies:
                 anchor = resolve_requirement(target, cid)
@@ -109,7 +224,9 @@ def resolve_links(data, input_dir):
                 errors.append(f"Unmet {kind} '{' / '.join(candidates)}' in {where}")
                 continue
             resolved.append(anchor)
-            update_references(container, alias, anchor)
+            anchors[alias] = anchor
+
+        update_references(container, anchors)
 
         if "dependencies" in container:
             container["dependencies"] = resolved_deps
@@ -125,6 +242,9 @@ def resolve_links(data, input_dir):
         resolve_container(section, None, f"section '{section.get('id') or section.get('title')}'")
     resolve_container(data, None, f"PFS document '{data.get('id') or data.get('title')}'")
 
+    anchors = {uid for requirements in local_requirements.values() for uid in requirements.values()}
+    anchors.update(anchor for anchor in sections.values() if anchor)
+    data["section_anchors"] = sorted(anchors)
     return errors
 
 
@@ -151,7 +271,7 @@ def resolve_titles(data, input_dir):
             return titles[ref]
         title = None
         file = input_dir / f"{ref}.yaml"
-        if not file.is_file():
+        if not get_snapshot(input_dir).is_file(file):
             errors.append(f"Unknown building block '{ref}' in a title reference, expected a file at {file}")
         else:
             try:
@@ -168,54 +288,41 @@ def resolve_titles(data, input_dir):
         titles[ref] = title
         return title
 
-    def replace(value):
-        if isinstance(value, str):
-            # keep the reference as-is on errors, the compilation fails anyway
-            return TITLE_PATTERN.sub(lambda m: load_title(m.group(1)) or m.group(0), value)
-        elif isinstance(value, list):
-            return [replace(v) for v in value]
-        elif isinstance(value, dict):
-            return {k: replace(v) for k, v in value.items()}
-        else:
-            return value
+    def replace(text):
+        # keep the reference as-is on errors, the compilation fails anyway
+        return TITLE_PATTERN.sub(lambda m: load_title(m.group(1)) or m.group(0), text)
 
     for key, value in data.items():
-        data[key] = replace(value)
+        data[key] = map_strings(value, replace)
 
     return errors
 
 
-# replace all @alias references in the texts of a building block with the resolved @sec: anchor
-def update_references(container, alias, anchor):
-    # the negative lookahead prevents replacing aliases that are a prefix
-    # of another alias (e.g. @time in @time-sar)
-    pattern = re.compile("@" + re.escape(alias) + r"(?![A-Za-z0-9_-])")
-    replacement = f"@sec:{anchor}"
+# replace all @alias references in the texts of a building block with the resolved @sec: anchors
+def update_references(container, anchors):
+    if not anchors:
+        return
+    # A single pass for all aliases. The negative lookahead prevents replacing aliases
+    # that are a prefix of another alias (e.g. @time in @time-sar), longer aliases are tried first.
+    aliases = sorted(anchors, key=len, reverse=True)
+    pattern = re.compile("@(" + "|".join(map(re.escape, aliases)) + r")(?![A-Za-z0-9_-])")
 
     def replace(value):
-        if isinstance(value, str):
-            return pattern.sub(replacement, value)
-        elif isinstance(value, list):
-            return [replace(v) for v in value]
-        elif isinstance(value, dict):
-            # e.g. the applies_to / background fields of a combined document
-            return {k: replace(v) for k, v in value.items()}
-        else:
-            return value
+        # e.g. the applies_to / background fields of a combined document are dicts
+        return map_strings(value, lambda text: pattern.sub(lambda m: "@sec:" + anchors[m.group(1)], text))
 
     for field in ("description", "background", "applies_to"):
         if field in container:
             container[field] = replace(container[field])
 
+    # the parts are replaced with copies, as the container is a shallow copy of a shared building block
     parts = container.get("requirements")
     if isinstance(parts, dict):
-        for part in parts.values():
-            update_part_references(part, replace)
+        container["requirements"] = {name: update_part_references(part, replace) for name, part in parts.items()}
     for key in ("threshold", "goal"):
         if container.get(key):
-            update_part_references(container[key], replace)
+            container[key] = update_part_references(container[key], replace)
 
 
 def update_part_references(part, replace):
-    part["description"] = replace(part["description"])
-    part["notes"] = replace(part.get("notes", []))
+    return {**part, "description": replace(part["description"]), "notes": replace(part.get("notes", []))}
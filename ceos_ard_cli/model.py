@@ -0,0 +1,228 @@
+"""
+Compact in-memory model for resolved PFS documents and their building blocks.
+
+The compilation works on plain dicts and lists as read from the YAML files.
+Keeping many PFS in memory that way (e.g. in generate-matrix) is expensive,
+as every building block is parsed into separate dicts for every place it is used.
+The classes below use __slots__ and shared building blocks are interned by their
+filepath, so that identical glossary terms, sections and requirements are only
+stored once. `to_dict` converts a model back into fresh dicts with the same keys
+in the same order, so the compilation, the template and the debug output are unchanged.
+"""
+
+from dataclasses import dataclass, fields
+from typing import ClassVar
+
+
+class _Missing:
+    """Marks a field that is not present in the data, e.g. in partial requirement parts."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+# Identical key orders are shared between all blocks
+_KEYS = {}
+
+
+def plain_copy(value):
+    """Copy plain dicts and lists recursively, the immutable values are shared."""
+    if isinstance(value, dict):
+        return {k: plain_copy(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [plain_copy(v) for v in value]
+    else:
+        return value
+
+
+@dataclass(slots=True)
+class Block:
+    # the keys of the original dict (in order), including the keys that are stored in `extra`
+    keys: tuple = ()
+    # keys that are not defined in the model
+    extra: dict = None
+
+    # fields that contain other blocks: field name => ("list" | "dict" | "block", class)
+    NESTED: ClassVar[dict] = {}
+
+    @classmethod
+    def from_dict(cls, data, interner=None):
+        names = cls.field_names()
+        values = {}
+        extra = {}
+        for key, value in data.items():
+            if key not in names:
+                extra[key] = value
+                continue
+            nested = cls.NESTED.get(key)
+            if nested is not None:
+                value = convert(value, nested, lambda v, c: c.from_dict(v, interner))
+            values[key] = value
+        keys = tuple(data.keys())
+        block = cls(keys=_KEYS.setdefault(keys, keys), extra=extra or None, **values)
+        if interner is not None:
+            block = interner.intern(block)
+        return block
+
+    def to_dict(self):
+        result = {}
+        for key in self.keys:
+            if self.extra is not None and key in self.extra:
+                result[key] = plain_copy(self.extra[key])
+                continue
+            value = getattr(self, key)
+            nested = self.NESTED.get(key)
+            if nested is not None:
+                result[key] = convert(value, nested, lambda v, c: v.to_dict())
+            else:
+                result[key] = plain_copy(value)
+        return result
+
+    @classmethod
+    def field_names(cls):
+        names = cls.__dict__.get("_field_names")
+        if names is None:
+            names = frozenset(f.name for f in fields(cls)) - {"keys", "extra"}
+            setattr(cls, "_field_names", names)
+        return names
+
+
+def convert(value, nested, function):
+    kind, cls = nested
+    if kind == "list" and isinstance(value, list):
+        return [function(v, cls) if isinstance(v, (dict, Block)) else v for v in value]
+    elif kind == "dict" and isinstance(value, dict):
+        return {k: function(v, cls) if isinstance(v, (dict, Block)) else v for k, v in value.items()}
+    elif kind == "block" and isinstance(value, (dict, Block)):
+        return function(value, cls)
+    else:
+        return value
+
+
+@dataclass(slots=True)
+class GlossaryTerm(Block):
+    filepath: str = MISSING
+    id: str = MISSING
+    term: str = MISSING
+    description: str = MISSING
+    references: list = MISSING
+    changes: list = MISSING
+    remarks: str = MISSING
+    deprecated: bool = MISSING
+
+
+@dataclass(slots=True)
+class Section(Block):
+    filepath: str = MISSING
+    id: str = MISSING
+    title: str = MISSING
+    description: str = MISSING
+    dependencies: dict = MISSING
+    sections: dict = MISSING
+    glossary: list = MISSING
+    references: list = MISSING
+    changes: list = MISSING
+    remarks: str = MISSING
+    deprecated: bool = MISSING
+
+    NESTED: ClassVar[dict] = {"glossary": ("list", GlossaryTerm)}
+
+
+@dataclass(slots=True)
+class RequirementPart(Block):
+    description: str = MISSING
+    notes: list = MISSING
+    metadata: dict = MISSING
+    optional: bool = MISSING
+
+
+@dataclass(slots=True)
+class Requirement(Block):
+    filepath: str = MISSING
+    id: str = MISSING
+    title: str = MISSING
+    description: str = MISSING
+    requirements: dict = MISSING
+    dependencies: dict = MISSING
+    sections: dict = MISSING
+    glossary: list = MISSING
+    references: list = MISSING
+    changes: list = MISSING
+    remarks: str = MISSING
+    history: list = MISSING
+    deprecated: bool = MISSING
+
+    NESTED: ClassVar[dict] = {
+        "requirements": ("dict", RequirementPart),
+        "glossary": ("list", GlossaryTerm),
+    }
+
+
+@dataclass(slots=True)
+class RequirementCategory(Block):
+    category: Section = MISSING
+    requirements: list = MISSING
+
+    NESTED: ClassVar[dict] = {
+        "category": ("block", Section),
+        "requirements": ("list", Requirement),
+    }
+
+
+@dataclass(slots=True)
+class PfsDocument(Block):
+    id: str = MISSING
+    title: str = MISSING
+    version: str = MISSING
+    type: str = MISSING
+    applies_to: str = MISSING
+    background: str = MISSING
+    dependencies: dict = MISSING
+    sections: dict = MISSING
+    authors: object = MISSING
+    introduction: list = MISSING
+    requirements: list = MISSING
+    glossary: list = MISSING
+    references: list = MISSING
+    annexes: list = MISSING
+    changes: list = MISSING
+    remarks: str = MISSING
+    deprecated: bool = MISSING
+
+    NESTED: ClassVar[dict] = {
+        "introduction": ("list", Section),
+        "requirements": ("list", RequirementCategory),
+        "glossary": ("list", GlossaryTerm),
+        "annexes": ("list", Section),
+    }
+
+
+class Interner:
+    """Shares identical building blocks (by filepath and content) between all documents."""
+
+    def __init__(self):
+        self._blocks = {}  # (class, filepath) -> list of distinct blocks
+        self.hits = 0
+
+    def intern(self, block):
+        filepath = getattr(block, "filepath", MISSING)
+        if filepath is MISSING:
+            return block
+        # the same file can be used with different replace/append overrides
+        candidates = self._blocks.setdefault((type(block), filepath), [])
+        for candidate in candidates:
+            if candidate == block:
+                self.hits += 1
+                return candidate
+        candidates.append(block)
+        return block
+
+    def __len__(self):
+        return sum(len(candidates) for candidates in self._blocks.values())
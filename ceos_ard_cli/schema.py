@@ -14,7 +14,6 @@ from strictyaml import (
 
 from .strictyaml.id_reference import IdReference
 from .strictyaml.markdown import Markdown
-from .utils.files import fix_path
 
 REFERENCE_PATH = "./references/{id}.bib"
 GLOSSARY_PATH = "./glossary/{id}.yaml"
@@ -86,9 +85,12 @@ _CHANGES = EmptyList() | Seq(
     )
 )
 
-GLOSSARY = lambda file, base_path: Map(
+# The schemas are built once per base path (see utils.yaml.get_schema).
+# The empty filepath default is a placeholder that read_yaml replaces with
+# the path of the loaded file, so that the schemas don't depend on the file.
+GLOSSARY = lambda base_path: Map(
     {
-        Optional("filepath", default=fix_path(file)): Str(),
+        Optional("filepath", default=""): Str(),
         "term": Str(),
         "description": Markdown(),
         Optional("references", default=[]): _REFERENCE_IDS(base_path),
@@ -99,9 +101,9 @@ GLOSSARY = lambda file, base_path: Map(
 )
 _RESOLVED_GLOSSARY = lambda base_path: _RESOLVED_REFS(GLOSSARY_PATH, base_path, GLOSSARY)
 
-SECTION = lambda file, base_path: Map(
+SECTION = lambda base_path: Map(
     {
-        Optional("filepath", default=fix_path(file)): Str(),
+        Optional("filepath", default=""): Str(),
         Optional("id", default=""): Str(),
         "title": Str(),
         "description": Markdown(),
@@ -115,7 +117,7 @@ SECTION = lambda file, base_path: Map(
     }
 )
 
-PARTIAL_SECTION = lambda file, base_path: Map(
+PARTIAL_SECTION = lambda base_path: Map(
     {
         Optional("title"): Str(),
         Optional("description"): Markdown(),
@@ -128,9 +130,9 @@ PARTIAL_SECTION = lambda file, base_path: Map(
     }
 )
 
-REQUIREMENT = lambda file, base_path: Map(
+REQUIREMENT = lambda base_path: Map(
     {
-        Optional("filepath", default=fix_path(file)): Str(),
+        Optional("filepath", default=""): Str(),
         "id": Str(),
         "title": Str(),
         Optional("description", default=""): Markdown(),
@@ -146,7 +148,7 @@ REQUIREMENT = lambda file, base_path: Map(
     }
 )
 
-PARTIAL_REQUIREMENT = lambda file, base_path: Map(
+PARTIAL_REQUIREMENT = lambda base_path: Map(
     {
         Optional("title"): Str(),
         Optional("description"): Markdown(),
@@ -161,7 +163,7 @@ PARTIAL_REQUIREMENT = lambda file, base_path: Map(
     }
 )
 
-PFS_DOCUMENT = lambda file, base_path: Map(
+PFS_DOCUMENT = lambda base_path: Map(
     {
         "title": Str(),
         "version": Str(),
@@ -179,8 +181,8 @@ PFS_DOCUMENT = lambda file, base_path: Map(
                     "category": Map(
                         {
                             "ref": IdReference(REQUIREMENT_CATEGORY_PATH, base_path, SECTION),
-                            Optional("replace", default={}): EmptyDict() | PARTIAL_SECTION(file, base_path),
-                            Optional("append", default={}): EmptyDict() | PARTIAL_SECTION(file, base_path),
+                            Optional("replace", default={}): EmptyDict() | PARTIAL_SECTION(base_path),
+                            Optional("append", default={}): EmptyDict() | PARTIAL_SECTION(base_path),
                         }
                     )
                     | IdReference(REQUIREMENT_CATEGORY_PATH, base_path, SECTION),
@@ -188,8 +190,8 @@ PFS_DOCUMENT = lambda file, base_path: Map(
                         Map(
                             {
                                 "ref": IdReference(REQUIREMENT_PATH, base_path, REQUIREMENT),
-                                Optional("replace", default={}): EmptyDict() | PARTIAL_REQUIREMENT(file, base_path),
-                                Optional("append", default={}): EmptyDict() | PARTIAL_REQUIREMENT(file, base_path),
+                                Optional("replace", default={}): EmptyDict() | PARTIAL_REQUIREMENT(base_path),
+                                Optional("append", default={}): EmptyDict() | PARTIAL_REQUIREMENT(base_path),
                             }
                         )
                         | IdReference(REQUIREMENT_PATH, base_path, REQUIREMENT)
@@ -205,3 +207,16 @@ PFS_DOCUMENT = lambda file, base_path: Map(
         Optional("deprecated", default=False): Bool(),
     }
 )
+
+# List of PFS combinations for generate-matrix, the metadata overrides the combined document's metadata
+COMBINATIONS = lambda base_path: Seq(
+    Map(
+        {
+            "pfs": UniqueSeq(Str()),
+            Optional("id"): Str(),
+            Optional("title"): Str(),
+            Optional("version"): Str(),
+            Optional("type"): Str(),
+        }
+    )
+)
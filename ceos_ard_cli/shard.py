@@ -0,0 +1,183 @@
+"""
+Splits the PFS into shards, e.g. to run generate-all or validate on several CI runners,
+and merges the manifests that the shards write.
+"""
+
+import json
+import re
+from pathlib import Path
+
+from .utils.files import read_file, write_file
+
+# An asset of this size costs as much as a requirement, e.g. as it's embedded into the HTML and PDF
+ASSET_COST_BYTES = 100 * 1024
+# The keys of document.yaml whose list items are counted for the cost of a PFS
+COUNTED_KEYS = ("introduction", "requirements", "annexes")
+TOP_LEVEL_KEY = re.compile(r"^([A-Za-z_]\w*):")
+LIST_ITEM = re.compile(r"^\s*- ")
+
+
+def parse_shard(value):
+    """Parses a shard given as i/n (e.g. 2/4, 1-based) into a tuple of (i, n)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected i/n, e.g. 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}', i must be between 1 and n")
+    return index, count
+
+
+def estimate_cost(pfs, input_dir):
+    """
+    Estimates the cost of a PFS from the number of sections and requirements in its document.yaml
+    and the size of the other files in its folder (e.g. images).
+
+    The document is only scanned line by line, without validating it or resolving the building blocks,
+    so that estimating the costs stays cheap compared to processing the PFS.
+    """
+    folder = Path(input_dir) / "pfs" / pfs
+    cost = 0
+    key = None
+    for line in read_file(folder / "document.yaml").splitlines():
+        match = TOP_LEVEL_KEY.match(line)
+        if match:
+            key = match.group(1)
+        elif key in COUNTED_KEYS and LIST_ITEM.match(line):
+            # for requirements, each category and each requirement in it is an item
+            cost += 1
+    for file in folder.rglob("*"):
+        if file.name != "document.yaml" and file.is_file():
+            cost += file.stat().st_size / ASSET_COST_BYTES
+    return cost
+
+
+def read_timings(file):
+    """Reads the time it took to process each PFS (in seconds) from a manifest, see write_manifest."""
+    manifest = json.loads(read_file(file))
+    return {pfs: entry["seconds"] for pfs, entry in manifest["pfs"].items() if entry.get("seconds") is not None}
+
+
+def estimate_costs(pfs_list, input_dir, timings=None):
+    """
+    The cost of each PFS, which is the time from a previous run (see read_timings) if available.
+
+    The costs of the PFS without timings are estimated (see estimate_cost) and scaled to seconds.
+    """
+    timings = timings or {}
+    if all(pfs in timings for pfs in pfs_list):
+        return {pfs: timings[pfs] for pfs in pfs_list}
+
+    estimates = {}
+    for pfs in pfs_list:
+        try:
+            estimates[pfs] = estimate_cost(pfs, input_dir)
+        except OSError as e:
+            # the errors are reported again when the shard processes the PFS
+            print(f"WARNING: The cost of {pfs} could not be estimated: {e}")
+            estimates[pfs] = 1
+    timed = [pfs for pfs in pfs_list if pfs in timings]
+    if not timed:
+        return estimates
+    # seconds per cost unit, derived from the PFS that have timings
+    scale = sum(timings[pfs] for pfs in timed) / max(sum(estimates[pfs] for pfs in timed), 1e-9)
+    return {pfs: timings[pfs] if pfs in timings else estimates[pfs] * scale for pfs in pfs_list}
+
+
+def partition(costs, count):
+    """
+    Splits the PFS into `count` shards with similar total costs.
+
+    The PFS are assigned from the most to the least expensive to the cheapest shard so far,
+    ties are broken by name and shard number, so all runners compute the same partition.
+    Returns a list of shards, each a sorted list of PFS.
+    """
+    shards = [[] for _ in range(count)]
+    totals = [0] * count
+    for pfs in sorted(costs, key=lambda p: (-costs[p], p)):
+        i = min(range(count), key=lambda i: (totals[i], i))
+        shards[i].append(pfs)
+        totals[i] += costs[pfs]
+    return [sorted(shard) for shard in shards]
+
+
+def select_shard(pfs_list, input_dir, shard, timings_file=None):
+    """Returns the PFS of the given shard (see parse_shard) from the list of PFS."""
+    index, count = shard
+    if count == 1:
+        return sorted(pfs_list)
+    timings = read_timings(timings_file) if timings_file else None
+    costs = estimate_costs(sorted(pfs_list), input_dir, timings)
+    shards = partition(costs, count)
+    selected = shards[index - 1]
+    total = sum(costs.values())
+    share = sum(costs[p] for p in selected)
+    print(f"Shard {index}/{count}: {len(selected)} of {len(pfs_list)} PFS (cost {share:.1f} of {total:.1f})\n")
+    return selected
+
+
+def write_manifest(file, command, shard, errors, pfs, **extra):
+    """
+    Writes the result of a (sharded) run to a JSON file, which can be merged with merge_manifests.
+
+    `pfs` contains an entry for each PFS, e.g. {"errors": 0, "seconds": 1.2, "files": [...]}.
+    """
+    manifest = {
+        "command": command,
+        "shard": list(shard or (1, 1)),
+        "errors": errors,
+        "pfs": pfs,
+        **extra,
+    }
+    write_file(file, json.dumps(manifest, indent=2))
+
+
+def merge_manifests(files):
+    """
+    Merges the manifests of all shards of a run.
+
+    Returns the merged manifest and a list of problems with the shards (e.g. missing shards).
+    The errors in the merged manifest are the sum of the errors of all shards.
+    """
+    manifests = [json.loads(read_file(file)) for file in files]
+    if not manifests:
+        raise ValueError("No manifests given")
+    problems = []
+    commands = {m["command"] for m in manifests}
+    if len(commands) > 1:
+        problems.append(f"The manifests are from different commands: {', '.join(sorted(commands))}")
+    counts = {m["shard"][1] for m in manifests}
+    if len(counts) > 1:
+        problems.append(f"The manifests are from runs with different numbers of shards: {sorted(counts)}")
+    count = max(counts)
+    shards = sorted(m["shard"][0] for m in manifests)
+    for i in range(1, count + 1):
+        if i not in shards:
+            problems.append(f"Shard {i}/{count} is missing")
+        elif shards.count(i) > 1:
+            problems.append(f"Shard {i}/{count} is given multiple times")
+
+    merged = {
+        "command": manifests[0]["command"],
+        "shard": [1, 1],
+        "shards": count,
+        "errors": sum(m["errors"] for m in manifests),
+        "pfs": {},
+    }
+    for manifest in manifests:
+        for pfs, entry in manifest["pfs"].items():
+            if pfs in merged["pfs"]:
+                problems.append(f"PFS {pfs} is part of multiple shards")
+            merged["pfs"][pfs] = entry
+    merged["pfs"] = dict(sorted(merged["pfs"].items()))
+
+    # validate: the building blocks and assets that are not used by any PFS
+    for kind in ("files", "assets"):
+        if all(f"used_{kind}" in m for m in manifests):
+            used = set().union(*(m[f"used_{kind}"] for m in manifests))
+            everything = sorted(set().union(*(m[f"all_{kind}"] for m in manifests)))
+            merged[f"used_{kind}"] = sorted(used)
+            merged[f"all_{kind}"] = everything
+            merged[f"unused_{kind}"] = [item for item in everything if item not in used]
+
+    return merged, problems
@@ -0,0 +1,305 @@
+"""
+Statistics about a CEOS-ARD corpus that show where the time of compiling the PFS goes:
+how often each building block is referenced and parsed, how deep the references are nested,
+the largest Markdown texts and which building blocks and PFS dominate the compile time.
+
+All numbers are collected in a single scan of the corpus, see corpus_stats.
+"""
+
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from .compile import BubbleUp, resolve_context, resolve_refs
+from .strictyaml.id_reference import BLOCK_CACHE
+from .utils.files import fix_path, get_all_files, get_all_folders
+from .utils.pfs import read_pfs
+from .utils.template import read_template
+from .utils.visitor import walk
+from .utils.yaml import log_parses
+
+# The folders of the corpus and the files that are counted in them
+FILE_KINDS = {
+    "pfs": "document.yaml",
+    "requirements": ".yaml",
+    "sections": ".yaml",
+    "glossary": ".yaml",
+    "references": ".bib",
+    "assets": "",
+    "templates": "",
+}
+
+
+def count_files(input_dir: Path):
+    """Returns the number of files and their size in bytes per kind (see FILE_KINDS)."""
+    kinds = {}
+    for kind, ext in FILE_KINDS.items():
+        folder = input_dir / kind
+        files = get_all_files(folder, ext) if folder.is_dir() else []
+        kinds[kind] = {"files": len(files), "bytes": sum(f.stat().st_size for f in files)}
+    return kinds
+
+
+def relative_path(file, input_dir: Path):
+    try:
+        return fix_path(Path(file).relative_to(input_dir))
+    except ValueError:
+        return fix_path(file)
+
+
+class BlockTree:
+    """
+    Collects the building blocks of a PFS with their parents, nesting depth and texts.
+
+    A building block is a dict with a filepath (see read_yaml), the PFS document is the root.
+    """
+
+    def __init__(self, root, document, input_dir: Path):
+        self.root = root
+        self.document = document
+        self.input_dir = input_dir
+        # block -> parent blocks (without the PFS document) and block -> max depth (the PFS document has depth 0)
+        self.parents = defaultdict(set)
+        self.depths = {}
+        # the number of occurrences of the blocks in the tree, also counts repeated ones
+        self.occurrences = 0
+        # (block, field) -> length of the text
+        self.texts = {}
+        self._add(root, document, "", 0)
+
+    def _add(self, node, block, field, depth):
+        if isinstance(node, str):
+            if field:
+                key = (block, field)
+                self.texts[key] = max(self.texts.get(key, 0), len(node))
+            return
+        if isinstance(node, dict) and node.get("filepath") and node is not self.root:
+            child = relative_path(node["filepath"], self.input_dir)
+            depth += 1
+            parents = self.parents[child]
+            if block != self.document:
+                parents.add(block)
+            self.depths[child] = max(self.depths.get(child, 0), depth)
+            self.occurrences += 1
+            block, field = child, ""
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key != "filepath":
+                    self._add(value, block, f"{field}.{key}" if field else key, depth)
+        elif isinstance(node, list):
+            for i, value in enumerate(node):
+                self._add(value, block, f"{field}[{i}]", depth)
+
+
+def scan_pfs(pfs, input_dir: Path):
+    """
+    Loads, resolves and renders a single PFS like compile does and times the steps.
+
+    Returns the entry for the PFS and the BlockTree of the loaded document.
+    """
+    entry = {"load_seconds": 0.0, "resolve_seconds": 0.0, "render_seconds": 0.0, "error": None}
+    tree = None
+    start = time.perf_counter()
+    try:
+        # like load_pfs, but without the deprecation warnings, which would mix with the report
+        data = read_pfs(pfs, input_dir)
+        load_seconds = time.perf_counter() - start
+        # before the ref/replace/append patterns are resolved, so that the texts are counted where they are written
+        tree = BlockTree(data, f"pfs/{pfs}/document.yaml", input_dir)
+        start = time.perf_counter()
+        data = resolve_refs(data)
+        walk(data, BubbleUp(data))
+        entry["load_seconds"] = load_seconds + time.perf_counter() - start
+
+        start = time.perf_counter()
+        context = resolve_context(data, input_dir)
+        entry["resolve_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for editable in (True, False):
+            read_template(input_dir).render({**context, "editable": editable})
+        entry["render_seconds"] = time.perf_counter() - start
+    except Exception as e:
+        # e.g. a PFS that only resolves all dependencies when combined with others
+        entry["error"] = str(e).splitlines()[0] if str(e) else type(e).__name__
+    return entry, tree
+
+
+def corpus_stats(input_dir, top=10):
+    """
+    Scans all PFS of the corpus once and returns the statistics as a JSON-serializable dict.
+
+    The parses are counted with the block cache of the current loader (see IdReference),
+    starting with an empty cache. `top` limits the lists of the largest texts and the most expensive
+    blocks, the files and PFS are listed completely.
+    """
+    input_dir = Path(input_dir).resolve()
+    all_pfs = sorted(folder.stem for folder in get_all_folders(input_dir / "pfs"))
+
+    pfs_entries = {}
+    trees = {}
+    BLOCK_CACHE.clear()
+    with log_parses() as parses:
+        for pfs in all_pfs:
+            with log_parses() as pfs_parses:
+                entry, tree = scan_pfs(pfs, input_dir)
+            # the blocks that have been parsed by a previous PFS are taken from the block cache
+            entry["parse_seconds"] = sum(seconds for _, seconds in pfs_parses.values())
+            pfs_entries[pfs] = entry
+            if tree is not None:
+                trees[pfs] = tree
+
+    # per file: the number of parses and the seconds
+    files = {}
+    for file, (count, seconds) in parses.items():
+        files[relative_path(file, input_dir)] = {"parses": count, "seconds": seconds}
+
+    # per block: the PFS and blocks that reference it and the max nesting depth
+    blocks = defaultdict(lambda: {"pfs": set(), "parents": set(), "depth": 0})
+    depths = defaultdict(int)
+    texts = {}
+    occurrences = 0
+    for pfs, tree in trees.items():
+        occurrences += tree.occurrences
+        for block, parents in tree.parents.items():
+            entry = blocks[block]
+            entry["pfs"].add(pfs)
+            entry["parents"].update(parents)
+            entry["depth"] = max(entry["depth"], tree.depths[block])
+        for key, length in tree.texts.items():
+            texts[key] = max(texts.get(key, 0), length)
+    for entry in blocks.values():
+        depths[entry["depth"]] += 1
+
+    block_list = []
+    for block, entry in blocks.items():
+        parsed = files.get(block, {"parses": 0, "seconds": 0.0})
+        per_parse = parsed["seconds"] / parsed["parses"] if parsed["parses"] else 0.0
+        block_list.append(
+            {
+                "block": block,
+                "pfs": len(entry["pfs"]),
+                "blocks": len(entry["parents"]),
+                "depth": entry["depth"],
+                "parses": parsed["parses"],
+                "seconds": parsed["seconds"],
+                # the parse time if every PFS is compiled in a fresh process, e.g. in parallel
+                "compile_seconds": per_parse * len(entry["pfs"]),
+            }
+        )
+    block_list.sort(key=lambda b: (-b["compile_seconds"], b["block"]))
+
+    # a PFS that is compiled alone (e.g. by generate-all) parses all of its blocks
+    for pfs, tree in trees.items():
+        pfs_entries[pfs]["blocks"] = len(tree.parents)
+        pfs_entries[pfs]["own_parse_seconds"] = sum(
+            files[file]["seconds"] / files[file]["parses"] for file in [tree.document, *tree.parents] if file in files
+        )
+    for entry in pfs_entries.values():
+        entry["total_seconds"] = entry["load_seconds"] + entry["resolve_seconds"] + entry["render_seconds"]
+
+    total_parses = sum(f["parses"] for f in files.values())
+    largest = sorted(texts.items(), key=lambda item: (-item[1], item[0]))[:top]
+    return {
+        "input_dir": fix_path(input_dir),
+        "files": count_files(input_dir),
+        "parsing": {
+            "files": len(files),
+            "parses": total_parses,
+            "seconds": sum(f["seconds"] for f in files.values()),
+            # the number of parses per parsed file, 1.0 means that every file is parsed once
+            "amplification": total_parses / len(files) if files else 0.0,
+            # the parses without any caching, i.e. every occurrence of a block in all PFS
+            "references": occurrences + len(trees),
+            "reference_amplification": (occurrences + len(trees)) / len(files) if files else 0.0,
+        },
+        "depths": {str(depth): count for depth, count in sorted(depths.items())},
+        "pfs": dict(sorted(pfs_entries.items(), key=lambda item: (-item[1]["total_seconds"], item[0]))),
+        "blocks": block_list[:top],
+        "fan_out": sorted(block_list, key=lambda b: (-b["pfs"], -b["blocks"], b["block"]))[:top],
+        "file_parses": dict(sorted(files.items(), key=lambda item: (-item[1]["seconds"], item[0]))),
+        "largest_texts": [{"block": block, "field": field, "length": length} for (block, field), length in largest],
+    }
+
+
+def format_table(rows, columns):
+    """Formats the rows (dicts) as a plain text table with the given (key, header) columns."""
+    cells = [[header for _, header in columns]]
+    for row in rows:
+        cells.append([format_value(row[key]) for key, _ in columns])
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    lines = []
+    for line in cells:
+        # left-align the first column (the names), right-align the numbers
+        parts = [line[0].ljust(widths[0])] + [cell.rjust(width) for cell, width in zip(line[1:], widths[1:])]
+        lines.append("  ".join(parts).rstrip())
+    return "\n".join(lines)
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    if value is None:
+        return ""
+    return str(value)
+
+
+def format_stats(stats, top=10):
+    """Formats the statistics (see corpus_stats) as plain text tables."""
+    sections = []
+    files = [{"kind": kind, **entry} for kind, entry in stats["files"].items()]
+    sections.append(("Files per kind", format_table(files, [("kind", "Kind"), ("files", "Files"), ("bytes", "Bytes")])))
+
+    parsing = stats["parsing"]
+    sections.append(
+        (
+            "Parsing",
+            "\n".join(
+                [
+                    f"{parsing['parses']} parses of {parsing['files']} files in {parsing['seconds']:.3f}s",
+                    f"Re-parse amplification of the loader: {parsing['amplification']:.2f}x",
+                    f"Block references in all PFS: {parsing['references']} "
+                    f"({parsing['reference_amplification']:.2f}x without caching)",
+                    "Blocks per max. reference depth: "
+                    + ", ".join(f"{depth}: {count}" for depth, count in stats["depths"].items()),
+                ]
+            ),
+        )
+    )
+
+    pfs = [{"pfs": name, **entry} for name, entry in stats["pfs"].items()]
+    columns = [
+        ("pfs", "PFS"),
+        ("total_seconds", "Total (s)"),
+        ("load_seconds", "Load (s)"),
+        ("resolve_seconds", "Resolve (s)"),
+        ("render_seconds", "Render (s)"),
+        ("own_parse_seconds", "Parse alone (s)"),
+        ("blocks", "Blocks"),
+        ("error", "Error"),
+    ]
+    for entry in pfs:
+        entry.setdefault("blocks", None)
+        entry.setdefault("own_parse_seconds", None)
+    sections.append(("PFS by compile time", format_table(pfs[:top], columns)))
+
+    columns = [
+        ("block", "Building block"),
+        ("compile_seconds", "Parse in all PFS (s)"),
+        ("seconds", "Parse (s)"),
+        ("parses", "Parses"),
+        ("pfs", "PFS"),
+        ("blocks", "Blocks"),
+        ("depth", "Depth"),
+    ]
+    sections.append(("Building blocks by parse time in all PFS", format_table(stats["blocks"], columns)))
+    sections.append(("Building blocks by fan-out", format_table(stats["fan_out"], columns)))
+
+    file_parses = [{"file": file, **entry} for file, entry in stats["file_parses"].items()][:top]
+    columns = [("file", "File"), ("seconds", "Parse (s)"), ("parses", "Parses")]
+    sections.append(("Files by parse time", format_table(file_parses, columns)))
+
+    columns = [("block", "Building block"), ("field", "Field"), ("length", "Characters")]
+    sections.append(("Largest Markdown texts", format_table(stats["largest_texts"], columns)))
+
+    return "\n\n".join(f"{title}\n{table}" for title, table in sections)
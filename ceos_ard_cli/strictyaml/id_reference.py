@@ -1,11 +1,52 @@
+import os
+from collections import OrderedDict
 from pathlib import Path
 
-import bibtexparser
 import strictyaml
 
-from ..utils.files import read_file
+from ..utils import yaml
+from ..utils.bibtex import read_bibtex
+from ..utils.files import FILE_CACHE, add_reads, get_snapshot, log_reads, read_file
 from ..utils.yaml import read_yaml
 
+# Maximum number of parsed building blocks in the block cache
+BLOCK_CACHE_MAX_ENTRIES = 4096
+
+
+class BlockCache:
+    """
+    LRU cache for the parsed building blocks, shared between all PFS that use them:
+    (file, schema, base path, id, depth) -> (files read for the block with their stat keys, content)
+
+    The blocks are immutable, the compilation must not modify them in place.
+    The least recently used blocks are evicted once the number of entries exceeds the limit.
+    """
+
+    def __init__(self, max_entries=BLOCK_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._entries[key] = entry
+        return entry
+
+    def put(self, key, entry):
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+BLOCK_CACHE = BlockCache()
+
 
 class IdReference(strictyaml.ScalarValidator):
     def __init__(self, path_template, base_path, schema=None, resolve=True):
@@ -17,15 +58,12 @@ class IdReference(strictyaml.ScalarValidator):
     def validate_scalar(self, chunk):
         file = Path(self._base_path) / Path(self._path_template.format(id=chunk.contents))
         content = None
-        if not file.exists():
+        if not get_snapshot(self._base_path).exists(file):
             chunk.expecting_but_found(f"expecting an existing file at {file} for id '{chunk.contents}'")
         elif file.suffix == ".yaml":
-            content = read_yaml(file, self._schema, self._base_path)
-            if "id" not in content or len(content["id"]) == 0:
-                content["id"] = chunk.contents
+            content = self.read_block(file, chunk.contents)
         elif file.suffix == ".bib":
-            content = read_file(file)
-            library = bibtexparser.parse_string(content)
+            library = read_bibtex(file)
             count = len(library.entries)
             if len(library.failed_blocks) > 0:
                 chunk.expecting_but_found(f"expecting a valid bibtex entry at {file}")
@@ -33,6 +71,9 @@ class IdReference(strictyaml.ScalarValidator):
                 chunk.expecting_but_found(f"expecting a single bibtex entry per file in {file}, found {count}")
             elif library.entries[0].key != file.stem:
                 chunk.expecting_but_found(f"expecting bibtex identifier to match file name in {file}")
+            elif self._resolve:
+                # the references are only validated (see schema), read_bibtex has cached the file anyway
+                content = read_file(file)
         else:
             content = read_file(file)
 
@@ -41,5 +82,43 @@ class IdReference(strictyaml.ScalarValidator):
         else:
             return chunk.contents
 
+    def read_block(self, file, id):
+        # the depth limits how deep the dependencies are validated, see read_yaml
+        key = (str(file), self._schema, str(self._base_path), id, yaml.YAML_DEPTH)
+        cached = BLOCK_CACHE.get(key)
+        if cached is not None and is_current(cached[0]):
+            return cached[1]
+
+        with log_reads() as files:
+            content = read_yaml(file, self._schema, self._base_path)
+        if "id" not in content or len(content["id"]) == 0:
+            content["id"] = id
+        BLOCK_CACHE.put(key, (tuple((f, stat_key(f)) for f in files), content))
+        return content
+
     def to_yaml(self, data):
         return data
+
+
+def stat_key(file):
+    """The modification time and size of a file that has just been read, as kept by the file cache."""
+    key = FILE_CACHE.stat_key(file)
+    if key is None:
+        # e.g. already evicted from the file cache
+        stat = os.stat(file)
+        key = (stat.st_mtime_ns, stat.st_size)
+    return key
+
+
+def is_current(files):
+    """Checks whether the files that a cached block was read from are unchanged (modification time and size)."""
+    try:
+        for file, key in files:
+            stat = os.stat(file)
+            if (stat.st_mtime_ns, stat.st_size) != key:
+                return False
+    except OSError:
+        return False
+    # the block that uses the cached block also depends on its files
+    add_reads([file for file, _ in files])
+    return True
@@ -0,0 +1,169 @@
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+from .files import FILE_CACHE, read_file
+
+# Maximum number of parsed BibTeX files in the cache
+BIBTEX_CACHE_MAX_ENTRIES = 1024
+# LRU cache of the parsed BibTeX files: absolute path -> (stat key of the file cache, library)
+BIBTEX_CACHE = OrderedDict()
+
+# BibTeX entry types to CSL item types
+CSL_TYPES = {
+    "article": "article-journal",
+    "book": "book",
+    "booklet": "pamphlet",
+    "inbook": "chapter",
+    "incollection": "chapter",
+    "inproceedings": "paper-conference",
+    "conference": "paper-conference",
+    "manual": "report",
+    "mastersthesis": "thesis",
+    "phdthesis": "thesis",
+    "proceedings": "book",
+    "techreport": "report",
+    "unpublished": "manuscript",
+    "online": "webpage",
+    "electronic": "webpage",
+    "misc": "document",
+}
+
+# BibTeX fields that can be copied to CSL variables as-is
+CSL_FIELDS = {
+    "title": "title",
+    "journal": "container-title",
+    "journaltitle": "container-title",
+    "booktitle": "container-title",
+    "series": "collection-title",
+    "volume": "volume",
+    "number": "issue",
+    "pages": "page",
+    "edition": "edition",
+    "publisher": "publisher",
+    "institution": "publisher",
+    "organization": "publisher",
+    "school": "publisher",
+    "address": "publisher-place",
+    "location": "publisher-place",
+    "doi": "DOI",
+    "url": "URL",
+    "isbn": "ISBN",
+    "issn": "ISSN",
+    "note": "note",
+    "howpublished": "note",
+    "abstract": "abstract",
+    "language": "language",
+}
+
+# Text in braces protects the case in BibTeX, the CSL equivalent is a nocase span
+BRACED_GROUP = re.compile(r"\{([^{}]*)\}")
+
+
+def read_bibtex(file):
+    """Parse a BibTeX file into a bibtexparser library, each file is only parsed once unless it changes."""
+    # imported lazily, bibtexparser is slow to import and only needed for references
+    import bibtexparser
+
+    key = str(Path(file).absolute())
+    content = read_file(key)
+    # the modification time and size of the file when it was read, so the content isn't kept twice
+    stat_key = FILE_CACHE.stat_key(key)
+    cached = BIBTEX_CACHE.pop(key, None)
+    if cached is None or cached[0] != stat_key:
+        cached = (stat_key, bibtexparser.parse_string(content))
+    BIBTEX_CACHE[key] = cached
+    while len(BIBTEX_CACHE) > BIBTEX_CACHE_MAX_ENTRIES:
+        BIBTEX_CACHE.popitem(last=False)
+    return cached[1]
+
+
+def to_csl_json(library):
+    """Convert the entries of a bibtexparser library to a list of CSL-JSON items."""
+    import bibtexparser
+    from bibtexparser import middlewares
+
+    # work on a copy so that the cached library stays untouched
+    library = bibtexparser.Library(library.blocks)
+    for middleware in (
+        middlewares.LatexDecodingMiddleware(allow_inplace_modification=False, keep_braced_groups=True),
+        middlewares.SeparateCoAuthors(allow_inplace_modification=False),
+        middlewares.SplitNameParts(allow_inplace_modification=False),
+    ):
+        library = middleware.transform(library)
+
+    return [to_csl_item(entry) for entry in library.entries]
+
+
+def to_csl_item(entry):
+    item = {
+        "id": entry.key,
+        "type": CSL_TYPES.get(entry.entry_type.lower(), "document"),
+    }
+    fields = {field.key.lower(): field.value for field in entry.fields}
+    for key, value in fields.items():
+        if key in ("author", "editor"):
+            item[key] = [to_csl_name(name) for name in value]
+        elif key in CSL_FIELDS and CSL_FIELDS[key] not in item:
+            if key == "title":
+                value = BRACED_GROUP.sub(r'<span class="nocase">\1</span>', value)
+            else:
+                value = BRACED_GROUP.sub(r"\1", value)
+            item[CSL_FIELDS[key]] = value
+
+    if entry.entry_type.lower() == "phdthesis":
+        item["genre"] = "PhD thesis"
+    elif entry.entry_type.lower() == "mastersthesis":
+        item["genre"] = "Master's thesis"
+
+    issued = to_csl_date(fields.get("year"), fields.get("month"), fields.get("date"))
+    if issued:
+        item["issued"] = issued
+    accessed = to_csl_date(date=fields.get("urldate"))
+    if accessed:
+        item["accessed"] = accessed
+
+    return item
+
+
+def to_csl_name(name):
+    if not hasattr(name, "last"):
+        # e.g. an institution that couldn't be split into name parts
+        return {"literal": BRACED_GROUP.sub(r"\1", str(name))}
+
+    parts = {}
+    family = " ".join(name.last)
+    if len(name.first) == 0 and len(name.von) == 0:
+        # a single name in braces, e.g. {European Space Agency}
+        return {"literal": BRACED_GROUP.sub(r"\1", family)}
+    parts["family"] = BRACED_GROUP.sub(r"\1", family)
+    if name.first:
+        parts["given"] = BRACED_GROUP.sub(r"\1", " ".join(name.first))
+    if name.von:
+        parts["non-dropping-particle"] = " ".join(name.von)
+    if name.jr:
+        parts["suffix"] = " ".join(name.jr)
+    return parts
+
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+
+def to_csl_date(year=None, month=None, date=None):
+    if date:
+        # biblatex dates are ISO 8601, e.g. 2020-01-31
+        date_parts = [int(part) for part in re.findall(r"\d+", date)[:3]]
+        return {"date-parts": [date_parts]} if date_parts else {"literal": date}
+    if not year:
+        return None
+    if not str(year).strip().isdigit():
+        return {"literal": str(year)}
+
+    date_parts = [int(year)]
+    if month:
+        month = str(month).strip().lower()
+        if month.isdigit():
+            date_parts.append(int(month))
+        elif month[:3] in MONTHS:
+            date_parts.append(MONTHS.index(month[:3]) + 1)
+    return {"date-parts": [date_parts]}
@@ -1,3 +1,6 @@
+from .visitor import Handler, walk
+
+
 def find_deprecated(data):
     """
     Recursively collect the deprecated building blocks that are used in a PFS document.
@@ -5,23 +8,50 @@ def find_deprecated(data):
     Works on both unresolved (read_pfs) and resolved (resolve_refs/bubble_up) documents.
     Returns a list of human-readable descriptors, one per building block.
     """
-    found = {}
-    _find_deprecated(data, found)
-    return list(found.values())
-
-
-def _find_deprecated(data, found):
-    if isinstance(data, dict):
-        if data.get("deprecated"):
-            # deduplicate building blocks that are used multiple times
-            key = data.get("filepath", id(data))
-            if key not in found:
-                found[key] = describe(data)
-        for v in data.values():
-            _find_deprecated(v, found)
-    elif isinstance(data, list):
-        for v in data:
-            _find_deprecated(v, found)
+    handler = FindDeprecated(data)
+    walk(data, handler)
+    return handler.result()
+
+
+class FindDeprecated(Handler):
+    """
+    Collects the deprecated building blocks, see find_deprecated.
+
+    Can share a walk with BubbleUp (see compile.load_pfs), the result is
+    the same as if the document was walked after bubbling up the glossary.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.found = {}
+        # the number of blocks found before the glossary of the document was reached
+        self.glossary_mark = None
+
+    def visit(self, node, parent, key):
+        if isinstance(node, dict):
+            if node.get("deprecated"):
+                # deduplicate building blocks that are used multiple times
+                block = node.get("filepath", id(node))
+                if block not in self.found:
+                    self.found[block] = describe(node)
+        elif parent is self.root and key == "glossary":
+            self.glossary_mark = len(self.found)
+
+    def result(self):
+        glossary = self.root.get("glossary") if isinstance(self.root, dict) else None
+        if self.glossary_mark is None or not isinstance(glossary, list):
+            return list(self.found.values())
+
+        # Terms that are added to the glossary of the document after it has been walked
+        # are listed at the position of the glossary, as in a walk of the final document.
+        found = list(self.found.items())
+        result = dict(found[: self.glossary_mark])
+        for term in glossary:
+            if isinstance(term, dict) and term.get("deprecated"):
+                result.setdefault(term.get("filepath", id(term)), describe(term))
+        for block, descriptor in found[self.glossary_mark :]:
+            result.setdefault(block, descriptor)
+        return list(result.values())
 
 
 def describe(data):
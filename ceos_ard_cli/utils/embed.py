@@ -0,0 +1,227 @@
+"""
+Embeds the resources (images, scripts and stylesheets) of HTML files as data URIs,
+with a cache that is shared by all documents of a run, so that each asset is only encoded once.
+
+This replaces pandoc's --embed-resources, which encodes all assets again for each document.
+Like pandoc, local files and http(s) URLs are embedded, the resources that can't be embedded are reported.
+"""
+
+import base64
+import hashlib
+import html as html_utils
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from urllib.parse import unquote, urljoin
+
+# src/poster attributes, e.g. of img, script, source and video elements
+SOURCE_ATTRIBUTE = re.compile(r"""(\s(?:src|poster)=)(["'])([^"']+)\2""")
+LINK = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+LINK_ATTRIBUTE = re.compile(r"""\s(rel|href)=(["'])([^"']*)\2""", re.IGNORECASE)
+CSS_URL = re.compile(r"""url\(\s*(["']?)([^"')]+)\1\s*\)""")
+# inline stylesheets and style attributes, whose url() references are relative to the HTML file
+STYLE_ELEMENT = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.IGNORECASE | re.DOTALL)
+STYLE_ATTRIBUTE = re.compile(r"""(\sstyle=)(["'])(.*?)\2""", re.IGNORECASE | re.DOTALL)
+# Timeout for fetching a remote resource in seconds
+REMOTE_TIMEOUT = 30
+
+
+def is_local(url):
+    return not re.match(r"^([A-Za-z][A-Za-z0-9+.-]*:|//|#)", url)
+
+
+def is_remote(url):
+    return re.match(r"^https?://", url, re.IGNORECASE) is not None
+
+
+def resource_path(url):
+    """The file path of a local URL, without the query and fragment and URL-decoded, e.g. `my%20fig.png?v=1`."""
+    return unquote(url.split("#", 1)[0].split("?", 1)[0])
+
+
+class DataUriCache:
+    """
+    The data URIs of the assets by content hash, the files are only read again if they changed.
+    Remote resources are only fetched once per URL.
+    """
+
+    def __init__(self):
+        self._by_hash = {}  # sha256 -> data URI
+        self._by_file = {}  # absolute path -> (mtime_ns, size, sha256)
+        self._by_url = {}  # remote URL -> (content, mime) or None if it can't be fetched
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_encoded = 0
+
+    def data_uri(self, file):
+        """The data URI of the file, or None if the file doesn't exist."""
+        key = str(Path(file).absolute())
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._by_file.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.hits += 1
+                return self._by_hash[entry[2]]
+
+        with open(key, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            self._by_file[key] = (stat.st_mtime_ns, stat.st_size, digest)
+        return self._encode(content, mimetypes.guess_type(key)[0], digest)
+
+    def fetch(self, url):
+        """The content and MIME type of a remote resource, or None if it can't be fetched."""
+        with self._lock:
+            if url in self._by_url:
+                return self._by_url[url]
+        # imported lazily to keep the CLI startup fast
+        from urllib.request import urlopen
+
+        try:
+            with urlopen(url, timeout=REMOTE_TIMEOUT) as response:
+                result = (response.read(), response.headers.get_content_type())
+        except (OSError, ValueError):
+            result = None
+        with self._lock:
+            return self._by_url.setdefault(url, result)
+
+    def remote_uri(self, url):
+        """The data URI of a remote resource, or None if it can't be fetched."""
+        result = self.fetch(url)
+        if result is None:
+            return None
+        content, mime = result
+        if mime in (None, "application/octet-stream", "text/plain"):
+            # e.g. a server that doesn't know the type of SVG files
+            mime = mimetypes.guess_type(resource_path(url))[0] or mime
+        return self._encode(content, mime, hashlib.sha256(content).hexdigest())
+
+    def _encode(self, content, mime, digest):
+        with self._lock:
+            uri = self._by_hash.get(digest)
+            if uri is not None:
+                # the same content in another file
+                self.hits += 1
+                return uri
+            self.misses += 1
+            self.bytes_encoded += len(content)
+        uri = f"data:{mime or 'application/octet-stream'};base64,{base64.b64encode(content).decode('ascii')}"
+        with self._lock:
+            return self._by_hash.setdefault(digest, uri)
+
+    def stats(self):
+        return {"assets": len(self._by_hash), "hits": self.hits, "misses": self.misses, "bytes": self.bytes_encoded}
+
+
+def resource_uri(url, base_dirs, cache):
+    """The data URI of the resource with the given URL, or None if it can't be embedded."""
+    if is_remote(url):
+        return cache.remote_uri(url)
+    if is_local(url):
+        return cache.data_uri(find_resource(resource_path(url), base_dirs))
+    return None
+
+
+def embed_css(css, base_dir, cache, missing=None):
+    """
+    Embeds the url() references in a stylesheet, relative to the folder (or URL) of the stylesheet.
+    base_dir can also be a list of folders, which are searched in the given order (see embed_resources).
+    """
+    base_dirs = base_dir if isinstance(base_dir, (list, tuple)) else [base_dir]
+    remote = isinstance(base_dirs[0], str) and is_remote(base_dirs[0])
+
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(("data:", "#")):
+            return match.group(0)
+        uri = resource_uri(urljoin(base_dirs[0], url) if remote else url, base_dirs, cache)
+        if uri is None:
+            if missing is not None:
+                missing.append(url)
+            return match.group(0)
+        return f'url("{uri}")'
+
+    return CSS_URL.sub(replace, css)
+
+
+def find_resource(path, base_dirs):
+    """The first existing file for the path in the folders (like pandoc's --resource-path), or the first candidate."""
+    candidates = [Path(base_dir) / path for base_dir in base_dirs]
+    return next((file for file in candidates if file.is_file()), candidates[0])
+
+
+def embed_resources(html, base_dir, cache, missing=None):
+    """
+    Returns the HTML with all local resources (relative to base_dir) and http(s) resources embedded,
+    including the url() references in linked and inline stylesheets and in style attributes.
+    base_dir can also be a list of folders, which are searched in the given order.
+    The resources that can't be embedded (e.g. missing files) are kept as-is and their URLs are added to `missing`.
+    """
+    base_dirs = base_dir if isinstance(base_dir, (list, tuple)) else [base_dir]
+    if missing is None:
+        missing = []
+
+    def replace_source(match):
+        prefix, quote, url = match.groups()
+        if url.startswith("data:"):
+            return match.group(0)
+        uri = resource_uri(url, base_dirs, cache)
+        if uri is None:
+            missing.append(url)
+            return match.group(0)
+        return f"{prefix}{quote}{uri}{quote}"
+
+    def replace_link(match):
+        attributes = {name.lower(): value for name, _, value in LINK_ATTRIBUTE.findall(match.group(0))}
+        url = attributes.get("href", "")
+        if "stylesheet" not in attributes.get("rel", "").lower().split() or url.startswith("data:"):
+            return match.group(0)
+        if is_remote(url):
+            result = cache.fetch(url)
+            css, base = (result[0].decode("utf-8", errors="replace"), url) if result else (None, None)
+        elif is_local(url):
+            file = find_resource(resource_path(url), base_dirs)
+            try:
+                css, base = file.read_text(encoding="utf-8"), file.parent
+            except OSError:
+                css = None
+        else:
+            css = None
+        if css is None:
+            missing.append(url)
+            return match.group(0)
+        return f"<style>\n{embed_css(css, base, cache, missing)}\n</style>"
+
+    def replace_style(match):
+        start, css, end = match.groups()
+        return start + embed_css(css, base_dirs, cache, missing) + end
+
+    def replace_style_attribute(match):
+        prefix, quote, value = match.groups()
+        # e.g. url(&quot;fig.png&quot;)
+        css = html_utils.unescape(value)
+        embedded = embed_css(css, base_dirs, cache, missing)
+        if embedded == css:
+            return match.group(0)
+        return f"{prefix}{quote}{html_utils.escape(embedded)}{quote}"
+
+    # the inline styles first, the stylesheets of the links are embedded relative to their own folder
+    html = STYLE_ATTRIBUTE.sub(replace_style_attribute, STYLE_ELEMENT.sub(replace_style, html))
+    return SOURCE_ATTRIBUTE.sub(replace_source, LINK.sub(replace_link, html))
+
+
+def embed_file(file, base_dir, cache):
+    """Embeds the resources of an HTML file in place, the resources that can't be embedded are reported."""
+    file = Path(file)
+    html = file.read_text(encoding="utf-8")
+    missing = []
+    file.write_text(embed_resources(html, base_dir, cache, missing), encoding="utf-8")
+    for url in dict.fromkeys(missing):
+        print(f"WARNING: {url} could not be embedded into {file.name}")
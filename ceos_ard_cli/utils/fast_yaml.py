@@ -0,0 +1,302 @@
+import copy
+
+from strictyaml import exceptions, utils
+from strictyaml.compound import Map, MapPattern, Seq, UniqueSeq
+from strictyaml.ruamel.error import StringMark
+from strictyaml.scalar import Enum, ScalarValidator
+from strictyaml.validators import OrValidator
+
+# Same label as used by strictyaml for documents that are loaded from a string
+LABEL = "<unicode string>"
+
+
+def is_available():
+    """Checks whether PyYAML with the libyaml bindings is installed."""
+    try:
+        import yaml
+    except ImportError:
+        return False
+    return yaml.__with_libyaml__
+
+
+def load(text, schema):
+    """
+    Parse a YAML document with libyaml and validate it against a strictyaml schema.
+
+    This is a faster alternative to `strictyaml.load(text, schema).data`:
+    The document is parsed with the C-accelerated parser of PyYAML and then
+    validated against the same strictyaml validators without building strictyaml's
+    round-trip representation. The restrictions of strictyaml (no flow style,
+    no anchors and aliases, no tags, no duplicate keys, no implicit typing)
+    are enforced and the errors use strictyaml's exceptions and messages.
+    """
+    document = Document(text)
+    node = document.parse()
+    return Validation(document).validate(schema, node)
+
+
+class Node:
+    __slots__ = ("kind", "value", "start", "end")
+
+    def __init__(self, kind, value, start, end=None):
+        self.kind = kind  # "scalar", "sequence" or "mapping"
+        self.value = value  # str, list of nodes or list of (key node, value node) tuples
+        self.start = start
+        self.end = end or start
+
+
+class Document:
+    def __init__(self, text):
+        self.text = text
+        self._line_offsets = None
+
+    def parse(self):
+        # imported lazily, PyYAML is an optional dependency
+        import yaml
+
+        events = yaml.parse(self.text, Loader=yaml.CBaseLoader)
+        try:
+            root = None
+            stack = []  # open collections: [node, pending key node, keys found so far]
+            for event in events:
+                if isinstance(event, (yaml.StreamStartEvent, yaml.StreamEndEvent, yaml.DocumentEndEvent)):
+                    continue
+                elif isinstance(event, yaml.DocumentStartEvent):
+                    if root is not None:
+                        raise exceptions.StrictYAMLError(
+                            "expected a single document in the stream",
+                            self.mark(root.start),
+                            "but found another document",
+                            self.mark(event.start_mark),
+                        )
+                    continue
+                elif isinstance(event, yaml.AliasEvent):
+                    self.disallow_anchor(event)
+                elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                    node = stack.pop()[0]
+                    node.end = event.end_mark
+                    if not stack:
+                        root = node
+                    else:
+                        self.add(stack[-1], node)
+                    continue
+
+                if event.anchor is not None:
+                    self.disallow_anchor(event)
+                if event.tag is not None:
+                    raise exceptions.TagTokenDisallowed(
+                        "While scanning",
+                        self.mark(event.start_mark),
+                        "Found disallowed tag tokens (do not specify types in markup)",
+                        self.mark(event.end_mark),
+                    )
+
+                if isinstance(event, yaml.ScalarEvent):
+                    node = Node("scalar", event.value, event.start_mark, event.end_mark)
+                    if not stack:
+                        root = node
+                    else:
+                        self.add(stack[-1], node)
+                else:
+                    if event.flow_style:
+                        raise exceptions.FlowMappingDisallowed(
+                            "While scanning",
+                            self.mark(event.start_mark),
+                            "Found ugly disallowed JSONesque flow mapping "
+                            "(surround with ' and ' to make text appear literally)",
+                            self.mark(event.end_mark),
+                        )
+                    kind = "mapping" if isinstance(event, yaml.MappingStartEvent) else "sequence"
+                    stack.append([Node(kind, [], event.start_mark), None, set()])
+        except yaml.MarkedYAMLError as error:
+            raise exceptions.StrictYAMLError(
+                error.context,
+                self.mark(error.context_mark) if error.context_mark else None,
+                error.problem,
+                self.mark(error.problem_mark) if error.problem_mark else None,
+            )
+
+        if root is None:
+            # an empty document is an empty string in strictyaml
+            root = Node("scalar", "", None)
+        return root
+
+    def add(self, parent, node):
+        collection = parent[0]
+        if collection.kind == "sequence":
+            collection.value.append(node)
+        elif parent[1] is None:
+            parent[1] = node
+        else:
+            key = parent[1]
+            if key.kind == "scalar" and key.value in parent[2]:
+                raise exceptions.DuplicateKeysDisallowed(
+                    "While parsing",
+                    self.mark(key.start),
+                    f"Duplicate key '{key.value}' found",
+                    self.mark(key.end),
+                )
+            if key.kind == "scalar":
+                parent[2].add(key.value)
+            collection.value.append((key, node))
+            parent[1] = None
+
+    def disallow_anchor(self, event):
+        raise exceptions.AnchorTokenDisallowed(
+            "While scanning",
+            self.mark(event.start_mark),
+            "Found confusing disallowed anchor token (surround with ' and ' to make text appear literally)",
+            self.mark(event.end_mark),
+        )
+
+    def mark(self, mark, line=None, column=None):
+        """Converts a PyYAML mark into a strictyaml mark, which prints a snippet of the document."""
+        if mark is None:
+            line, column = 0, 0
+        else:
+            line = mark.line if line is None else line
+            column = mark.column if column is None else column
+        if self._line_offsets is None:
+            self._line_offsets = [0]
+            for i, char in enumerate(self.text):
+                if char == "\n":
+                    self._line_offsets.append(i + 1)
+        line = min(line, len(self._line_offsets) - 1)
+        index = min(self._line_offsets[line] + column, len(self.text))
+        return StringMark(LABEL, index, line, column, self.text, index)
+
+
+class ValidationError(exceptions.YAMLValidationError):
+    """strictyaml's YAMLValidationError with marks that point into the original document."""
+
+    def __init__(self, context, problem, context_mark, problem_mark):
+        self.context = context
+        self.problem = problem
+        self._context_mark = context_mark
+        self._problem_mark = problem_mark
+        self.note = None
+
+    @property
+    def context_mark(self):
+        return self._context_mark
+
+    @property
+    def problem_mark(self):
+        return self._problem_mark
+
+
+class Chunk:
+    """Minimal stand-in for strictyaml's YAMLChunk that is passed to the `validate_scalar` methods."""
+
+    def __init__(self, validation, node):
+        self._validation = validation
+        self._node = node
+        self.contents = node.value
+
+    def found(self):
+        if self.contents == "":
+            return "a blank string"
+        elif utils.is_integer(self.contents):
+            return "an arbitrary integer"
+        elif utils.is_decimal(self.contents):
+            return "an arbitrary number"
+        else:
+            return "arbitrary text"
+
+    def expecting_but_found(self, expecting, found=None):
+        self._validation.fail(expecting, found if found is not None else f"found {self.found()}", self._node)
+
+    def while_parsing_found(self, what, found=None):
+        self.expecting_but_found(f"while parsing {what}", found=found)
+
+
+class Validation:
+    def __init__(self, document):
+        self.document = document
+
+    def fail(self, context, problem, node):
+        # strictyaml reports the first and the last line of the invalid part of the document
+        start = node.start
+        end = node.end
+        end_line = end.line if end is not None else 0
+        if end is not None and end.column == 0 and start is not None and end.line > start.line:
+            end_line -= 1
+        raise ValidationError(
+            context,
+            problem,
+            self.document.mark(start, column=0),
+            self.document.mark(end, line=end_line, column=0),
+        )
+
+    def found(self, node):
+        if node.kind == "scalar":
+            return Chunk(self, node).found()
+        else:
+            return "a " + node.kind
+
+    def expect(self, node, kind, expecting):
+        if node.kind != kind:
+            self.fail(expecting, f"found {self.found(node)}", node)
+
+    def validate(self, validator, node):
+        if isinstance(validator, OrValidator):
+            try:
+                return self.validate(validator._validator_a, node)
+            except exceptions.YAMLValidationError:
+                return self.validate(validator._validator_b, node)
+        elif isinstance(validator, Map):
+            return self.validate_map(validator, node)
+        elif isinstance(validator, MapPattern):
+            self.expect(node, "mapping", "when expecting a mapping")
+            return {
+                self.validate(validator._key_validator, key): self.validate(validator._value_validator, value)
+                for key, value in node.value
+            }
+        elif isinstance(validator, UniqueSeq):
+            self.expect(node, "sequence", "when expecting a unique sequence")
+            existing_items = set()
+            result = []
+            for item in node.value:
+                if item.kind == "scalar" and item.value in existing_items:
+                    self.fail("while parsing a sequence", "duplicate found", node)
+                existing_items.add(item.value if item.kind == "scalar" else id(item))
+                result.append(self.validate(validator._validator, item))
+            return result
+        elif isinstance(validator, Seq):
+            self.expect(node, "sequence", "when expecting a sequence")
+            return [self.validate(validator._validator, item) for item in node.value]
+        elif isinstance(validator, ScalarValidator):
+            self.expect(node, "scalar", f"when expecting {validator.rule_description}")
+            if isinstance(validator, Enum):
+                if node.value not in validator._restricted_to:
+                    Chunk(self, node).expecting_but_found(
+                        f"when expecting one of: {', '.join(map(str, validator._restricted_to))}"
+                    )
+                return node.value
+            return validator.validate_scalar(Chunk(self, node))
+        else:
+            raise exceptions.InvalidValidatorError(f"Validator {validator!r} is not supported by the libyaml loader")
+
+    def validate_map(self, validator, node):
+        self.expect(node, "mapping", "when expecting a mapping")
+        result = {}
+        for key, value in node.value:
+            name = self.validate(validator._key_validator, key)
+            if name not in validator._validator_dict:
+                self.fail(
+                    "while parsing a mapping",
+                    f"unexpected key not in schema '{name}'",
+                    key,
+                )
+            result[name] = self.validate(validator._validator_dict[name], value)
+
+        for key, default in validator._defaults.items():
+            if key not in result:
+                # strictyaml creates new objects for the defaults on every load
+                result[key] = copy.copy(default)
+
+        missing = set(validator._required_keys).difference(result)
+        if missing:
+            keys = "', '".join(sorted(missing))
+            self.fail("while parsing a mapping", f"required key(s) '{keys}' not found", node)
+        return result
@@ -1,6 +1,288 @@
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
 
-FILE_CACHE = {}
+# Default upper limit for the size of the cached file contents (in bytes on disk)
+FILE_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+
+class FileCache:
+    """
+    LRU cache for the contents of text files.
+
+    The modification time and size of a cached file are only checked on disk on its first read
+    after revalidate() (or invalidate_snapshots()), entries of files that changed are read again.
+    Long-running processes (e.g. a watch mode or daemon) call revalidate() when files may have changed.
+    The least recently used entries are evicted once the size limit is exceeded.
+    """
+
+    def __init__(self, max_size=FILE_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        # absolute path -> (mtime_ns, size, content, generation in which the file was checked on disk)
+        self._entries = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0  # size of the cached files on disk
+        self.bytes_read = 0  # size of all files that have been read from disk
+
+    def get(self, file):
+        key = str(Path(file).absolute())
+        entry = self._entries.get(key)
+        if entry is not None and entry[3] == self.generation:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[2]
+
+        stat = os.stat(key)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            self.hits += 1
+            self._entries[key] = (*entry[:3], self.generation)
+            self._entries.move_to_end(key)
+            return entry[2]
+
+        self.misses += 1
+        with open(key, "r", encoding="utf-8") as f:
+            content = f.read()
+        self.put(key, stat, content)
+        return content
+
+    def put(self, file, stat, content):
+        """Adds a file that has been read elsewhere (e.g. by prefetch) with the stat result from before reading it."""
+        key = str(Path(file).absolute())
+        self.bytes_read += stat.st_size
+        self._remove(key)
+        self._entries[key] = (stat.st_mtime_ns, stat.st_size, content, self.generation)
+        self.bytes += stat.st_size
+        self._evict()
+
+    def stat_key(self, file):
+        """The modification time and size of the cached file when it was read, or None if it isn't cached."""
+        entry = self._entries.get(str(Path(file).absolute()))
+        return None if entry is None else entry[:2]
+
+    def invalidate(self, file):
+        self._remove(str(Path(file).absolute()))
+
+    def revalidate(self):
+        """Checks the cached files on disk again on their next read."""
+        self.generation += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.bytes,
+            "bytes_read": self.bytes_read,
+            "max_size": self.max_size,
+        }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+        # always keep the most recent entry, even if it exceeds the limit on its own
+        while self.bytes > self.max_size and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry[1]
+            self.evictions += 1
+
+    def __contains__(self, file):
+        return str(Path(file).absolute()) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+FILE_CACHE = FileCache()
+# Active read logs, see log_reads()
+READ_LOGS = []
+
+
+@contextmanager
+def log_reads():
+    """Collect the absolute paths of all files that are read through read_file in the given context."""
+    log = set()
+    READ_LOGS.append(log)
+    try:
+        yield log
+    finally:
+        # remove by identity, nested logs with the same content are equal
+        READ_LOGS[:] = [other for other in READ_LOGS if other is not log]
+
+
+def add_reads(files):
+    """Adds files that have been read elsewhere, e.g. in a worker process, to the active logs (see log_reads)."""
+    for log in READ_LOGS:
+        log.update(files)
+
+
+# Folders of the corpus that are listed once, see DirectorySnapshot
+SNAPSHOT_FOLDERS = ["glossary", "sections", "requirements", "references", "assets", "pfs"]
+
+
+class DirectorySnapshot:
+    """
+    Answers existence checks for the files of a corpus from a single directory listing
+    (os.scandir) of the building block folders, instead of a stat() call per check.
+
+    Paths outside of the listed folders are checked on disk.
+    Call invalidate() (or invalidate_snapshots()) if files may have been added or removed,
+    e.g. in a watch mode or daemon, the folders are listed again on the next check.
+    """
+
+    def __init__(self, root, folders=SNAPSHOT_FOLDERS):
+        self.root = os.path.abspath(root)
+        self.folders = set(folders)
+        self._files = None
+        self._dirs = None
+
+    def scan(self):
+        self._files = set()
+        self._dirs = set()
+        stack = [os.path.join(self.root, folder) for folder in self.folders]
+        while stack:
+            folder = stack.pop()
+            try:
+                entries = os.scandir(folder)
+            except OSError:
+                continue  # e.g. the folder doesn't exist
+            self._dirs.add(folder)
+            with entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        self._files.add(entry.path)
+
+    def invalidate(self):
+        self._files = None
+        self._dirs = None
+
+    def _lookup(self, path):
+        """Returns the normalized path if it is within the listed folders, None otherwise."""
+        path = os.path.abspath(path)
+        if not path.startswith(self.root + os.sep):
+            return None
+        folder = path[len(self.root) + 1 :].split(os.sep, 1)[0]
+        if folder not in self.folders:
+            return None
+        if self._files is None:
+            self.scan()
+        return path
+
+    def is_file(self, path):
+        key = self._lookup(path)
+        return os.path.isfile(path) if key is None else key in self._files
+
+    def is_dir(self, path):
+        key = self._lookup(path)
+        return os.path.isdir(path) if key is None else key in self._dirs
+
+    def exists(self, path):
+        key = self._lookup(path)
+        return os.path.exists(path) if key is None else key in self._files or key in self._dirs
+
+    def files(self, folder):
+        """All files in the given folder of the corpus (recursively)."""
+        if self._files is None:
+            self.scan()
+        prefix = os.path.join(self.root, folder) + os.sep
+        return sorted(Path(file) for file in self._files if file.startswith(prefix))
+
+
+SNAPSHOTS = {}  # absolute root folder -> DirectorySnapshot
+
+
+def get_snapshot(root):
+    """Returns the directory snapshot of the corpus in the given folder, which is only listed once."""
+    key = os.path.abspath(root)
+    snapshot = SNAPSHOTS.get(key)
+    if snapshot is None:
+        snapshot = SNAPSHOTS[key] = DirectorySnapshot(key)
+    return snapshot
+
+
+def invalidate_snapshots():
+    """Lists the folders of all corpora again on the next existence check and checks the cached files for changes."""
+    for snapshot in SNAPSHOTS.values():
+        snapshot.invalidate()
+    FILE_CACHE.revalidate()
+
+
+# Number of threads that read the files of a corpus into the file cache before parsing, 0 disables the prefetch
+PREFETCH_WORKERS = 0
+PREFETCH_EXTENSIONS = (".yaml", ".bib")
+PREFETCHED = set()  # corpora that have been prefetched
+
+
+def set_prefetch_workers(workers):
+    global PREFETCH_WORKERS
+    if workers < 0:
+        raise ValueError("The number of prefetch workers must not be negative")
+    PREFETCH_WORKERS = workers
+
+
+def prefetch(root, workers=None):
+    """
+    Reads all .yaml and .bib files of the corpus concurrently into the file cache,
+    so that the parsing doesn't wait for the files one by one (e.g. on network mounts).
+
+    Only runs once per corpus and only if enabled (see set_prefetch_workers), unless workers are given.
+    Returns the number of files and bytes read and the time it took, or None if nothing was done.
+    """
+    workers = PREFETCH_WORKERS if workers is None else workers
+    root = os.path.abspath(root)
+    if workers <= 0 or root in PREFETCHED:
+        return None
+    PREFETCHED.add(root)
+    # imported lazily to keep the CLI startup fast
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    start = time.perf_counter()
+    snapshot = get_snapshot(root)
+    files = [
+        file
+        for folder in sorted(snapshot.folders)
+        for file in snapshot.files(folder)
+        if file.suffix in PREFETCH_EXTENSIONS and file not in FILE_CACHE
+    ]
+    count = 0
+    size = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # only the reading happens in the threads, the cache is updated here
+        for file, stat, content in executor.map(_prefetch_file, files):
+            if content is not None:
+                FILE_CACHE.put(file, stat, content)
+                count += 1
+                size += stat.st_size
+    duration = time.perf_counter() - start
+    print(f"Prefetched {count} files ({size} bytes) in {duration:.3f}s with {workers} workers")
+    return count, size, duration
+
+
+def _prefetch_file(file):
+    try:
+        # stat before reading, a change while reading invalidates the entry on the next read
+        stat = os.stat(file)
+        with open(file, "r", encoding="utf-8") as f:
+            return file, stat, f.read()
+    except (OSError, UnicodeDecodeError):
+        # reported when the file is actually read
+        return file, None, None
 
 
 def fix_path(path):
@@ -8,15 +290,11 @@ def fix_path(path):
 
 
 def read_file(file):
-    filepath = Path(file)
-    key = str(filepath.absolute())
-    if key in FILE_CACHE:
-        return FILE_CACHE[key]
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        content = f.read()
-        FILE_CACHE[key] = content
-        return content
+    key = str(Path(file).absolute())
+    content = FILE_CACHE.get(key)
+    for log in READ_LOGS:
+        log.add(key)
+    return content
 
 
 def write_file(file, content):
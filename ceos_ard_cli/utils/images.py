@@ -0,0 +1,132 @@
+"""
+Downsamples and recompresses the PNG and JPEG images in the assets before they are embedded into the documents.
+
+The optimized images are cached by the hash of the original image and the settings,
+so that each image is only processed once across all PFS and runs.
+Requires Pillow, e.g. `pip install pillow`.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "ceos-ard" / "images"
+
+
+def is_available():
+    """Checks whether Pillow is installed."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ImageOptimizer:
+    """
+    Downsamples images that are larger than max_size pixels (longest side) or max_dpi
+    and recompresses them, PNG losslessly and JPEG with the given quality.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=2000, max_dpi=None, quality=85):
+        if not is_available():
+            raise ValueError("Optimizing images requires Pillow, e.g. `pip install pillow`")
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.max_dpi = max_dpi
+        self.quality = quality
+        self._by_file = {}  # absolute path -> (mtime_ns, size, optimized file)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def __getstate__(self):
+        # the compilations of generate-all run in other processes, which share the cache folder
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_by_file"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def settings(self):
+        return f"max_size={self.max_size};max_dpi={self.max_dpi};quality={self.quality}"
+
+    def optimize(self, file):
+        """Returns the optimized version of the image in the cache, or the file itself if it is not an image."""
+        file = Path(file).absolute()
+        if file.suffix.lower() not in IMAGE_EXTENSIONS:
+            return file
+        stat = file.stat()
+        with self._lock:
+            entry = self._by_file.get(file)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.hits += 1
+                return entry[2]
+
+        content = file.read_bytes()
+        digest = hashlib.sha256(content + self.settings().encode("utf-8")).hexdigest()
+        target = self.cache_dir / digest[:2] / f"{digest}{file.suffix.lower()}"
+        if target.exists():
+            with self._lock:
+                self.hits += 1
+        else:
+            optimized = self.process(content)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first, parallel runs may process the same image
+            temp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            temp.write_bytes(optimized)
+            os.replace(temp, target)
+            with self._lock:
+                self.misses += 1
+                self.bytes_saved += len(content) - len(optimized)
+        with self._lock:
+            self._by_file[file] = (stat.st_mtime_ns, stat.st_size, target)
+        return target
+
+    def process(self, content):
+        """Downsamples and recompresses an image, the original is kept if that doesn't make it smaller."""
+        from PIL import Image
+
+        try:
+            image = Image.open(io.BytesIO(content))
+            image.load()
+        except OSError:
+            # not an image that Pillow can read, it is copied as-is
+            return content
+        with image:
+            format = image.format
+            dpi = image.info.get("dpi")
+            scale = 1.0
+            if self.max_size:
+                scale = min(scale, self.max_size / max(image.size))
+            if self.max_dpi and dpi and dpi[0] > self.max_dpi:
+                scale = min(scale, self.max_dpi / float(dpi[0]))
+
+            options = {"optimize": True}
+            if scale < 1:
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(size, Image.LANCZOS)
+                if dpi:
+                    # the physical size of the image stays the same
+                    options["dpi"] = (float(dpi[0]) * scale, float(dpi[1]) * scale)
+            elif dpi:
+                options["dpi"] = dpi
+            if format == "JPEG":
+                options.update(quality=self.quality, progressive=True)
+            elif format != "PNG":
+                return content
+
+            output = io.BytesIO()
+            image.save(output, format, **options)
+        optimized = output.getvalue()
+        return optimized if scale < 1 or len(optimized) < len(content) else content
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved}
@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from ..schema import PFS_DOCUMENT
+from .files import get_snapshot, prefetch
 from .yaml import read_yaml
 
 
@@ -8,13 +9,16 @@ def read_pfs(pfs, input_dir: Path):
     base_path = Path(input_dir)
     pfs_folder = base_path / "pfs" / pfs
 
-    if not pfs_folder.exists():
+    snapshot = get_snapshot(base_path)
+    if not snapshot.exists(pfs_folder):
         raise ValueError(f"PFS base directory '{pfs_folder}' does not exist.")
 
     document = pfs_folder / "document.yaml"
-    if not document.exists():
+    if not snapshot.exists(document):
         raise ValueError(f"PFS document '{pfs}' does not exist at '{document}'.")
 
+    # read all files of the corpus at once before parsing, if enabled
+    prefetch(base_path)
     data = read_yaml(document, PFS_DOCUMENT, base_path)
     data["id"] = pfs
     return data
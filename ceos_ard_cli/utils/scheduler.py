@@ -0,0 +1,129 @@
+"""
+Runs a graph of tasks (DAG): each task starts as soon as its dependencies are done,
+with a separate concurrency limit for each kind of task (e.g. compile, pandoc, chromium).
+"""
+
+
+class Task:
+    def __init__(self, name, kind, function, args=(), inputs=(), deps=(), group=None):
+        self.name = name
+        self.kind = kind
+        # called with the results of the inputs (in order), followed by the args
+        self.function = function
+        self.args = tuple(args)
+        self.inputs = list(inputs)
+        # the inputs and other tasks that must be done before the task can start
+        self.deps = list(dict.fromkeys([*inputs, *deps]))
+        # e.g. the PFS that the task belongs to, used to group the errors
+        self.group = group
+        # the time it took to run the task in seconds, set by Scheduler.run
+        self.duration = None
+
+    def __repr__(self):
+        return self.name
+
+
+class SkippedError(Exception):
+    """A task was not run because one of its dependencies failed."""
+
+
+class Scheduler:
+    def __init__(self, limits, processes=(), mp_context=None):
+        """
+        `limits` is the maximum number of concurrent tasks per kind of task.
+        Tasks of the kinds in `processes` run in a process pool (e.g. CPU-bound tasks),
+        their functions and results must be picklable. All other tasks run in threads.
+        `mp_context` is the multiprocessing context of the process pools, defaults to the platform's default.
+        """
+        self.limits = dict(limits)
+        for kind, limit in self.limits.items():
+            if limit < 1:
+                raise ValueError(f"The concurrency limit for {kind} tasks must be at least 1")
+        self.processes = set(processes)
+        self.mp_context = mp_context
+        self.tasks = []
+
+    def add(self, name, kind, function, *args, inputs=(), deps=(), group=None):
+        if kind not in self.limits:
+            raise ValueError(f"Unknown kind of task '{kind}', must be one of: {', '.join(self.limits)}")
+        task = Task(name, kind, function, args, inputs, deps, group)
+        self.tasks.append(task)
+        return task
+
+    def order(self):
+        """The tasks in the order in which they are started if there's no concurrency (topologically sorted)."""
+        done = set()
+        ordered = []
+        pending = list(self.tasks)
+        while pending:
+            # the first task that is ready, so tasks that were added first are preferred
+            ready = next((t for t in pending if all(d in done for d in t.deps)), None)
+            if ready is None:
+                raise ValueError(f"Cyclic dependencies between the tasks: {', '.join(map(str, pending))}")
+            pending.remove(ready)
+            done.add(ready)
+            ordered.append(ready)
+        return ordered
+
+    def plan(self):
+        """Returns a description of the task graph and the order in which the tasks are started."""
+        lines = ["Concurrency: " + ", ".join(f"{kind}={limit}" for kind, limit in self.limits.items())]
+        for i, task in enumerate(self.order(), 1):
+            after = f" (after {', '.join(map(str, task.deps))})" if task.deps else ""
+            lines.append(f"{i}. [{task.kind}] {task.name}{after}")
+        return "\n".join(lines)
+
+    def run(self, on_start=None):
+        """
+        Runs all tasks and returns the results and the errors (exceptions) by task.
+
+        If a task fails, the tasks that depend on it fail with a SkippedError.
+        """
+        # imported lazily to keep the CLI startup fast
+        import time
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        from .workers import process_pool
+
+        pending = self.order()
+        results = {}
+        errors = {}
+        running = {}  # future -> task
+        started = {}  # task -> start time
+        active = {kind: 0 for kind in self.limits}
+        executors = {
+            kind: process_pool(limit, self.mp_context) if kind in self.processes else ThreadPoolExecutor(limit)
+            for kind, limit in self.limits.items()
+        }
+        try:
+            while pending or running:
+                for task in list(pending):
+                    failed = [d for d in task.deps if d in errors]
+                    if failed:
+                        errors[task] = SkippedError(f"Skipped, {failed[0]} failed")
+                        pending.remove(task)
+                    elif all(d in results for d in task.deps) and active[task.kind] < self.limits[task.kind]:
+                        if on_start is not None:
+                            on_start(task)
+                        inputs = [results[t] for t in task.inputs]
+                        started[task] = time.perf_counter()
+                        future = executors[task.kind].submit(task.function, *inputs, *task.args)
+                        running[future] = task
+                        active[task.kind] += 1
+                        pending.remove(task)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    active[task.kind] -= 1
+                    task.duration = time.perf_counter() - started[task]
+                    try:
+                        results[task] = future.result()
+                    except Exception as e:
+                        errors[task] = e
+        finally:
+            for executor in executors.values():
+                executor.shutdown(cancel_futures=True)
+        return results, errors
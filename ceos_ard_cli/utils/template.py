@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pathlib import Path
 
 from jinja2 import Environment
@@ -11,8 +12,17 @@ def read_template(input_dir: Path):
     if not file.exists():
         raise ValueError(f"Template {file} does not exist.")
 
-    tpl = read_file(file)
+    return compile_template(read_file(file))
 
+
+@lru_cache(maxsize=8)
+def compile_template(tpl: str):
+    """
+    Compiles the template, once per content of the template file.
+
+    Compiling takes several times longer than rendering the template for a whole PFS,
+    so all documents that are compiled in the same process share the compiled template.
+    """
     env = Environment(
         block_start_string="~(",
         block_end_string=")~",
@@ -0,0 +1,50 @@
+"""
+Traversal of the document trees (nested dicts and lists) with pluggable handlers,
+so that several passes over a document share a single walk.
+"""
+
+
+class Handler:
+    """Base class for the handlers that are passed to walk."""
+
+    def visit(self, node, parent, key):
+        """
+        Called for every dict and list in the tree, parents before their children.
+
+        `parent` is the dict or list that contains the node (None for the root)
+        and `key` is the key or index of the node in the parent.
+        """
+        pass
+
+
+def walk(data, *handlers):
+    """Walks the tree depth-first once and calls all handlers for each dict and list."""
+    _walk(data, None, None, handlers)
+    return data
+
+
+def _walk(node, parent, key, handlers):
+    for handler in handlers:
+        handler.visit(node, parent, key)
+    # the handlers may replace values (not add or remove keys) while walking,
+    # the children are read when they are reached
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if isinstance(v, (dict, list)):
+                _walk(v, node, k, handlers)
+    else:
+        for i, v in enumerate(node):
+            if isinstance(v, (dict, list)):
+                _walk(v, node, i, handlers)
+
+
+def map_strings(value, function):
+    """Returns a copy of the tree with the function applied to all strings."""
+    if isinstance(value, str):
+        return function(value)
+    elif isinstance(value, list):
+        return [map_strings(v, function) for v in value]
+    elif isinstance(value, dict):
+        return {k: map_strings(v, function) for k, v in value.items()}
+    else:
+        return value
@@ -0,0 +1,30 @@
+"""
+Process pools that apply the global settings of the CLI (e.g. --yaml-loader) in their worker processes.
+
+The settings are module globals, which only forked processes inherit.
+Processes that are spawned (the default on Windows and macOS) import the modules again and start with the defaults.
+"""
+
+from . import files
+from . import yaml as yaml_utils
+
+
+def worker_settings():
+    """The settings of this process that the worker processes need, see init_worker."""
+    return (yaml_utils.YAML_LOADER, files.PREFETCH_WORKERS)
+
+
+def init_worker(yaml_loader, prefetch_workers):
+    """Applies the settings of the parent process (see worker_settings) in a worker process."""
+    yaml_utils.set_yaml_loader(yaml_loader)
+    files.set_prefetch_workers(prefetch_workers)
+
+
+def process_pool(max_workers=None, mp_context=None):
+    """Returns a ProcessPoolExecutor whose worker processes use the settings of this process."""
+    # imported lazily to keep the CLI startup fast
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=mp_context, initializer=init_worker, initargs=worker_settings()
+    )
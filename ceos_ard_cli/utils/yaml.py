@@ -1,23 +1,103 @@
+import time
+from contextlib import contextmanager
+
 import strictyaml
 
-from ..utils.files import read_file
+from ..utils import fast_yaml
+from ..utils.files import fix_path, read_file
+
+# The available loaders:
+# - strictyaml: the pure-Python strictyaml parser (default)
+# - libyaml: the C-accelerated parser of PyYAML, validated against the same strictyaml schemas
+YAML_LOADERS = ["strictyaml", "libyaml"]
+YAML_LOADER = "strictyaml"
 
 # todo: We have some requirements that depend on each other in a circular way.
 #       This is a very dirty hack to avoid recursion depth errors.
 #       We should find a way avoid this hack and stop once a reference is resolved twice in a tree of references.
 YAML_DEPTH = 0
 
+# Validators per (schema, base path), see get_schema
+SCHEMA_CACHE = {}
+
+# Active parse logs, see log_parses
+PARSE_LOGS = []
+# The time spent in nested reads per active read_yaml call, only tracked while logging
+_NESTED_SECONDS = []
+
+
+def set_yaml_loader(loader):
+    global YAML_LOADER
+    if loader not in YAML_LOADERS:
+        raise ValueError(f"Unknown YAML loader '{loader}', must be one of: {', '.join(YAML_LOADERS)}")
+    if loader == "libyaml" and not fast_yaml.is_available():
+        raise ValueError("The libyaml loader requires PyYAML with libyaml bindings, e.g. `pip install pyyaml`")
+    YAML_LOADER = loader
+
+
+def get_schema(schema, base_path):
+    """Returns the validator for the given schema and base path, which is only built once."""
+    key = (schema, str(base_path))
+    validator = SCHEMA_CACHE.get(key)
+    if validator is None:
+        validator = SCHEMA_CACHE[key] = schema(base_path)
+    return validator
+
+
+@contextmanager
+def log_parses():
+    """
+    Collect how often each file is parsed through read_yaml in the given context.
+
+    Maps the file path to a list of the number of parses and the seconds spent,
+    excluding the time of the building blocks that are read while parsing the file.
+    """
+    log = {}
+    PARSE_LOGS.append(log)
+    try:
+        yield log
+    finally:
+        # remove by identity, nested logs with the same content are equal
+        PARSE_LOGS[:] = [other for other in PARSE_LOGS if other is not log]
+
 
 def read_yaml(file, schema, base_path):
-    global YAML_DEPTH
     if YAML_DEPTH > 5:
         return {}
+    if not PARSE_LOGS:
+        return _read_yaml(file, schema, base_path)
+
+    start = time.perf_counter()
+    _NESTED_SECONDS.append(0.0)
+    try:
+        return _read_yaml(file, schema, base_path)
+    finally:
+        seconds = time.perf_counter() - start
+        nested = _NESTED_SECONDS.pop()
+        if _NESTED_SECONDS:
+            _NESTED_SECONDS[-1] += seconds
+        for log in PARSE_LOGS:
+            entry = log.setdefault(fix_path(file), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds - nested
+
+
+def _read_yaml(file, schema, base_path):
+    global YAML_DEPTH
     yaml = read_file(file)
     if not schema:
         raise (ValueError(f"Schema is not provided for {file}"))
     YAML_DEPTH += 1
     try:
-        return to_py(strictyaml.load(yaml, schema(file, base_path)))
+        validator = get_schema(schema, base_path)
+        if YAML_LOADER == "libyaml":
+            data = fast_yaml.load(yaml, validator)
+        else:
+            data = to_py(strictyaml.load(yaml, validator))
+        # fill in the placeholder for the filepath of the building block
+        if isinstance(data, dict) and data.get("filepath") == "":
+            data["filepath"] = fix_path(file)
+        return data
     finally:
         # always restore the depth, even if parsing fails,
         # so that a failed file doesn't affect subsequent reads
@@ -1,10 +1,12 @@
+import time
 from pathlib import Path
 
-from .compile import resolve_refs
+from .compile import expand_assets, find_assets, resolve_refs, template_assets
 from .links import resolve_links, resolve_titles
 from .schema import REQUIREMENT
+from .shard import select_shard, write_manifest
 from .utils.deprecation import find_deprecated
-from .utils.files import FILE_CACHE, get_all_files, get_all_folders
+from .utils.files import fix_path, get_all_files, get_all_folders, log_reads
 from .utils.pfs import read_pfs
 from .utils.template import read_template
 from .utils.yaml import read_yaml
@@ -15,62 +17,124 @@ def log(id, error=None):
     print(f"- {id}: {message}")
 
 
-def validate(input_dir):
-    input_dir = Path(input_dir).resolve()
-    # Validate PFS template
-    print("Validating PFS template (basic checks only)")
+def validate_pfs(pfs, input_dir, assets=None):
+    """Validates a PFS and returns the number of errors, the referenced assets are added to the given set."""
     error = None
+    deprecated = []
+    link_errors = []
     try:
-        # todo: check more, this check is only very high-level jinja-based
-        read_template(input_dir)
+        data = read_pfs(pfs, input_dir)
+        deprecated = find_deprecated(data)
+        # check that all @title: references point to existing building blocks
+        link_errors = resolve_titles(data, input_dir)
+        # check that all dependencies and sections links can be resolved
+        data = resolve_refs(data)
+        link_errors += resolve_links(data, input_dir)
+        if assets is not None:
+            assets.update(find_assets(data))
     except Exception as e:
         error = e
     finally:
-        log("templates/template.md", error)
+        log(pfs, error)
+        for message in link_errors:
+            print(f"  - ERROR: {message}")
+        for descriptor in deprecated:
+            print(f"  - WARNING: {descriptor} is deprecated")
+    return (error is not None) + len(link_errors)
 
-    # Validate all PFS
-    # This also validates all files that are used/referenced in the PFS
-    print("Validating PFS")
-    input_pfs_folder = input_dir / "pfs"
-    all_pfs = get_all_folders(input_pfs_folder)
-    for folder in all_pfs:
-        pfs = folder.stem
+
+def validate(input_dir, shard=None, timings=None, manifest=None):
+    """
+    Validates the template and the PFS and checks for unused files and duplicate requirement IDs.
+
+    If a shard (see shard.parse_shard) is given, only the PFS of the shard are validated
+    and the checks that cover the whole corpus only run in the first shard,
+    except for the unused files, which are listed when the manifests are merged.
+    Returns the number of errors.
+    """
+    input_dir = Path(input_dir).resolve()
+    errors = 0
+    first_shard = shard is None or shard[0] == 1
+    # Validate PFS template
+    if first_shard:
+        print("Validating PFS template (basic checks only)")
         error = None
-        deprecated = []
-        link_errors = []
         try:
-            data = read_pfs(pfs, input_dir)
-            deprecated = find_deprecated(data)
-            # check that all @title: references point to existing building blocks
-            link_errors = resolve_titles(data, input_dir)
-            # check that all dependencies and sections links can be resolved
-            link_errors += resolve_links(resolve_refs(data), input_dir)
+            # todo: check more, this check is only very high-level jinja-based
+            read_template(input_dir)
         except Exception as e:
             error = e
+            errors += 1
         finally:
-            log(pfs, error)
-            for message in link_errors:
-                print(f"  - ERROR: {message}")
-            for descriptor in deprecated:
-                print(f"  - WARNING: {descriptor} is deprecated")
-
-    # todo: check all files, even if unused
-    print("Checking for files not referenced by any PFS (none of them gets validated)")
-    # Get a list of all files that were read during PFS validation
-    used_files = list(FILE_CACHE.keys())
+            log("templates/template.md", error)
+
+    # Validate all PFS
+    # This also validates all files that are used/referenced in the PFS
+    print("Validating PFS")
+    input_pfs_folder = input_dir / "pfs"
+    all_pfs = [folder.stem for folder in get_all_folders(input_pfs_folder)]
+    if shard is not None:
+        all_pfs = select_shard(all_pfs, input_dir, shard, timings)
+    entries = {}
+    used_assets = template_assets(input_dir)
+    # Record all files that are read during PFS validation
+    with log_reads() as used_files:
+        for pfs in all_pfs:
+            start = time.perf_counter()
+            pfs_errors = validate_pfs(pfs, input_dir, used_assets)
+            entries[pfs] = {"errors": pfs_errors, "seconds": round(time.perf_counter() - start, 3)}
+            errors += pfs_errors
+
     all_req_files = get_all_files(input_dir / "requirements")
     # Get all files in the glossary, requirements, and sections
     all_files = get_all_files([input_dir / "glossary", input_dir / "sections"])
     all_files.extend(all_req_files)
-    # Print all files that are not refernced by any PFS
-    for file in all_files:
-        filepath = str(file.absolute())
-        if filepath not in used_files:
-            rel_path = file.relative_to(input_dir)
-            print(f"- {rel_path}")
+    if shard is None:
+        # todo: check all files, even if unused
+        print("Checking for files not referenced by any PFS (none of them gets validated)")
+        # Print all files that are not refernced by any PFS
+        for file in all_files:
+            filepath = str(file.absolute())
+            if filepath not in used_files:
+                rel_path = file.relative_to(input_dir)
+                print(f"- {rel_path}")
+
+    # The assets are only copied to the output folder if a document references them
+    assets_folder = input_dir / "assets"
+    asset_files = get_all_files(assets_folder, "") if assets_folder.is_dir() else []
+    all_assets = sorted(fix_path(f.relative_to(input_dir)) for f in asset_files)
+    used_assets = set(expand_assets(input_dir, used_assets))
+    if shard is None:
+        print("Checking for assets not referenced by any PFS or template")
+        for asset in all_assets:
+            if asset not in used_assets:
+                print(f"- {asset}")
 
     # Check for duplicate requirement IDs
-    print("Checking for duplicate requirement IDs")
+    if first_shard:
+        print("Checking for duplicate requirement IDs")
+        errors += check_requirement_ids(all_req_files, input_dir)
+
+    if manifest is not None:
+        used = set(used_files)
+        write_manifest(
+            manifest,
+            "validate",
+            shard,
+            errors,
+            entries,
+            # the unused files are determined when the manifests of all shards are merged
+            used_files=sorted(fix_path(f.relative_to(input_dir)) for f in all_files if str(f.absolute()) in used),
+            all_files=sorted(fix_path(f.relative_to(input_dir)) for f in all_files),
+            used_assets=sorted(used_assets),
+            all_assets=all_assets,
+        )
+
+    return errors
+
+
+def check_requirement_ids(all_req_files, input_dir):
+    errors = 0
     ids = {}
     for file in all_req_files:
         try:
@@ -81,10 +145,14 @@ def validate(input_dir):
             rel_path = file.relative_to(input_dir)
             if not req_id:
                 log(rel_path, "missing id")
+                errors += 1
                 continue
             if req_id in ids:
                 log(rel_path, f"duplicate id '{req_id}' (also in {ids[req_id]})")
+                errors += 1
             else:
                 ids[req_id] = rel_path
         except Exception as e:
             log(rel_path, e)
+            errors += 1
+    return errors
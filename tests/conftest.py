@@ -0,0 +1,154 @@
+"""Shared fixtures for the CEOS-ARD CLI tests."""
+
+import pytest
+
+# A minimal CEOS-ARD repository with two PFS that share building blocks
+CORPUS = {
+    "pfs/A/document.yaml": """title: Product A
+version: 1.0.0
+type: Optical
+applies_to: Applies to A, see @intro.
+authors:
+  - Alice
+  - Bob
+introduction:
+  - intro
+requirements:
+  - category: general
+    requirements:
+      - general/metadata
+      - ref: general/geometry
+        append:
+          description: Extra text for A referencing @metadata.
+glossary:
+  - dem
+references:
+  - smith2020
+annexes:
+  - topo
+changes:
+sections:
+  intro: introduction/intro
+dependencies:
+  metadata: general/metadata
+""",
+    "pfs/B/document.yaml": """title: Product B
+version: 2.0.0
+type: SAR
+applies_to: Applies to B.
+authors: Carol
+introduction:
+  - intro
+requirements:
+  - category:
+      ref: general
+      replace:
+        title: General for B
+    requirements:
+      - general/metadata
+      - general/radiometry
+glossary:
+references:
+annexes:
+changes:
+""",
+    "requirements/general/metadata.yaml": """id: metadata
+title: Metadata
+description: Metadata requirement, see ![logo](assets/img/logo.png) and [@smith2020].
+requirements:
+  threshold:
+    description: Must have metadata.
+    notes:
+      - A note.
+  goal:
+    description: Should have more.
+    optional: true
+glossary:
+  - dem
+references:
+  - smith2020
+""",
+    "requirements/general/geometry.yaml": """id: geometry
+title: Geometry
+requirements:
+  threshold:
+    description: Geometry correct, see @meta and "@title:sections/annexes/topo".
+dependencies:
+  meta: general/metadata
+""",
+    "requirements/general/radiometry.yaml": """id: radiometry
+title: Radiometry
+requirements:
+  threshold:
+    description: Radiometric stuff.
+""",
+    "sections/introduction/intro.yaml": """title: Introduction
+description: Intro text using @dem.
+glossary:
+  - dem
+""",
+    "sections/annexes/topo.yaml": """title: Topographic phase removal
+description: Annex text ![fig](assets/img/fig.png)
+""",
+    "sections/requirement-categories/general.yaml": """title: General Metadata
+description: Category description.
+""",
+    "glossary/dem.yaml": """term: DEM
+description: Digital Elevation Model
+references:
+  - smith2020
+""",
+    "references/smith2020.bib": """@article{smith2020,
+  title = {A study of {DEM} \\& things},
+  author = {Smith, John and Doe, Jane},
+  journal = {Journal of Things},
+  year = {2020}
+}
+""",
+    "assets/img/logo.png": "PNG",
+    "assets/img/fig.png": "PNGFIG",
+    "templates/template.md": """# ~{ title }~
+
+~( for section in introduction )~
+## ~{ section.title }~ {#sec:intro-~{ section.id | slugify }~}
+
+~{ section.description }~
+
+~( endfor )~
+~( for block in requirements )~
+## ~{ block.category.title }~ {#sec:~{ block.category.id }~}
+
+~( for req in block.requirements )~
+### ~{ req.title }~ {#sec:~{ req.uid }~}
+
+~{ req.description }~
+
+~( if req.threshold )~
+Threshold: ~{ req.threshold.description }~
+~( endif )~
+~( if editable )~
+Assessment:
+~( endif )~
+~( endfor )~
+~( endfor )~
+~( for term in glossary )~
+- ~{ term.term }~: ~{ term.description }~
+~( endfor )~
+~( for annex in annexes )~
+## ~{ annex.title }~ {#sec:annex-~{ annex.id | slugify }~}
+
+~{ annex.description }~
+~( endfor )~
+""",
+}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Writes a minimal CEOS-ARD repository to a temporary folder and returns its path."""
+    root = tmp_path / "ceos-ard"
+    for name, content in CORPUS.items():
+        file = root / name
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(content, encoding="utf-8")
+    return root
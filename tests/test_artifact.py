@@ -0,0 +1,90 @@
+"""Tests for compiling a PFS to an artifact and generating the documents from it."""
+
+import gzip
+import hashlib
+import importlib
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from ceos_ard_cli import cli
+from ceos_ard_cli.artifact import ARTIFACT_VERSION, read_artifact
+from ceos_ard_cli.compile import compile
+from ceos_ard_cli.utils.files import invalidate_snapshots
+
+# the generate command of the CLI shadows the module in the package
+generate_module = importlib.import_module("ceos_ard_cli.generate")
+
+
+def compile_artifact(corpus, tmp_path):
+    compile(["A", "B"], tmp_path / "compiled" / "AB", corpus, csl_json=True, emit_artifact=True)
+    return tmp_path / "compiled" / "AB.artifact.json.gz"
+
+
+class TestArtifact:
+    def test_emit(self, corpus, tmp_path):
+        file = compile_artifact(corpus, tmp_path)
+        artifact = read_artifact(file)
+        assert artifact["version"] == ARTIFACT_VERSION
+        assert artifact["name"] == "AB"
+        assert artifact["pfs"] == ["A", "B"]
+        assert artifact["context"]["title"] == "Combined: Product A / Product B"
+        # the same context for the editable and the read-only document
+        assert "editable" not in artifact["context"]
+        assert artifact["bibtex"] == (tmp_path / "compiled" / "AB.bib").read_text(encoding="utf-8")
+        template = (corpus / "templates" / "template.md").read_bytes()
+        assert artifact["inputs"]["templates/template.md"] == hashlib.sha256(template).hexdigest()
+        assert "pfs/A/document.yaml" in artifact["inputs"]
+        assert "requirements/general/metadata.yaml" in artifact["inputs"]
+
+    def test_generate(self, corpus, tmp_path, monkeypatch):
+        file = compile_artifact(corpus, tmp_path)
+        compile(["A", "B"], tmp_path / "compiled" / "AB-editable", corpus, editable=True)
+        # the YAML files are not needed anymore
+        for folder in ("pfs", "requirements", "sections", "glossary", "references"):
+            shutil.rmtree(corpus / folder)
+        # the Markdown that pandoc converts to Word and HTML
+        markdown = []
+        monkeypatch.setattr(
+            generate_module.subprocess,
+            "run",
+            lambda cmd, cwd: markdown.append(Path(cmd[1]).read_text(encoding="utf-8")),
+        )
+
+        generate_module.generate_from_artifact(file, tmp_path / "rendered" / "AB", corpus, no_pdf=True, csl_json=True)
+        assert markdown == [
+            (tmp_path / "compiled" / "AB-editable.md").read_text(encoding="utf-8"),
+            (tmp_path / "compiled" / "AB.md").read_text(encoding="utf-8"),
+        ]
+        for ext in (".md", ".bib", ".csl.json"):
+            expected = (tmp_path / "compiled" / f"AB{ext}").read_text(encoding="utf-8")
+            assert (tmp_path / "rendered" / f"AB{ext}").read_text(encoding="utf-8") == expected
+        assert (tmp_path / "rendered" / "assets" / "img" / "logo.png").exists()
+
+    def test_changed_template(self, corpus, tmp_path, monkeypatch, capsys):
+        file = compile_artifact(corpus, tmp_path)
+        template = corpus / "templates" / "template.md"
+        template.write_text(template.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+        invalidate_snapshots()
+        monkeypatch.setattr(generate_module.subprocess, "run", lambda cmd, cwd: None)
+        generate_module.generate_from_artifact(file, tmp_path / "out" / "AB", corpus, no_pdf=True, no_docx=True)
+        assert "WARNING: templates/template.md has changed since the artifact was compiled" in capsys.readouterr().out
+
+    def test_version(self, tmp_path):
+        file = tmp_path / "old.artifact.json.gz"
+        with gzip.open(file, "wb") as f:
+            f.write(json.dumps({"format": "ceos-ard-compiled-pfs", "version": 0}).encode("utf-8"))
+        with pytest.raises(ValueError, match="version 0"):
+            read_artifact(file)
+        (tmp_path / "plain.json").write_text("{}", encoding="utf-8")
+        with pytest.raises(ValueError, match="not a compiled PFS artifact"):
+            read_artifact(tmp_path / "plain.json")
+
+    def test_cli(self, corpus, tmp_path):
+        file = compile_artifact(corpus, tmp_path)
+        result = CliRunner().invoke(cli, ["generate", "A", "--from-artifact", str(file)])
+        assert result.exit_code == 2
+        assert "can't be changed for a compiled artifact" in result.output
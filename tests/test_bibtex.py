@@ -0,0 +1,76 @@
+"""Tests for reading BibTeX files and the conversion to CSL-JSON."""
+
+import os
+
+import bibtexparser
+
+from ceos_ard_cli.utils import bibtex
+from ceos_ard_cli.utils.bibtex import BIBTEX_CACHE, read_bibtex, to_csl_json
+from ceos_ard_cli.utils.files import FILE_CACHE
+
+
+class TestReadBibtex:
+    def test_parsed_once(self, tmp_path):
+        file = tmp_path / "smith2020.bib"
+        file.write_text("@misc{smith2020,\n  year = {2020}\n}\n", encoding="utf-8")
+        library = read_bibtex(file)
+        # an unchanged file isn't parsed again, even if the file cache has read it again
+        FILE_CACHE.invalidate(file)
+        assert read_bibtex(file) is library
+
+        file.write_text("@misc{smith2020,\n  year = {2021}\n}\n", encoding="utf-8")
+        os.utime(file, ns=(2_000_000_000, 2_000_000_000))
+        FILE_CACHE.revalidate()
+        assert read_bibtex(file).entries[0]["year"] == "2021"
+
+    def test_lru(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(bibtex, "BIBTEX_CACHE_MAX_ENTRIES", 2)
+        files = []
+        for name in ("a", "b", "c"):
+            file = tmp_path / f"{name}.bib"
+            file.write_text(f"@misc{{{name},\n  year = {{2020}}\n}}\n", encoding="utf-8")
+            files.append(file)
+        read_bibtex(files[0])
+        read_bibtex(files[1])
+        # a is now the most recently used file, so b gets evicted
+        read_bibtex(files[0])
+        read_bibtex(files[2])
+        assert list(BIBTEX_CACHE)[-2:] == [str(files[0]), str(files[2])]
+        assert str(files[1]) not in BIBTEX_CACHE
+
+
+class TestCslJson:
+    def test_converts_article(self):
+        library = bibtexparser.parse_string(
+            "@article{smith2020,\n"
+            "  title = {A study of {DEM} \\& things},\n"
+            "  author = {Smith, John and van Doe, Jane},\n"
+            "  journal = {Journal of Things},\n"
+            "  year = {2020},\n"
+            "  month = mar,\n"
+            "  doi = {10.1000/xyz}\n"
+            "}\n"
+        )
+        items = to_csl_json(library)
+        assert items == [
+            {
+                "id": "smith2020",
+                "type": "article-journal",
+                "title": 'A study of <span class="nocase">DEM</span> & things',
+                "author": [
+                    {"family": "Smith", "given": "John"},
+                    {"family": "Doe", "given": "Jane", "non-dropping-particle": "van"},
+                ],
+                "container-title": "Journal of Things",
+                "DOI": "10.1000/xyz",
+                "issued": {"date-parts": [[2020, 3]]},
+            }
+        ]
+        # the parsed library is not modified
+        assert library.entries[0]["author"] == "Smith, John and van Doe, Jane"
+
+    def test_institution_as_author(self):
+        library = bibtexparser.parse_string("@misc{esa,\n  author = {{European Space Agency}},\n  year = {2021}\n}\n")
+        items = to_csl_json(library)
+        assert items[0]["type"] == "document"
+        assert items[0]["author"] == [{"literal": "European Space Agency"}]
@@ -29,3 +29,15 @@ class TestCLI:
 
         assert result.exit_code == 0
         assert __version__ in result.output
+
+    def test_validate_exit_code(self, corpus):
+        """Test that validate fails if there are errors in the building blocks."""
+        runner = CliRunner()
+        result = runner.invoke(cli, ["validate", "-i", str(corpus)])
+        assert result.exit_code == 0
+
+        # B references the removed requirement
+        (corpus / "requirements" / "general" / "radiometry.yaml").unlink()
+        result = runner.invoke(cli, ["validate", "-i", str(corpus)])
+        assert "radiometry" in result.output
+        assert result.exit_code == 1
@@ -0,0 +1,195 @@
+"""Tests for the compilation of PFS documents."""
+
+import copy
+import importlib
+import json
+import shutil
+
+from ceos_ard_cli.compile import (
+    BubbleUp,
+    asset_paths,
+    bubble_up,
+    compile,
+    load_document,
+    load_members,
+    load_pfs,
+    topological_sort_requirements,
+)
+from ceos_ard_cli.model import Interner, PfsDocument
+from ceos_ard_cli.utils.deprecation import FindDeprecated, find_deprecated
+from ceos_ard_cli.utils.files import invalidate_snapshots
+from ceos_ard_cli.utils.template import read_template
+from ceos_ard_cli.utils.visitor import walk
+
+# the compile command of the CLI shadows the module in the package
+compile_module = importlib.import_module("ceos_ard_cli.compile")
+
+
+class TestCompile:
+    def test_compile_combined(self, corpus, tmp_path):
+        out = compile(["A", "B"], tmp_path / "out" / "AB", corpus)
+        markdown = (tmp_path / "out" / "AB.md").read_text(encoding="utf-8")
+        assert markdown.startswith("# Combined: Product A / Product B")
+        assert "### Metadata {#sec:general-metadata}" in markdown
+        assert 'see @sec:general-metadata and "Topographic phase removal"' in markdown
+        assert (tmp_path / "out" / "assets" / "img" / "logo.png").exists()
+        assert out == tmp_path / "out" / "AB"
+
+    def test_compile_loaded(self, corpus, tmp_path):
+        interner = Interner()
+        loaded = {p: load_document(p, corpus, interner) for p in ("A", "B")}
+        original = copy.deepcopy(loaded)
+        compile(["A", "B"], tmp_path / "loaded" / "AB", corpus, editable=True, loaded=loaded, assets=False)
+        compile(["A", "B"], tmp_path / "loaded" / "AB-2", corpus, editable=True, loaded=loaded, assets=False)
+        compile(["A", "B"], tmp_path / "read" / "AB", corpus, editable=True)
+        # the loaded data is not modified and can be reused
+        assert loaded == original
+        assert not (tmp_path / "loaded" / "assets").exists()
+        expected = (tmp_path / "read" / "AB.md").read_text(encoding="utf-8")
+        assert (tmp_path / "loaded" / "AB.md").read_text(encoding="utf-8") == expected
+        assert (tmp_path / "loaded" / "AB-2.md").read_text(encoding="utf-8") == expected
+
+    def test_load_members(self, corpus, tmp_path):
+        # the first PFS is loaded in this process, the others in parallel processes
+        shutil.copytree(corpus / "pfs" / "B", corpus / "pfs" / "C")
+        members = load_members(["B", "A", "C"], corpus, jobs=2)
+        assert members == [load_pfs(p, corpus) for p in ("B", "A", "C")]
+
+        compile(["A", "B", "C"], tmp_path / "parallel" / "ABC", corpus, emit_artifact=True, jobs=2)
+        compile(["A", "B", "C"], tmp_path / "serial" / "ABC", corpus, emit_artifact=True)
+        for ext in (".md", ".bib", ".artifact.json.gz"):
+            parallel = (tmp_path / "parallel" / f"ABC{ext}").read_bytes()
+            assert parallel == (tmp_path / "serial" / f"ABC{ext}").read_bytes()
+
+    def test_load_members_without_fork(self, corpus, monkeypatch):
+        # e.g. on macOS, where forking is unsafe
+        shutil.copytree(corpus / "pfs" / "B", corpus / "pfs" / "C")
+        monkeypatch.setattr(compile_module.sys, "platform", "darwin")
+        monkeypatch.setattr(compile_module, "process_pool", None)
+        assert load_members(["B", "A", "C"], corpus, jobs=2) == [load_pfs(p, corpus) for p in ("B", "A", "C")]
+
+    def test_referenced_assets(self, corpus, tmp_path):
+        (corpus / "assets" / "img" / "unused.png").write_bytes(b"UNUSED")
+        out = tmp_path / "out"
+        # B only references the logo
+        compile(["B"], out / "B", corpus)
+        assert sorted(f.name for f in (out / "assets" / "img").iterdir()) == ["logo.png"]
+        # the assets of other documents in the same folder are kept
+        compile(["A"], out / "A", corpus)
+        assert sorted(f.name for f in (out / "assets" / "img").iterdir()) == ["fig.png", "logo.png"]
+        # assets that have been removed from the input directory are removed
+        (corpus / "assets" / "img" / "fig.png").unlink()
+        compile(["B"], out / "B", corpus)
+        assert sorted(f.name for f in (out / "assets" / "img").iterdir()) == ["logo.png"]
+
+    def test_asset_paths(self, corpus, tmp_path, capsys):
+        assert asset_paths(
+            '![fig](assets/img/my%20fig.png "Figure") [pdf](<assets/doc/a file.pdf>) [x](https://example.com/assets/x)\n'
+            "[ref]: ./assets/img/ref.png#part\n"
+            "<img src='assets/img/b c.png?v=1'> url(\"assets/img/d.png\") see assets/img/e.png."
+        ) == {
+            "assets/img/my fig.png",
+            "assets/doc/a file.pdf",
+            "assets/img/ref.png",
+            "assets/img/b c.png",
+            "assets/img/d.png",
+            "assets/img/e.png",
+        }
+
+        (corpus / "assets" / "img" / "my fig.png").write_bytes(b"SPACE")
+        topo = corpus / "sections" / "annexes" / "topo.yaml"
+        text = topo.read_text(encoding="utf-8").replace(
+            "![fig](assets/img/fig.png)", "![fig](assets/img/my%20fig.png) ![gone](<assets/img/gone file.png>)"
+        )
+        topo.write_text(text, encoding="utf-8")
+        compile(["A"], tmp_path / "out" / "A", corpus)
+        assert sorted(f.name for f in (tmp_path / "out" / "assets" / "img").iterdir()) == ["logo.png", "my fig.png"]
+        assert "WARNING: assets/img/gone file.png is referenced but doesn't exist" in capsys.readouterr().out
+
+    def test_template_cache(self, corpus, tmp_path):
+        # the template is only compiled once for all documents
+        template = read_template(corpus)
+        assert read_template(corpus) is template
+        compile(["A"], tmp_path / "first" / "A", corpus)
+        file = corpus / "templates" / "template.md"
+        file.write_text("Changed ~{ title }~\n" + file.read_text(encoding="utf-8"), encoding="utf-8")
+        # the file is only checked on disk again after the snapshots have been invalidated
+        assert read_template(corpus) is template
+        invalidate_snapshots()
+        assert read_template(corpus) is not template
+        compile(["A"], tmp_path / "second" / "A", corpus)
+        first = (tmp_path / "first" / "A.md").read_text(encoding="utf-8")
+        assert (tmp_path / "second" / "A.md").read_text(encoding="utf-8") == "Changed Product A\n" + first
+
+
+def term(name, deprecated=False, references=[]):
+    return {"filepath": f"glossary/{name}.yaml", "term": name, "references": references, "deprecated": deprecated}
+
+
+class TestTreeWalks:
+    def document(self):
+        # the glossary of the document is listed before the building blocks that add terms to it
+        return {
+            "title": "PFS",
+            "version": "1",
+            "glossary": [term("a", references=["r1"])],
+            "references": [],
+            "requirements": [
+                {
+                    "category": {"filepath": "c.yaml", "title": "C", "deprecated": True},
+                    "requirements": [
+                        {"filepath": "r.yaml", "glossary": [term("b", True, ["r2"])], "references": ["r3"]}
+                    ],
+                }
+            ],
+            "annexes": [{"filepath": "x.yaml", "glossary": [term("c", True)], "deprecated": True}],
+        }
+
+    def test_single_walk(self):
+        separate = bubble_up(self.document())
+        expected = find_deprecated(separate)
+        # the terms are found in the glossary of the document first
+        assert expected == [
+            "glossary term 'b' (glossary/b.yaml)",
+            "glossary term 'c' (glossary/c.yaml)",
+            "section 'C' (c.yaml)",
+            "section '' (x.yaml)",
+        ]
+
+        data = self.document()
+        deprecated = FindDeprecated(data)
+        walk(data, BubbleUp(data), deprecated)
+        assert deprecated.result() == expected
+        assert data == separate
+        assert [t["term"] for t in data["glossary"]] == ["a", "b", "c"]
+        assert data["references"] == ["r1", "r3", "r2"]
+
+
+class TestModel:
+    def test_round_trip(self, corpus):
+        data = load_pfs("A", corpus)
+        document = PfsDocument.from_dict(data)
+        assert document.to_dict() == data
+        # the same keys in the same order, e.g. for the debug output
+        assert json.dumps(document.to_dict()) == json.dumps(data)
+        # fresh dicts are returned on every call
+        assert document.to_dict()["requirements"] is not document.to_dict()["requirements"]
+
+    def test_interning(self, corpus):
+        interner = Interner()
+        a = load_document("A", corpus, interner)
+        b = load_document("B", corpus, interner)
+        # the requirement about metadata is used by both PFS
+        metadata_a = a.requirements[0].requirements[0]
+        metadata_b = b.requirements[0].requirements[0]
+        assert metadata_a.id == "metadata"
+        assert metadata_a is metadata_b
+        assert interner.hits > 0
+
+
+class TestTopologicalSort:
+    def test_sort(self):
+        orders = [["A", "B", "C", "D", "E"], ["A", "C", "E", "F", "X"], ["A", "A2", "B", "E", "F"]]
+        groups = {"A": "grp1", "A2": "grp1"}
+        expected = ["A", "A2", "B", "C", "D", "E", "F", "X"]
+        assert topological_sort_requirements(orders, groups) == expected
@@ -0,0 +1,147 @@
+"""Tests for numbering the sections and resolving the @sec: references without pandoc-crossref."""
+
+import shutil
+import subprocess
+
+import pytest
+
+from ceos_ard_cli.compile import compile
+from ceos_ard_cli.crossref import (
+    number_sections,
+    read_front_matter,
+    read_settings,
+    resolve_crossrefs,
+    split_code_spans,
+)
+from ceos_ard_cli.generate import pandoc_command
+
+DOCUMENT = """# Introduction
+
+## Scope {#sec:intro-scope}
+
+See @sec:general-a, [@sec:general-b] and @Sec:annex-x.
+
+# Requirements {.unnumbered}
+
+## General {#sec:general}
+
+### A {#sec:general-a}
+
+### B {#sec:general-b}
+
+### C {#sec:general-c}
+
+```
+@sec:general-a in code
+```
+
+Ranges: [@sec:general-a; @sec:general-b; @sec:general-c], pairs: [@sec:general-a; @sec:general-c].
+Without prefix: [-@sec:general-c]. Unknown: @sec:missing. Mail: info@sec:general.
+
+# Annexes
+
+## X {#sec:annex-x}
+
+Inline code: `@sec:general-a`, ``[@sec:general-b]`` and \\`@sec:annex-x`.
+"""
+
+
+class TestCrossref:
+    def test_numbers(self):
+        numbers = number_sections(DOCUMENT.split("\n"))
+        assert numbers == {
+            "sec:intro-scope": "1.1",
+            # the unnumbered Requirements heading is skipped
+            "sec:general": "1.2",
+            "sec:general-a": "1.2.1",
+            "sec:general-b": "1.2.2",
+            "sec:general-c": "1.2.3",
+            "sec:annex-x": "2.1",
+        }
+
+    def test_references(self):
+        lines = resolve_crossrefs(DOCUMENT).split("\n")
+        assert lines[4] == "See sec.\\ 1.2.1, sec.\\ 1.2.2 and Sec.\\ 2.1."
+        assert lines[17] == "@sec:general-a in code"
+        assert lines[20] == "Ranges: secs.\\ 1.2.1-1.2.3, pairs: secs.\\ 1.2.1, 1.2.3."
+        assert lines[21] == "Without prefix: 1.2.3. Unknown: sec.\\ **¿sec:missing?**. Mail: info@sec:general."
+        # inline code spans are kept, an escaped backtick doesn't start a code span
+        assert lines[27] == "Inline code: `@sec:general-a`, ``[@sec:general-b]`` and \\`sec.\\ 2.1`."
+
+    def test_split_code_spans(self):
+        assert split_code_spans("a `@sec:x` b") == [(False, "a "), (True, "`@sec:x`"), (False, " b")]
+        # the closing run must have the same length as the opening run
+        assert split_code_spans("``a ` b`` c") == [(False, ""), (True, "``a ` b``"), (False, " c")]
+        assert split_code_spans("`a`` b") == [(False, "`a`` b")]
+        assert split_code_spans("\\`a` `b`") == [(False, "\\`a"), (True, "` `"), (False, "b`")]
+
+    def test_mixed_groups(self):
+        with pytest.raises(ValueError, match=r"citations are not supported, found: \[@sec:a; @smith2020\]$"):
+            resolve_crossrefs("# A {#sec:a}\n\nSee [@sec:a; @smith2020] and `[@sec:b; @doe2021]`.")
+        # citation groups without section references are kept
+        markdown = "# A {#sec:a}\n\nSee [@smith2020; @doe2021] and [@sec:a; -@sec:a]."
+        assert resolve_crossrefs(markdown).endswith("See [@smith2020; @doe2021] and secs.\\ 1, 1.")
+
+    def test_settings(self):
+        markdown = (
+            '---\ntitle: "@sec:a"\nsecPrefix: [Section, Sections]\nlinkReferences: true\n---\n\n# A {#sec:a}\n\n@sec:a'
+        )
+        assert resolve_crossrefs(markdown).split("\n")[1:] == [
+            'title: "@sec:a"',
+            "secPrefix: [Section, Sections]",
+            "linkReferences: true",
+            "---",
+            "",
+            "# A {#sec:a}",
+            "",
+            "Section\\ [1](#sec:a)",
+        ]
+
+    def test_unsupported(self, tmp_path):
+        with pytest.raises(ValueError, match="settings nameInLink, sectionsDepth are not supported"):
+            resolve_crossrefs("---\nsectionsDepth: 2\nnameInLink: true\n---\n\n# A {#sec:a}\n")
+        (tmp_path / "pandoc-crossref.yaml").write_text("numberSections: true\nsecPrefix: Section\n", encoding="utf-8")
+        settings = read_settings(tmp_path)
+        with pytest.raises(ValueError, match="settings numberSections are not supported"):
+            resolve_crossrefs("# A {#sec:a}\n", settings=settings)
+        # the front matter takes precedence over the settings file
+        assert resolve_crossrefs(
+            "---\nsecPrefix: Sec.\n---\n# A {#sec:a}\n@sec:a", settings={"secPrefix": "S"}
+        ).endswith("Sec.\\ 1")
+
+        with pytest.raises(ValueError, match="found: @fig:logo, @tbl:x"):
+            resolve_crossrefs("# A {#sec:a}\n\nSee @fig:logo and [@tbl:x], not `@lst:code`.\n\n```\n@eq:code\n```")
+        # all sections of the document must have a numbered heading
+        with pytest.raises(ValueError, match="No numbered heading for the sections: b, c"):
+            resolve_crossrefs("# A {#sec:a}\n\n# B {#sec:b .unnumbered}", anchors=["a", "b", "c"])
+
+        assert read_front_matter(["---", "a: [b", "---"]) == ({}, 3)
+
+    @pytest.mark.skipif(
+        shutil.which("pandoc") is None or shutil.which("pandoc-crossref") is None,
+        reason="requires pandoc and pandoc-crossref",
+    )
+    @pytest.mark.parametrize("front_matter", ["", "---\nsecPrefix: [Section, Sections]\nlinkReferences: true\n---\n"])
+    def test_pandoc_crossref(self, tmp_path, front_matter):
+        markdown = front_matter + DOCUMENT.replace(" Unknown: @sec:missing.", "")
+        (tmp_path / "filter.md").write_text(markdown, encoding="utf-8")
+        (tmp_path / "compiler.md").write_text(resolve_crossrefs(markdown), encoding="utf-8")
+
+        def convert(name, *args):
+            cmd = ["pandoc", f"{name}.md", "-f", "markdown", "-t", "html", *args]
+            return subprocess.run(cmd, cwd=tmp_path, check=True, capture_output=True, text=True).stdout
+
+        assert convert("compiler") == convert("filter", "-F", "pandoc-crossref")
+
+    def test_compile(self, corpus, tmp_path):
+        compile(["A"], tmp_path / "filter" / "A", corpus)
+        compile(["A"], tmp_path / "compiler" / "A", corpus, crossref=False)
+        with_filter = (tmp_path / "filter" / "A.md").read_text(encoding="utf-8")
+        without_filter = (tmp_path / "compiler" / "A.md").read_text(encoding="utf-8")
+        assert "see @sec:general-metadata and" in with_filter
+        # Product A (1), Introduction (1.1), General Metadata (1.2), Metadata (1.2.1)
+        assert "see sec.\\ 1.2.1 and" in without_filter
+        assert with_filter.replace("@sec:general-metadata", "sec.\\ 1.2.1") == without_filter
+
+        assert "pandoc-crossref" in pandoc_command(tmp_path / "A", "html", corpus)
+        assert "pandoc-crossref" not in pandoc_command(tmp_path / "A", "html", corpus, crossref=False)
@@ -0,0 +1,153 @@
+"""Tests for embedding the assets into self-contained HTML files with a shared cache."""
+
+import base64
+import importlib
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from ceos_ard_cli.utils.embed import DataUriCache, embed_file, embed_resources
+
+# the generate command of the CLI shadows the module in the package
+generate_module = importlib.import_module("ceos_ard_cli.generate")
+
+
+def data_uri(mime, content):
+    return f"data:{mime};base64,{base64.b64encode(content).decode('ascii')}"
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class TestEmbed:
+    def test_embed_resources(self, corpus):
+        (corpus / "templates" / "style.css").write_text(
+            "body { background: url('../assets/img/logo.png'); }", encoding="utf-8"
+        )
+        html = (
+            '<link rel="stylesheet" href="templates/style.css" />\n'
+            '<link rel="icon" href="assets/img/logo.png" />\n'
+            '<img src="assets/img/logo.png" /><img src="assets/img/fig.png" />\n'
+            '<img src="ftp://example.com/x.png" /><img src="assets/img/missing.png" />'
+        )
+        cache = DataUriCache()
+        missing = []
+        lines = embed_resources(html, corpus, cache, missing).split("\n")
+        logo = data_uri("image/png", b"PNG")
+        assert lines[:3] == ["<style>", f'body {{ background: url("{logo}"); }}', "</style>"]
+        # only stylesheets are embedded
+        assert lines[3] == '<link rel="icon" href="assets/img/logo.png" />'
+        assert lines[4] == f'<img src="{logo}" /><img src="{data_uri("image/png", b"PNGFIG")}" />'
+        assert lines[5] == '<img src="ftp://example.com/x.png" /><img src="assets/img/missing.png" />'
+        assert missing == ["ftp://example.com/x.png", "assets/img/missing.png"]
+        assert cache.stats() == {"assets": 2, "hits": 1, "misses": 2, "bytes": 9}
+
+    def test_inline_styles(self, corpus):
+        html = (
+            "<style>\nh1 { background: url(assets/img/logo.png); }\n</style>\n"
+            '<div style="background: url(&quot;assets/img/fig.png&quot;)">'
+            "<p style='background: url(assets/img/missing.png)'>"
+        )
+        missing = []
+        lines = embed_resources(html, corpus, DataUriCache(), missing).split("\n")
+        logo = data_uri("image/png", b"PNG")
+        assert lines[:3] == ["<style>", f'h1 {{ background: url("{logo}"); }}', "</style>"]
+        fig = data_uri("image/png", b"PNGFIG")
+        assert (
+            lines[3]
+            == f"<div style=\"background: url(&quot;{fig}&quot;)\"><p style='background: url(assets/img/missing.png)'>"
+        )
+        assert missing == ["assets/img/missing.png"]
+
+    def test_encoded_urls(self, corpus, tmp_path, capsys):
+        (corpus / "assets" / "img" / "my logo.png").write_bytes(b"SPACE")
+        file = tmp_path / "A.html"
+        file.write_text(
+            '<img src="assets/img/my%20logo.png?v=2#part" /><img src="assets/img/my%20missing.png" />',
+            encoding="utf-8",
+        )
+        embed_file(file, corpus, DataUriCache())
+        html = file.read_text(encoding="utf-8")
+        assert html == f'<img src="{data_uri("image/png", b"SPACE")}" /><img src="assets/img/my%20missing.png" />'
+        assert capsys.readouterr().out == "WARNING: assets/img/my%20missing.png could not be embedded into A.html\n"
+
+    def test_remote_resources(self, tmp_path):
+        (tmp_path / "img").mkdir()
+        (tmp_path / "img" / "logo.png").write_bytes(b"REMOTE")
+        (tmp_path / "style.css").write_text("body { background: url(img/logo.png); }", encoding="utf-8")
+        handler = partial(QuietHandler, directory=str(tmp_path))
+        with ThreadingHTTPServer(("127.0.0.1", 0), handler) as server:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                url = f"http://127.0.0.1:{server.server_address[1]}"
+                html = (
+                    f'<link rel="stylesheet" href="{url}/style.css" />\n'
+                    f'<img src="{url}/img/logo.png" /><img src="{url}/img/missing.png" />'
+                )
+                cache = DataUriCache()
+                missing = []
+                lines = embed_resources(html, tmp_path, cache, missing).split("\n")
+            finally:
+                server.shutdown()
+        logo = data_uri("image/png", b"REMOTE")
+        assert lines == [
+            "<style>",
+            f'body {{ background: url("{logo}"); }}',
+            "</style>",
+            f'<img src="{logo}" /><img src="{url}/img/missing.png" />',
+        ]
+        assert missing == [f"{url}/img/missing.png"]
+        # the logo is only fetched and encoded once
+        assert cache.stats()["misses"] == 1
+
+    def test_shared_by_documents(self, corpus):
+        # the same content in another file is only encoded once
+        (corpus / "assets" / "img" / "copy.png").write_bytes(b"PNG")
+        cache = DataUriCache()
+        first = embed_resources('<img src="assets/img/logo.png" />', corpus, cache)
+        second = embed_resources('<img src="assets/img/copy.png" />', corpus, cache)
+        assert first == second
+        assert cache.stats()["misses"] == 1
+
+    def test_run_pandoc(self, corpus, monkeypatch):
+        out = corpus / "out" / "A"
+        out.parent.mkdir()
+        commands = []
+
+        def run(cmd, cwd):
+            commands.append(cmd)
+            out.with_suffix(".html").write_text('<img src="assets/img/fig.png" />', encoding="utf-8")
+
+        monkeypatch.setattr(generate_module.subprocess, "run", run)
+        generate_module.run_pandoc(out, "html", corpus, self_contained=True, data_uris=DataUriCache())
+        assert "--embed-resources=true" not in commands[0]
+        html = out.with_suffix(".html").read_text(encoding="utf-8")
+        assert html == f'<img src="{data_uri("image/png", b"PNGFIG")}" />'
+
+    def test_missing_assets(self, corpus, monkeypatch, capsys):
+        out = corpus / "out" / "A"
+        (out.parent / "assets" / "img").mkdir(parents=True)
+        (out.parent / "assets" / "img" / "fig.png").write_bytes(b"PNGFIG")
+
+        def run(cmd, cwd):
+            html = '<img src="assets/img/fig.png" /><img src="assets/img/logo%20small.png" />'
+            out.with_suffix(".html").write_text(html, encoding="utf-8")
+
+        monkeypatch.setattr(generate_module.subprocess, "run", run)
+        generate_module.run_pandoc(out, "html", corpus, self_contained=False)
+        assert capsys.readouterr().out == (
+            "WARNING: A.html references assets/img/logo small.png, which is not in the output folder\n"
+        )
+
+    def test_resource_path(self, corpus, tmp_path):
+        # e.g. the optimized images in the output folder, the other resources from the input directory
+        (tmp_path / "assets" / "img").mkdir(parents=True)
+        (tmp_path / "assets" / "img" / "logo.png").write_bytes(b"SMALL")
+        html = '<img src="assets/img/logo.png" /><img src="assets/img/fig.png" />'
+        embedded = embed_resources(html, [tmp_path, corpus], DataUriCache())
+        assert embedded == (
+            f'<img src="{data_uri("image/png", b"SMALL")}" /><img src="{data_uri("image/png", b"PNGFIG")}" />'
+        )
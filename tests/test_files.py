@@ -0,0 +1,111 @@
+"""Tests for the file cache."""
+
+import os
+
+from ceos_ard_cli.utils.files import FILE_CACHE, DirectorySnapshot, FileCache, log_reads, prefetch, read_file
+
+
+def touch(path, content, mtime):
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+
+
+class TestFileCache:
+    def test_hits_and_misses(self, tmp_path):
+        file = tmp_path / "a.yaml"
+        touch(file, "a: 1", 1_000_000_000)
+        cache = FileCache()
+        assert cache.get(file) == "a: 1"
+        assert cache.get(file) == "a: 1"
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["bytes"] == 4
+
+    def test_invalidates_changed_files(self, tmp_path):
+        file = tmp_path / "a.yaml"
+        touch(file, "a: 1", 1_000_000_000)
+        cache = FileCache()
+        assert cache.get(file) == "a: 1"
+        touch(file, "a: 2", 2_000_000_000)
+        # the file is only checked on disk once per generation
+        assert cache.get(file) == "a: 1"
+        cache.revalidate()
+        assert cache.get(file) == "a: 2"
+        assert cache.stats()["misses"] == 2
+        assert len(cache) == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        files = []
+        for name in ("a", "b", "c"):
+            file = tmp_path / f"{name}.yaml"
+            touch(file, "12345", 1_000_000_000)
+            files.append(file)
+        cache = FileCache(max_size=10)
+        cache.get(files[0])
+        cache.get(files[1])
+        # a is now the most recently used file, so b gets evicted
+        cache.get(files[0])
+        cache.get(files[2])
+        assert files[0] in cache
+        assert files[1] not in cache
+        assert files[2] in cache
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] == 10
+
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.stats()["bytes"] == 0
+
+    def test_log_reads(self, tmp_path):
+        file = tmp_path / "a.yaml"
+        touch(file, "a: 1", 1_000_000_000)
+        read_file(file)
+        with log_reads() as used_files:
+            # cached files are logged, too
+            read_file(file)
+        read_file(tmp_path / "a.yaml")
+        assert used_files == {str(file.absolute())}
+
+
+class TestDirectorySnapshot:
+    def test_existence_checks(self, corpus):
+        snapshot = DirectorySnapshot(corpus)
+        assert snapshot.exists(corpus / "glossary" / "dem.yaml")
+        assert snapshot.is_file(corpus / "requirements" / "general" / "metadata.yaml")
+        assert snapshot.is_dir(corpus / "pfs" / "A")
+        assert not snapshot.is_file(corpus / "pfs" / "A")
+        assert not snapshot.exists(corpus / "glossary" / "missing.yaml")
+        # paths are normalized
+        assert snapshot.exists(corpus / "sections" / ".." / "glossary" / "dem.yaml")
+        # paths outside of the listed folders are checked on disk
+        assert snapshot.is_file(corpus / "templates" / "template.md")
+        assert snapshot.files("glossary") == [corpus / "glossary" / "dem.yaml"]
+
+    def test_invalidate(self, corpus):
+        snapshot = DirectorySnapshot(corpus)
+        file = corpus / "glossary" / "new.yaml"
+        assert not snapshot.exists(file)
+        file.write_text("term: New\ndescription: New\n", encoding="utf-8")
+        # the folders are only listed once
+        assert not snapshot.exists(file)
+        snapshot.invalidate()
+        assert snapshot.exists(file)
+
+
+class TestPrefetch:
+    def test_prefetch(self, corpus, capsys):
+        # disabled by default
+        assert prefetch(corpus) is None
+        count, size, _ = prefetch(corpus, workers=4)
+        # 2 PFS documents, 3 requirements, 3 sections, 1 glossary term, 1 reference
+        assert count == 10
+        assert size > 0
+        assert "Prefetched 10 files" in capsys.readouterr().out
+        assert corpus / "glossary" / "dem.yaml" in FILE_CACHE
+        assert corpus / "templates" / "template.md" not in FILE_CACHE
+        hits = FILE_CACHE.hits
+        read_file(corpus / "references" / "smith2020.bib")
+        assert FILE_CACHE.hits == hits + 1
+        # only once per corpus
+        assert prefetch(corpus, workers=4) is None
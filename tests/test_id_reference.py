@@ -0,0 +1,67 @@
+"""Tests for the shared building blocks that are resolved by IdReference."""
+
+import copy
+import os
+
+from ceos_ard_cli.compile import compile, load_pfs
+from ceos_ard_cli.strictyaml.id_reference import BLOCK_CACHE, BlockCache
+from ceos_ard_cli.utils.files import FILE_CACHE, invalidate_snapshots, log_reads
+
+
+def find_requirement(data, id):
+    for block in data["requirements"]:
+        for req in block["requirements"]:
+            if req["id"] == id:
+                return req
+
+
+class TestBlockCache:
+    def test_shared_between_pfs(self, corpus):
+        a = load_pfs("A", corpus)
+        b = load_pfs("B", corpus)
+        assert find_requirement(a, "metadata") is find_requirement(b, "metadata")
+        assert a["introduction"][0] is b["introduction"][0]
+        # the category of B is overridden, only B gets a modified copy
+        assert b["requirements"][0]["category"]["title"] == "General for B"
+        assert a["requirements"][0]["category"]["title"] == "General Metadata"
+
+    def test_not_modified_by_compile(self, corpus, tmp_path):
+        metadata = find_requirement(load_pfs("A", corpus), "metadata")
+        original = copy.deepcopy(metadata)
+        compile(["A"], tmp_path / "out" / "A", corpus, debug=True)
+        compile(["A", "B"], tmp_path / "out" / "AB", corpus, editable=True)
+        assert metadata == original
+        assert "threshold" not in metadata
+        assert "uid" not in metadata
+
+    def test_invalidated_by_dependencies(self, corpus):
+        metadata = find_requirement(load_pfs("A", corpus), "metadata")
+        assert metadata["glossary"][0]["description"] == "Digital Elevation Model"
+        # the requirement itself is unchanged, but the glossary term that it uses has changed
+        glossary = corpus / "glossary" / "dem.yaml"
+        glossary.write_text("term: DEM\ndescription: Changed\n", encoding="utf-8")
+        os.utime(glossary, ns=(2_000_000_000, 2_000_000_000))
+        invalidate_snapshots()
+        metadata = find_requirement(load_pfs("A", corpus), "metadata")
+        assert metadata["glossary"][0]["description"] == "Changed"
+
+    def test_cached_blocks_are_not_read_again(self, corpus):
+        BLOCK_CACHE.clear()
+        load_pfs("A", corpus)
+        misses = FILE_CACHE.stats()["misses"]
+        FILE_CACHE.clear()
+        with log_reads() as files:
+            load_pfs("B", corpus)
+        # only the files of B itself are read, the shared blocks are checked by their modification time and size
+        assert FILE_CACHE.stats()["misses"] - misses == 2
+        assert str(corpus / "glossary" / "dem.yaml") in files
+
+    def test_lru(self):
+        cache = BlockCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        # b is the least recently used entry
+        assert cache.get("b") is None
+        assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
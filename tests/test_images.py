@@ -0,0 +1,90 @@
+"""Tests for optimizing the images in the assets."""
+
+import io
+import os
+import pickle
+
+import pytest
+
+from ceos_ard_cli.compile import compile
+from ceos_ard_cli.generate import pandoc_command
+from ceos_ard_cli.utils import images
+
+pytestmark = pytest.mark.skipif(not images.is_available(), reason="Pillow is not installed")
+
+
+def image(size, format="PNG", dpi=None):
+    from PIL import Image
+
+    output = io.BytesIO()
+    # a gradient, which is not trivial to compress
+    data = Image.linear_gradient("L").resize(size).convert("RGB")
+    data.save(output, format, **({"dpi": dpi} if dpi else {}))
+    return output.getvalue()
+
+
+def open_image(file):
+    from PIL import Image
+
+    return Image.open(file)
+
+
+class TestImageOptimizer:
+    def test_downsample(self, tmp_path):
+        source = tmp_path / "large.png"
+        source.write_bytes(image((800, 400)))
+        optimizer = images.ImageOptimizer(tmp_path / "cache", max_size=200)
+        target = optimizer.optimize(source)
+        assert target.parent.parent == tmp_path / "cache"
+        with open_image(target) as result:
+            assert result.size == (200, 100)
+        assert optimizer.optimize(source) == target
+        assert optimizer.stats()["misses"] == 1
+
+        # the cache is shared by other runs with the same settings
+        again = images.ImageOptimizer(tmp_path / "cache", max_size=200)
+        assert again.optimize(source) == target
+        assert again.stats() == {"hits": 1, "misses": 0, "bytes_saved": 0}
+        other = images.ImageOptimizer(tmp_path / "cache", max_size=100)
+        assert other.optimize(source) != target
+
+    def test_dpi(self, tmp_path):
+        source = tmp_path / "photo.jpg"
+        source.write_bytes(image((600, 300), "JPEG", dpi=(300, 300)))
+        target = images.ImageOptimizer(tmp_path / "cache", max_dpi=150, quality=70).optimize(source)
+        with open_image(target) as result:
+            assert result.size == (300, 150)
+            assert round(result.info["dpi"][0]) == 150
+
+    def test_unchanged(self, tmp_path):
+        # not an image and an image that can't be compressed further
+        (tmp_path / "broken.png").write_bytes(b"PNG")
+        small = image((10, 10))
+        (tmp_path / "small.png").write_bytes(small)
+        (tmp_path / "notes.txt").write_bytes(b"TEXT")
+        optimizer = images.ImageOptimizer(tmp_path / "cache")
+        assert optimizer.optimize(tmp_path / "broken.png").read_bytes() == b"PNG"
+        assert len(optimizer.optimize(tmp_path / "small.png").read_bytes()) <= len(small)
+        assert optimizer.optimize(tmp_path / "notes.txt") == tmp_path / "notes.txt"
+
+    def test_pickle(self, tmp_path):
+        # the compilations of generate-all run in a process pool
+        optimizer = pickle.loads(pickle.dumps(images.ImageOptimizer(tmp_path / "cache", max_size=10)))
+        source = tmp_path / "large.png"
+        source.write_bytes(image((100, 100)))
+        with open_image(optimizer.optimize(source)) as result:
+            assert result.size == (10, 10)
+
+    def test_compile(self, corpus, tmp_path):
+        original = image((800, 800))
+        (corpus / "assets" / "img" / "logo.png").write_bytes(original)
+        optimizer = images.ImageOptimizer(tmp_path / "cache", max_size=100)
+        compile(["B"], tmp_path / "out" / "B", corpus, images=optimizer)
+        with open_image(tmp_path / "out" / "assets" / "img" / "logo.png") as result:
+            assert result.size == (100, 100)
+        # the input directory is not modified
+        assert (corpus / "assets" / "img" / "logo.png").read_bytes() == original
+
+        cmd = pandoc_command(tmp_path / "out" / "B", "html", corpus, output_assets=True)
+        assert f"--resource-path={tmp_path / 'out'}{os.pathsep}." in cmd
+        assert not any(arg.startswith("--resource-path") for arg in pandoc_command(tmp_path / "B", "html", corpus))
@@ -0,0 +1,96 @@
+"""Tests for the index of the building blocks and the query command."""
+
+import json
+
+from click.testing import CliRunner
+
+from ceos_ard_cli import cli
+from ceos_ard_cli.index import CorpusIndex, open_index
+
+
+def paths(result):
+    return [entry["path"] for entry in result["blocks"]]
+
+
+class TestIndex:
+    def test_query(self, corpus, tmp_path):
+        index, updated = open_index(corpus, tmp_path / "index.json")
+        assert len(updated) == 9
+        # B uses the term through the shared requirement and section
+        result = index.query(term=["dem"])
+        assert paths(result) == [
+            "pfs/A/document.yaml",
+            "requirements/general/metadata.yaml",
+            "sections/introduction/intro.yaml",
+        ]
+        assert result["pfs"] == ["A", "B"]
+        assert paths(index.query(reference=["smith2020"]))[0] == "glossary/dem.yaml"
+        # the dependencies of A and geometry, given without or with the folder
+        result = index.query(alias=["general/metadata"])
+        assert paths(result) == ["pfs/A/document.yaml", "requirements/general/geometry.yaml"]
+        assert result == index.query(alias=["requirements/general/metadata.yaml"])
+        assert paths(index.query(title=["sections/annexes/topo"])) == ["requirements/general/geometry.yaml"]
+        assert index.query(block=["general/radiometry"])["pfs"] == ["B"]
+        # all filters and all words must match
+        assert paths(index.query(word=["general metadata"])) == ["sections/requirement-categories/general.yaml"]
+        assert paths(index.query(term=["dem"], word=["metadata"])) == ["requirements/general/metadata.yaml"]
+        assert index.query(term=["unknown"]) == {"blocks": [], "pfs": []}
+
+    def test_incremental(self, corpus, tmp_path):
+        file = tmp_path / "index.json"
+        open_index(corpus, file)
+        index, updated = open_index(corpus, file)
+        assert updated == []
+        assert index.query(term=["dem"])["pfs"] == ["A", "B"]
+
+        # B uses the glossary term in a new requirement instead of the metadata requirement
+        (corpus / "requirements" / "general" / "metadata.yaml").write_text(
+            "id: metadata\ntitle: Metadata\nrequirements:\n  threshold:\n    description: Changed.\n",
+            encoding="utf-8",
+        )
+        (corpus / "requirements" / "general" / "terms.yaml").write_text(
+            "id: terms\ntitle: Terms\nglossary:\n  - dem\nrequirements:\n  threshold:\n    description: Terms.\n",
+            encoding="utf-8",
+        )
+        (corpus / "sections" / "introduction" / "intro.yaml").unlink()
+        index, updated = open_index(corpus, file)
+        assert sorted(updated) == [
+            "requirements/general/metadata.yaml",
+            "requirements/general/terms.yaml",
+            "sections/introduction/intro.yaml",
+        ]
+        assert paths(index.query(term=["dem"])) == ["pfs/A/document.yaml", "requirements/general/terms.yaml"]
+        assert index.query(term=["dem"])["pfs"] == ["A"]
+        # the same result as indexing from scratch
+        rebuilt, _ = open_index(corpus, tmp_path / "rebuilt.json", rebuild=True)
+        assert rebuilt.query(term=["dem"]) == index.query(term=["dem"])
+        assert rebuilt.query(reference=["smith2020"]) == index.query(reference=["smith2020"])
+
+    def test_invalid(self, corpus, tmp_path):
+        file = tmp_path / "index.json"
+        (corpus / "requirements" / "general" / "broken.yaml").write_text("id: [broken\n", encoding="utf-8")
+        index, _ = open_index(corpus, file)
+        assert list(index.errors()) == ["requirements/general/broken.yaml"]
+        # an index of another version is ignored
+        data = json.loads(file.read_text(encoding="utf-8"))
+        data["version"] = 0
+        file.write_text(json.dumps(data), encoding="utf-8")
+        assert not CorpusIndex(corpus, file).load()
+
+    def test_cli(self, corpus, tmp_path):
+        args = ["query", "-i", str(corpus), "--index", str(tmp_path / "index.json")]
+        result = CliRunner().invoke(cli, args + ["--term", "dem"])
+        assert result.exit_code == 0, result.output
+        assert "Indexed 9 changed files" in result.output
+        assert "- requirements/general/metadata.yaml: Metadata" in result.output
+
+        result = CliRunner().invoke(cli, args + ["--block", "general/geometry", "--format", "json"])
+        assert result.exit_code == 0, result.output
+        assert json.loads(result.output) == {
+            "blocks": [{"path": "pfs/A/document.yaml", "title": "Product A"}],
+            "pfs": ["A"],
+        }
+
+        result = CliRunner().invoke(cli, args)
+        assert result.exit_code == 2
+        assert "At least one of" in result.output
@@ -1,6 +1,7 @@
-"""Tests for the @title: soft references."""
+"""Tests for the @title: soft references and the @alias references."""
 
-from ceos_ard_cli.links import resolve_titles
+from ceos_ard_cli.compile import load_pfs
+from ceos_ard_cli.links import AnchorIndex, get_anchor_index, resolve_links, resolve_titles, update_references
 
 
 def write_yaml(path, content):
@@ -39,3 +40,44 @@ class TestResolveTitles:
         errors = resolve_titles(data, tmp_path)
         assert len(errors) == 1
         assert "no title" in errors[0]
+
+
+class TestUpdateReferences:
+    def test_replaces_all_aliases(self):
+        container = {
+            "description": "see @time, @time-sar and @time-sar-x, but not @timestamp",
+            "requirements": {"threshold": {"description": "@time-sar.", "notes": ["@time"]}},
+        }
+        update_references(container, {"time": "a-time", "time-sar": "a-time-sar"})
+        assert container["description"] == "see @sec:a-time, @sec:a-time-sar and @time-sar-x, but not @timestamp"
+        assert container["requirements"]["threshold"] == {"description": "@sec:a-time-sar.", "notes": ["@sec:a-time"]}
+
+
+class TestAnchorIndex:
+    def test_lookups(self, corpus):
+        index = AnchorIndex(corpus)
+        root = corpus.resolve()
+        assert (
+            index.relative_id(root / "requirements" / "general" / "metadata.yaml", "requirements") == "general/metadata"
+        )
+        assert index.files("sections")[str(root / "sections" / "introduction" / "intro.yaml")] == "introduction/intro"
+        assert index.anchor(root / "sections" / "annexes" / "topo.yaml") == "annex-topo"
+        assert index.anchor(root / "sections" / "introduction" / "intro.yaml") == "intro-intro"
+        assert index.anchor(root / "sections" / "requirement-categories" / "general.yaml") == "general"
+        requirement = root / "requirements" / "general" / "metadata.yaml"
+        assert index.anchor(requirement) is None
+        assert index.anchor(requirement, category="general") == "general-metadata"
+
+    def test_matches_compiled_anchors(self, corpus):
+        data = load_pfs("A", corpus)
+        index = get_anchor_index(corpus)
+        assert get_anchor_index(str(corpus)) is index
+        assert resolve_links(data, corpus, index) == []
+        for block in data["requirements"]:
+            category = block["category"]
+            assert index.anchor(category["filepath"]) == category["id"]
+            for req in block["requirements"]:
+                assert index.anchor(req["filepath"], category=category["id"]) == req["uid"]
+        # the shared building blocks are not modified
+        for block in load_pfs("A", corpus)["requirements"]:
+            assert all("uid" not in req for req in block["requirements"])
@@ -0,0 +1,164 @@
+"""Tests for the task graph that generate-all runs."""
+
+import importlib
+import threading
+import time
+from multiprocessing import get_context
+from operator import add
+
+import pytest
+from click.testing import CliRunner
+
+from ceos_ard_cli import cli
+from ceos_ard_cli.generate import generate_all
+from ceos_ard_cli.utils import fast_yaml, files
+from ceos_ard_cli.utils import yaml as yaml_utils
+from ceos_ard_cli.utils.scheduler import Scheduler, SkippedError
+from ceos_ard_cli.utils.workers import worker_settings
+
+# the generate command of the CLI shadows the module in the package
+generate_module = importlib.import_module("ceos_ard_cli.generate")
+
+
+def fail():
+    raise RuntimeError("broken")
+
+
+class TestScheduler:
+    def test_order_prefers_tasks_added_first(self):
+        scheduler = Scheduler({"a": 1, "b": 1})
+        first = scheduler.add("first", "a", fail)
+        second = scheduler.add("second", "b", fail, deps=[first])
+        third = scheduler.add("third", "a", fail)
+        assert scheduler.order() == [first, second, third]
+
+    def test_cycles_and_unknown_kinds(self):
+        scheduler = Scheduler({"a": 1})
+        x = scheduler.add("x", "a", fail)
+        y = scheduler.add("y", "a", fail, deps=[x])
+        x.deps.append(y)
+        with pytest.raises(ValueError, match="Cyclic"):
+            scheduler.order()
+        with pytest.raises(ValueError, match="Unknown kind"):
+            scheduler.add("z", "b", fail)
+        with pytest.raises(ValueError, match="at least 1"):
+            Scheduler({"a": 0})
+
+    def test_plan(self):
+        scheduler = Scheduler({"compile": 2, "pandoc": 1})
+        md = scheduler.add("md", "compile", fail)
+        scheduler.add("html", "pandoc", fail, inputs=[md])
+        assert scheduler.plan() == "Concurrency: compile=2, pandoc=1\n1. [compile] md\n2. [pandoc] html (after md)"
+
+    def test_inputs_and_processes(self):
+        scheduler = Scheduler({"cpu": 2, "io": 1}, processes=["cpu"])
+        one = scheduler.add("one", "cpu", add, 1, 2)
+        two = scheduler.add("two", "io", add, 10, inputs=[one])
+        three = scheduler.add("three", "cpu", add, inputs=[one, two])
+        results, errors = scheduler.run()
+        assert errors == {}
+        assert results == {one: 3, two: 13, three: 16}
+
+    @pytest.mark.skipif(not fast_yaml.is_available(), reason="requires PyYAML with libyaml bindings")
+    def test_settings_in_spawned_processes(self, monkeypatch):
+        # spawned processes don't inherit the settings of the CLI options
+        monkeypatch.setattr(yaml_utils, "YAML_LOADER", "libyaml")
+        monkeypatch.setattr(files, "PREFETCH_WORKERS", 3)
+        scheduler = Scheduler({"cpu": 1}, processes=["cpu"], mp_context=get_context("spawn"))
+        task = scheduler.add("settings", "cpu", worker_settings)
+        results, errors = scheduler.run()
+        assert errors == {}
+        assert results[task] == ("libyaml", 3)
+
+    def test_limits(self):
+        lock = threading.Lock()
+        running = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0}
+
+        def work(kind):
+            with lock:
+                running[kind] += 1
+                peak[kind] = max(peak[kind], running[kind])
+            time.sleep(0.02)
+            with lock:
+                running[kind] -= 1
+
+        scheduler = Scheduler({"a": 2, "b": 1})
+        for i in range(6):
+            scheduler.add(f"a{i}", "a", work, "a")
+            scheduler.add(f"b{i}", "b", work, "b")
+        _, errors = scheduler.run()
+        assert errors == {}
+        assert peak == {"a": 2, "b": 1}
+
+    def test_failures_skip_dependents(self):
+        started = []
+        scheduler = Scheduler({"a": 1})
+        broken = scheduler.add("broken", "a", fail, group="x")
+        skipped = scheduler.add("skipped", "a", started.append, "skipped", deps=[broken], group="x")
+        later = scheduler.add("later", "a", started.append, "later", inputs=[skipped], group="x")
+        other = scheduler.add("other", "a", started.append, "other", group="y")
+        results, errors = scheduler.run()
+        assert started == ["other"]
+        assert list(results) == [other]
+        assert isinstance(errors[broken], RuntimeError)
+        assert isinstance(errors[skipped], SkippedError)
+        assert isinstance(errors[later], SkippedError)
+
+
+class TestGenerateAll:
+    def test_plan(self, corpus, tmp_path, capsys):
+        assert generate_all(tmp_path / "out", corpus, no_pdf=True, pfs_list=["A"], plan=True) == 0
+        assert capsys.readouterr().out.splitlines() == [
+            "Concurrency: compile=1, pandoc=2, chromium=1",
+            "1. [compile] A: Generating editable Markdown",
+            "2. [pandoc] A: Generating Word (after A: Generating editable Markdown)",
+            "3. [compile] A: Generating read-only Markdown (after A: Generating Word)",
+            "4. [pandoc] A: Generating HTML (after A: Generating read-only Markdown)",
+        ]
+        # nothing has been run
+        assert not (tmp_path / "out").exists()
+
+    def test_pipeline(self, corpus, tmp_path, monkeypatch):
+        calls = []
+
+        def run_pandoc(out, format, **kwargs):
+            # the Markdown that pandoc converts must match the format
+            editable = "Assessment:" in (out.parent / f"{out.name}.md").read_text(encoding="utf-8")
+            calls.append((out.name, format, editable))
+            if out.name == "B":
+                raise RuntimeError("pandoc failed")
+
+        monkeypatch.setattr(generate_module, "run_pandoc", run_pandoc)
+        errors = generate_all(tmp_path / "out", corpus, no_pdf=True, compile_jobs=2)
+        # the HTML of B is skipped as its Word document failed
+        assert errors == 1
+        assert sorted(calls) == [("A", "docx", True), ("A", "html", False), ("B", "docx", True)]
+        assert (tmp_path / "out" / "assets" / "img" / "logo.png").exists()
+
+
+class TestGenerateMatrix:
+    def test_load_errors_counted_once(self, corpus, tmp_path, capsys):
+        combinations = tmp_path / "combinations.yaml"
+        combinations.write_text("- pfs:\n    - A\n    - X\n- pfs:\n    - B\n    - X\n  id: BX\n", encoding="utf-8")
+        assert generate_module.generate_matrix(combinations, tmp_path / "out", corpus) == 1
+        output = capsys.readouterr().out
+        assert output.count("Error reading X") == 1
+        assert "Skipping A-X, not all PFS could be read" in output
+        assert "Skipping BX, not all PFS could be read" in output
+
+    def test_exit_code(self, corpus, tmp_path, monkeypatch):
+        # 256 errors must not wrap around to the exit code 0
+        monkeypatch.setattr(generate_module, "generate_matrix", lambda *args: 256)
+        combinations = tmp_path / "combinations.yaml"
+        combinations.write_text("- pfs:\n    - A\n", encoding="utf-8")
+        result = CliRunner().invoke(cli, ["generate-matrix", str(combinations), "-i", str(corpus)])
+        assert "Done with 256 errors" in result.output
+        assert result.exit_code == 1
+
+    def test_jobs(self, corpus, tmp_path):
+        combinations = tmp_path / "combinations.yaml"
+        combinations.write_text("- pfs:\n    - A\n", encoding="utf-8")
+        result = CliRunner().invoke(cli, ["generate-matrix", str(combinations), "-i", str(corpus), "--jobs", "0"])
+        assert "Invalid value for '--jobs'" in result.output
+        assert result.exit_code == 2
@@ -0,0 +1,100 @@
+"""Tests for splitting the PFS into shards and merging the manifests of the shards."""
+
+import importlib
+import json
+
+import pytest
+
+from ceos_ard_cli.shard import ASSET_COST_BYTES, estimate_costs, merge_manifests, parse_shard, partition, select_shard
+from ceos_ard_cli.validate import validate
+
+# the generate command of the CLI shadows the module in the package
+generate_module = importlib.import_module("ceos_ard_cli.generate")
+
+
+class TestPartition:
+    def test_parse_shard(self):
+        assert parse_shard("2/4") == (2, 4)
+        for value in ("0/2", "3/2", "1", "a/b", "1/0"):
+            with pytest.raises(ValueError):
+                parse_shard(value)
+
+    def test_balanced_and_deterministic(self):
+        costs = {"a": 1, "b": 8, "c": 3, "d": 4, "e": 2, "f": 2}
+        shards = partition(costs, 2)
+        assert shards == [["b", "f"], ["a", "c", "d", "e"]]
+        assert [sum(costs[p] for p in shard) for shard in shards] == [10, 10]
+        # independent of the order of the PFS
+        assert partition(dict(reversed(costs.items())), 2) == shards
+        # more shards than PFS
+        assert partition({"a": 1}, 3) == [["a"], [], []]
+
+    def test_estimates(self, corpus, capsys):
+        # an image in the folder of A, which costs as much as 2 requirements
+        (corpus / "pfs" / "A" / "map.png").write_bytes(b"0" * 2 * ASSET_COST_BYTES)
+        costs = estimate_costs(["A", "B"], corpus)
+        # A: 1 intro, 1 annex, 1 category, 2 requirements and the image
+        assert costs["A"] == 7
+        # B: 1 intro, 1 category, 2 requirements
+        assert costs["B"] == 4
+        assert estimate_costs(["A", "B", "missing"], corpus)["missing"] == 1
+        assert "WARNING: The cost of missing could not be estimated" in capsys.readouterr().out
+
+    def test_timings(self, corpus):
+        assert estimate_costs(["A", "B"], corpus, {"A": 1.5, "B": 7}) == {"A": 1.5, "B": 7}
+        # B has no timing, its estimate is scaled by the seconds per cost unit of A
+        costs = estimate_costs(["A", "B"], corpus, {"A": 10})
+        assert costs["A"] == 10
+        assert costs["B"] == pytest.approx(8, rel=0.01)
+
+    def test_select_shard(self, corpus, tmp_path):
+        timings = tmp_path / "timings.json"
+        timings.write_text(json.dumps({"pfs": {"A": {"seconds": 1}, "B": {"seconds": 2}}}), encoding="utf-8")
+        assert select_shard(["A", "B"], corpus, (1, 2)) == ["A"]
+        assert select_shard(["A", "B"], corpus, (1, 2), timings) == ["B"]
+        assert select_shard(["B", "A"], corpus, (1, 1)) == ["A", "B"]
+
+
+class TestManifests:
+    def test_validate_shards(self, corpus, tmp_path, capsys):
+        (corpus / "glossary" / "unused.yaml").write_text("term: Unused\ndescription: Test\n", encoding="utf-8")
+        (corpus / "assets" / "img" / "unused.png").write_bytes(b"UNUSED")
+        manifests = [tmp_path / "1.json", tmp_path / "2.json"]
+        errors = [validate(corpus, (i, 2), manifest=file) for i, file in enumerate(manifests, 1)]
+        assert errors == [0, 0]
+        merged, problems = merge_manifests(manifests)
+        assert problems == []
+        assert merged["errors"] == 0
+        assert list(merged["pfs"]) == ["A", "B"]
+        assert merged["unused_files"] == ["glossary/unused.yaml"]
+        assert merged["unused_assets"] == ["assets/img/unused.png"]
+        # the same result as a single run
+        capsys.readouterr()
+        assert validate(corpus) == 0
+        output = capsys.readouterr().out
+        assert output.endswith("Checking for duplicate requirement IDs\n")
+        assert "- glossary/unused.yaml\nChecking for assets not referenced by any PFS or template\n" in output
+        assert "template\n- assets/img/unused.png\nChecking" in output
+
+    def test_problems(self, corpus, tmp_path):
+        first = tmp_path / "1.json"
+        validate(corpus, (1, 3), manifest=first)
+        _, problems = merge_manifests([first, first])
+        assert problems == [
+            "Shard 1/3 is given multiple times",
+            "Shard 2/3 is missing",
+            "Shard 3/3 is missing",
+            "PFS A is part of multiple shards",
+        ]
+
+    def test_generate_all(self, corpus, tmp_path, monkeypatch):
+        monkeypatch.setattr(generate_module, "run_pandoc", lambda out, format, **kwargs: None)
+        manifest = tmp_path / "manifest.json"
+        errors = generate_module.generate_all(tmp_path / "out", corpus, no_pdf=True, shard=(2, 2), manifest=manifest)
+        assert errors == 0
+        data = json.loads(manifest.read_text(encoding="utf-8"))
+        assert data["command"] == "generate-all"
+        assert data["shard"] == [2, 2]
+        assert list(data["pfs"]) == ["B"]
+        assert data["pfs"]["B"]["files"] == ["B.bib", "B.md"]
+        assert data["pfs"]["B"]["seconds"] > 0
@@ -0,0 +1,42 @@
+"""Startup time regression tests, based on `python -X importtime`."""
+
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are slow to import and must only be imported when they are actually used
+HEAVY_MODULES = ("playwright", "bibtexparser", "dirsync")
+
+
+def imported_modules(code):
+    """Returns the top-level names of all modules that are imported by the given code."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            modules.add(name.split(".")[0])
+    return modules
+
+
+class TestStartup:
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "import ceos_ard_cli",
+            "import ceos_ard_cli.compile",
+            "import ceos_ard_cli.generate",
+            "import ceos_ard_cli.validate",
+        ],
+    )
+    def test_no_heavy_imports(self, code):
+        modules = imported_modules(code)
+        assert "ceos_ard_cli" in modules
+        for module in HEAVY_MODULES:
+            assert module not in modules, f"{module} is imported by '{code}'"
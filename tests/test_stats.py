@@ -0,0 +1,78 @@
+"""Tests for the statistics about the corpus."""
+
+import json
+
+from click.testing import CliRunner
+
+from ceos_ard_cli import cli
+from ceos_ard_cli.schema import REQUIREMENT
+from ceos_ard_cli.stats import corpus_stats, format_stats
+from ceos_ard_cli.utils.yaml import log_parses, read_yaml
+
+
+def by_block(entries):
+    return {entry["block"]: entry for entry in entries}
+
+
+class TestStats:
+    def test_log_parses(self, corpus):
+        file = corpus / "requirements" / "general" / "radiometry.yaml"
+        with log_parses() as outer:
+            with log_parses() as inner:
+                read_yaml(file, REQUIREMENT, corpus)
+            read_yaml(file, REQUIREMENT, corpus)
+        key = str(file).replace("\\", "/")
+        assert inner[key][0] == 1
+        assert outer[key][0] == 2
+        assert outer[key][1] >= inner[key][1] > 0
+
+    def test_corpus_stats(self, corpus):
+        stats = corpus_stats(corpus, top=20)
+        assert stats["files"]["pfs"]["files"] == 2
+        assert stats["files"]["requirements"]["files"] == 3
+        assert stats["files"]["assets"]["files"] == 2
+        assert set(stats["pfs"]) == {"A", "B"}
+        assert stats["pfs"]["A"]["error"] is None
+        assert stats["pfs"]["A"]["blocks"] == 6
+
+        blocks = by_block(stats["blocks"])
+        # referenced by both PFS, the glossary entry also by the blocks that use the term
+        assert blocks["requirements/general/metadata.yaml"]["pfs"] == 2
+        assert blocks["requirements/general/geometry.yaml"]["pfs"] == 1
+        assert blocks["glossary/dem.yaml"]["blocks"] == 2
+        assert blocks["glossary/dem.yaml"]["depth"] == 2
+        assert stats["depths"] == {"1": 6, "2": 1}
+        assert stats["fan_out"][0]["block"] == "glossary/dem.yaml"
+
+        parsing = stats["parsing"]
+        assert parsing["files"] == len(stats["file_parses"])
+        assert parsing["parses"] == sum(f["parses"] for f in stats["file_parses"].values())
+        assert parsing["amplification"] == parsing["parses"] / parsing["files"] >= 1
+        assert stats["file_parses"]["pfs/A/document.yaml"]["parses"] == 1
+
+        texts = {(t["block"], t["field"]): t["length"] for t in stats["largest_texts"]}
+        # the appended text is counted for the PFS that appends it
+        assert ("pfs/A/document.yaml", "requirements[0].requirements[1].append.description") in texts
+        assert texts.get(("requirements/general/geometry.yaml", "description"), 0) == 0
+        assert json.loads(json.dumps(stats)) == stats
+
+    def test_errors(self, corpus):
+        # a title reference to a building block that doesn't exist
+        document = corpus / "pfs" / "A" / "document.yaml"
+        text = document.read_text(encoding="utf-8").replace("see @intro", 'see "@title:sections/missing"')
+        document.write_text(text, encoding="utf-8")
+        stats = corpus_stats(corpus)
+        assert stats["pfs"]["A"]["error"]
+        assert stats["pfs"]["B"]["error"] is None
+        assert "PFS by compile time" in format_stats(stats)
+
+    def test_cli(self, corpus):
+        result = CliRunner().invoke(cli, ["stats", "-i", str(corpus), "--format", "json", "--top", "3"])
+        assert result.exit_code == 0, result.output
+        stats = json.loads(result.output)
+        assert len(stats["blocks"]) == 3
+
+        result = CliRunner().invoke(cli, ["stats", "-i", str(corpus)])
+        assert result.exit_code == 0, result.output
+        assert "Re-parse amplification of the loader" in result.output
+        assert "requirements/general/metadata.yaml" in result.output
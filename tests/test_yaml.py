@@ -0,0 +1,83 @@
+"""Tests for the YAML loaders."""
+
+import pytest
+import strictyaml
+
+from ceos_ard_cli.schema import GLOSSARY, REQUIREMENT
+from ceos_ard_cli.utils import fast_yaml
+from ceos_ard_cli.utils import yaml as yaml_utils
+from ceos_ard_cli.utils.pfs import read_pfs
+
+
+@pytest.fixture
+def libyaml():
+    yaml_utils.set_yaml_loader("libyaml")
+    yield
+    yaml_utils.set_yaml_loader("strictyaml")
+
+
+def load_both(text, schema):
+    results = []
+    for load in (lambda: yaml_utils.to_py(strictyaml.load(text, schema)), lambda: fast_yaml.load(text, schema)):
+        try:
+            results.append(load())
+        except strictyaml.StrictYAMLError as e:
+            results.append((e.context, e.problem))
+    return results
+
+
+class TestReadYaml:
+    def test_schema_is_built_once(self, corpus):
+        assert yaml_utils.get_schema(REQUIREMENT, corpus) is yaml_utils.get_schema(REQUIREMENT, corpus)
+        assert yaml_utils.get_schema(REQUIREMENT, corpus) is not yaml_utils.get_schema(REQUIREMENT, corpus / "other")
+
+    def test_filepath(self, corpus):
+        file = corpus / "requirements" / "general" / "radiometry.yaml"
+        data = yaml_utils.read_yaml(file, REQUIREMENT, corpus)
+        assert data["filepath"] == str(file).replace("\\", "/")
+        # the filepath is in the same position as with a default in the schema
+        assert list(data.keys())[:4] == ["id", "title", "requirements", "filepath"]
+
+
+@pytest.mark.skipif(not fast_yaml.is_available(), reason="PyYAML with libyaml is not installed")
+class TestLibyamlLoader:
+    def test_same_data(self, corpus, libyaml):
+        data = read_pfs("A", corpus)
+        yaml_utils.set_yaml_loader("strictyaml")
+        expected = read_pfs("A", corpus)
+        assert data == expected
+        assert list(data.keys()) == list(expected.keys())
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "term: DEM\ndescription: Test\n",
+            "term: DEM\n",
+            "term: DEM\ndescription: Test\nfoo: bar\n",
+            "term: DEM\ndescription: Test\ndeprecated: maybe\n",
+            "term:\n  - DEM\ndescription: Test\n",
+            "term: DEM\ndescription: Test\nreferences:\n  - missing\n",
+            "term: DEM\ndescription: Test\nchanges:\n  - date: 2020\n    author: a\n    change: b\n    reason: c\n    level: major\n",
+        ],
+    )
+    def test_same_errors(self, tmp_path, text):
+        strict, fast = load_both(text, GLOSSARY(tmp_path))
+        assert strict == fast
+
+    @pytest.mark.parametrize(
+        "text, error",
+        [
+            ("term: DEM\ndescription: Test\nreferences: [a]\n", strictyaml.exceptions.FlowMappingDisallowed),
+            ("term: &a DEM\ndescription: Test\n", strictyaml.exceptions.AnchorTokenDisallowed),
+            ("term: !!str DEM\ndescription: Test\n", strictyaml.exceptions.TagTokenDisallowed),
+            ("term: DEM\nterm: DEM\ndescription: Test\n", strictyaml.exceptions.DuplicateKeysDisallowed),
+        ],
+    )
+    def test_disallowed(self, tmp_path, text, error):
+        with pytest.raises(error):
+            fast_yaml.load(text, GLOSSARY(tmp_path))
+
+    def test_no_implicit_typing(self, tmp_path):
+        data = fast_yaml.load("term: 1.0\ndescription: null\n", GLOSSARY(tmp_path))
+        assert data["term"] == "1.0"
+        assert data["description"] == "null"